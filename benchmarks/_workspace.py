@@ -0,0 +1,52 @@
+"""
+Loads the Windmill scripts outside Windmill.
+
+The scripts import each other by workspace path (`from f.common... import`).
+install() registers an `f` namespace package whose sub-packages point at
+the matching folders under scripts/, so those imports resolve locally.
+"""
+
+import importlib.util
+import os
+import sys
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Windmill folder -> folder in this repository
+WINDMILL_FOLDERS = {
+    "common": "scripts/common",
+    "ingestion": "scripts/ingestions",
+    "clean": "scripts/clean",
+    "transformers": "scripts/tranforms",
+    "test_case": "scripts/testcased",
+}
+
+
+def install():
+    if "f" not in sys.modules:
+        root = types.ModuleType("f")
+        root.__path__ = []
+        sys.modules["f"] = root
+    for folder, rel in WINDMILL_FOLDERS.items():
+        name = f"f.{folder}"
+        if name not in sys.modules:
+            pkg = types.ModuleType(name)
+            pkg.__path__ = [os.path.join(REPO_ROOT, rel)]
+            sys.modules[name] = pkg
+            setattr(sys.modules["f"], folder, pkg)
+
+
+def load_script(windmill_path: str) -> types.ModuleType:
+    """Import a script by its Windmill path, e.g. "f/ingestion/ingest_order_data"."""
+    install()
+    module_name = windmill_path.replace("/", ".")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    _, folder, script = windmill_path.split("/")
+    path = os.path.join(REPO_ROOT, WINDMILL_FOLDERS[folder], f"{script}.py")
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,146 @@
+"""
+Throughput of the DataFrame writers for dimension loads.
+
+    python -m benchmarks.bench_dimension_writer --dsn "host=localhost dbname=bench user=postgres"
+    python -m benchmarks.bench_dimension_writer --sizes 100000 --methods copy,multi --out /tmp/writer.json
+
+Each case writes an n-row frame shaped like the cleaning step's dimension
+rows (key, business key, name, validity columns) into a TEMP table.
+Methods:
+
+- insert: DataFrame.to_sql's default, one parameterized INSERT per row
+- multi:  DataFrame.to_sql(method="multi"), multi-row INSERT statements
+- copy:   f.common.pg_copy.copy_dataframe, CSV through COPY FROM STDIN
+
+Every case runs in its own transaction on a truncated table and reports
+seconds and rows/s (best of --repeats).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks._workspace import install
+
+DEFAULT_SIZES = (100_000, 1_000_000)
+METHODS = ("insert", "multi", "copy")
+TABLE = "bench_dim_writer"
+DDL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {TABLE} (
+        member_key BIGINT, source_id TEXT, name TEXT,
+        valid_from TIMESTAMP, valid_to TIMESTAMP, is_current BOOLEAN
+    );
+"""
+
+
+def dimension_frame(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(20240101)
+    return pd.DataFrame({
+        "member_key": np.arange(1, n + 1),
+        "source_id": [f"USER{i:08d}" for i in range(n)],
+        "name": [f"Name {i}" for i in rng.integers(0, n, n)],
+        "valid_from": pd.Timestamp("1900-01-01"),
+        "valid_to": pd.Timestamp("9999-12-31"),
+        "is_current": True,
+    })
+
+
+def _write(conn, df: pd.DataFrame, method: str):
+    from f.common.pg_copy import copy_dataframe
+
+    if method == "copy":
+        with conn.connection.cursor() as cur:
+            copy_dataframe(cur, df, TABLE)
+    elif method == "multi":
+        # stays under the 65535 bind-parameter limit for 6 columns
+        df.to_sql(TABLE, conn, if_exists="append", index=False, method="multi", chunksize=10_000)
+    else:
+        df.to_sql(TABLE, conn, if_exists="append", index=False)
+
+
+def run_suite(dsn: str, sizes, methods=METHODS, repeats: int = 1) -> dict:
+    import psycopg2
+    from sqlalchemy import create_engine, text
+
+    install()
+    engine = create_engine("postgresql+psycopg2://", creator=lambda: psycopg2.connect(dsn))
+    results = {}
+    with engine.connect() as conn:
+        conn.execute(text(DDL))
+        conn.commit()
+        for n in sizes:
+            df = dimension_frame(n)
+            for method in methods:
+                timings = []
+                for _ in range(repeats):
+                    conn.execute(text(f"TRUNCATE {TABLE};"))
+                    conn.commit()
+                    t0 = time.perf_counter()
+                    with conn.begin():
+                        _write(conn, df, method)
+                    timings.append(time.perf_counter() - t0)
+                written = conn.execute(text(f"SELECT count(*) FROM {TABLE};")).scalar()
+                conn.commit()
+                if written != n:
+                    raise RuntimeError(f"{method}@{n}: wrote {written} rows, expected {n}")
+                seconds = min(timings)
+                key = f"{method}@{n}"
+                results[key] = {
+                    "method": method,
+                    "rows": n,
+                    "seconds": round(seconds, 3),
+                    "rows_per_s": round(n / seconds, 1),
+                }
+                print(f"  {key:<20} {n:>10,} rows {seconds:>9.3f}s {n / seconds:>14,.0f} rows/s")
+            base = results.get(f"insert@{n}")
+            if base:
+                for method in methods:
+                    results[f"{method}@{n}"]["vs_insert"] = round(
+                        results[f"{method}@{n}"]["rows_per_s"] / base["rows_per_s"], 2
+                    )
+    engine.dispose()
+    return results
+
+
+def main(dsn: str, sizes=DEFAULT_SIZES, methods=METHODS, repeats: int = 1, out: str = None) -> int:
+    print(f"⏳ Dimension writer benchmark (sizes={list(sizes)}, methods={list(methods)}, repeats={repeats})")
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "pandas": pd.__version__,
+            "sizes": list(sizes),
+            "repeats": repeats,
+        },
+        "results": run_suite(dsn, sizes, methods=methods, repeats=repeats),
+    }
+    if out:
+        with open(out, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"📝 Wrote results to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DataFrame writer throughput for dimension loads")
+    parser.add_argument("--dsn", default=os.getenv("SHOPZADA_BENCH_DSN"), help="libpq DSN of a scratch database")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated frame sizes (rows)")
+    parser.add_argument("--methods", default=",".join(METHODS), help=f"comma-separated subset of {METHODS}")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn (or SHOPZADA_BENCH_DSN) is required")
+    sys.exit(main(
+        dsn=args.dsn,
+        sizes=[int(s) for s in args.sizes.split(",") if s],
+        methods=[m for m in args.methods.split(",") if m],
+        repeats=args.repeats,
+        out=args.out,
+    ))
@@ -0,0 +1,255 @@
+"""
+Accuracy and speed of the campaign distinct-customer sketches.
+
+    python -m benchmarks.bench_hll --dsn "host=localhost user=postgres password=..."
+    python -m benchmarks.bench_hll --orders 150000,1500000 --out /tmp/hll.json
+
+Each size recreates the bench_hll database on the server behind --dsn
+(needs CREATE DATABASE rights) with four years of synthetic campaign
+orders: --campaigns campaigns, `orders` rows spread uniformly over the
+days, and one customer per 30 orders, a tenth of them with a second Type 2
+version. FACT_CAMPAIGN_PERFORMANCE then runs in this process against it:
+
+- build:     seconds of a full run, and server-side seconds of building the
+             daily sketches with the set-based hll_registers_agg against
+             the PL/pgSQL hll_add_agg (both must give the same bytes),
+- refresh:   seconds of an incremental run after one new order per
+             campaign on the last day,
+- accuracy:  estimate against COUNT(DISTINCT source_user_id) for one week,
+             one month, one year and the lifetime of every campaign
+             (mean and worst relative error),
+- latency:   server-side seconds of campaign_unique_customers() for a week
+             and a year, of a full scan of each campaign_customers_* view,
+             and of the same year and lifetime merged from the daily
+             sketches at query time (what the views did before the period
+             sketches were kept).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import psycopg2
+
+from benchmarks._workspace import load_script
+from benchmarks.bench_pipeline import _recreate_database, redirect_connections
+
+BENCH_DB = "bench_hll"
+DEFAULT_ORDERS = (150_000, 1_500_000)
+DEFAULT_CAMPAIGNS = 10
+ORDERS_PER_CUSTOMER = 30
+
+# Two versions for every tenth customer, so a customer counted by user_key
+# would show up as an error
+SOURCE_DDL = """
+    SELECT setseed(0.37);
+    CREATE TABLE dim_date AS
+    SELECT to_char(d, 'YYYYMMDD')::int AS date_key, d::date AS full_date
+    FROM generate_series(date '2020-01-01', date '2023-12-31', interval '1 day') d;
+    ALTER TABLE dim_date ADD PRIMARY KEY (date_key);
+
+    CREATE TABLE dim_campaign AS SELECT c::bigint AS campaign_key FROM generate_series(1, {campaigns}) c;
+    ALTER TABLE dim_campaign ADD PRIMARY KEY (campaign_key);
+
+    CREATE TABLE dim_user AS
+    SELECT row_number() OVER ()::bigint AS user_key, c AS source_user_id
+    FROM generate_series(1, {customers}) c
+    CROSS JOIN LATERAL generate_series(1, CASE WHEN c % 10 = 0 THEN 2 ELSE 1 END) v;
+    ALTER TABLE dim_user ADD PRIMARY KEY (user_key);
+
+    CREATE TABLE fact_orders AS
+    SELECT
+        i::bigint AS order_key,
+        1 + (random() * ({users} - 1))::bigint AS user_key,
+        1 + (i % {campaigns})::bigint AS campaign_key,
+        to_char(date '2020-01-01' + (random() * 1460)::int, 'YYYYMMDD')::int AS date_key,
+        (500 + random() * 95000)::bigint AS total_amount
+    FROM generate_series(1, {orders}) i;
+    CREATE INDEX fact_orders_campaign_date_idx ON fact_orders (campaign_key, date_key);
+    ANALYZE;
+"""
+
+# window -> (from_date_key, to_date_key); lifetime is read from its view
+WINDOWS = {
+    "week": (20210104, 20210110),
+    "month": (20210301, 20210331),
+    "year": (20210101, 20211231),
+}
+
+EXACT_SQL = """
+    SELECT f.campaign_key, COUNT(DISTINCT u.source_user_id)
+    FROM fact_orders f JOIN dim_user u ON u.user_key = f.user_key
+    WHERE f.date_key BETWEEN %s AND %s
+    GROUP BY f.campaign_key
+"""
+
+LATENCY_CASES = {
+    "week": "SELECT * FROM campaign_unique_customers(20210104, 20210110)",
+    "year": "SELECT * FROM campaign_unique_customers(20210101, 20211231)",
+    "weekly_view": "SELECT * FROM campaign_customers_weekly",
+    "monthly_view": "SELECT * FROM campaign_customers_monthly",
+    "lifetime_view": "SELECT * FROM campaign_customers_lifetime",
+    "year_from_daily": """
+        SELECT campaign_key, round(hll_cardinality(hll_union_all(array_agg(customer_sketch))))::bigint
+        FROM fact_campaign_performance WHERE date_key BETWEEN 20210101 AND 20211231
+        GROUP BY campaign_key""",
+    "lifetime_from_daily": """
+        SELECT campaign_key, round(hll_cardinality(hll_union_all(array_agg(customer_sketch))))::bigint
+        FROM fact_campaign_performance GROUP BY campaign_key""",
+}
+
+BUILD_SQL = """
+    SELECT f.campaign_key, f.date_key, {sketch}
+    FROM fact_orders f LEFT JOIN dim_user u ON u.user_key = f.user_key
+    GROUP BY f.campaign_key, f.date_key
+"""
+
+
+def _time(cur, sql: str) -> float:
+    # Server-side execution time, as in bench_money
+    cur.execute(f"EXPLAIN (ANALYZE, TIMING OFF, FORMAT JSON) {sql};")
+    return cur.fetchone()[0][0]["Execution Time"] / 1000
+
+
+def _best(cur, sql: str, repeats: int) -> float:
+    _time(cur, sql)  # warm the buffer cache
+    return round(min(_time(cur, sql) for _ in range(repeats)), 4)
+
+
+def _errors(estimates: dict, exact: dict) -> dict:
+    errors = [abs(estimates.get(k, 0) - v) / v for k, v in exact.items() if v]
+    return {
+        "campaigns": len(errors),
+        "mean_exact": round(sum(exact.values()) / len(exact)),
+        "mean_error": round(sum(errors) / len(errors), 4),
+        "max_error": round(max(errors), 4),
+    }
+
+
+def run_size(params: dict, orders: int, campaigns: int, repeats: int) -> dict:
+    fcp = load_script("f/transformers/FACT_CAMPAIGN_PERFORMANCE")
+    from f.common.change_log import ensure_change_log, log_full_rebuild
+    from f.common.hll import hll_sketch_agg
+
+    customers = max(orders // ORDERS_PER_CUSTOMER, 1)
+    _recreate_database(params, BENCH_DB)
+    conn = psycopg2.connect(dbname=BENCH_DB, **params)
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute(SOURCE_DDL.format(
+            campaigns=int(campaigns), customers=customers, orders=int(orders),
+            users=customers + customers // 10,
+        ))
+        # As left by a full FACT_ORDERS load
+        ensure_change_log(cur)
+        log_full_rebuild(cur)
+
+        with redirect_connections(params, BENCH_DB):
+            started = time.perf_counter()
+            fcp.main(mode="full")
+            full_seconds = time.perf_counter() - started
+
+            # One new order per campaign on the last day, logged as FACT_ORDERS would
+            cur.execute(f"""
+                INSERT INTO fact_orders (order_key, user_key, campaign_key, date_key, total_amount)
+                SELECT {orders} + c, 1, c, 20231231, 1000 FROM generate_series(1, {campaigns}) c;
+                INSERT INTO fact_orders_change_log (campaign_key, date_key)
+                SELECT c, 20231231 FROM generate_series(1, {campaigns}) c;
+            """)
+            started = time.perf_counter()
+            fcp.main(mode="incremental")
+            incremental_seconds = time.perf_counter() - started
+
+        # The pipeline builds sketches in an INSERT ... SELECT, which never
+        # runs in parallel; time the same serial plan.
+        cur.execute("SET max_parallel_workers_per_gather = 0;")
+        set_based = BUILD_SQL.format(sketch=hll_sketch_agg("u.source_user_id"))
+        per_row = BUILD_SQL.format(sketch="hll_add_agg(u.source_user_id)")
+        cur.execute(f"SELECT count(*) FROM ({set_based} EXCEPT {per_row}) d;")
+        if cur.fetchone()[0]:
+            raise RuntimeError(f"@{orders}: hll_registers_agg and hll_add_agg sketches differ")
+
+        accuracy = {}
+        for window, (first, last) in WINDOWS.items():
+            cur.execute(EXACT_SQL, (first, last))
+            exact = dict(cur.fetchall())
+            cur.execute("SELECT * FROM campaign_unique_customers(%s, %s);", (first, last))
+            accuracy[window] = _errors(dict(cur.fetchall()), exact)
+        cur.execute(EXACT_SQL, (0, 99999999))
+        exact = dict(cur.fetchall())
+        cur.execute("SELECT campaign_key, approx_unique_customers FROM campaign_customers_lifetime;")
+        accuracy["lifetime"] = _errors(dict(cur.fetchall()), exact)
+
+        return {
+            "orders": orders,
+            "campaigns": campaigns,
+            "customers": customers,
+            "build": {
+                "full_run_seconds": round(full_seconds, 2),
+                "incremental_run_seconds": round(incremental_seconds, 2),
+                "daily_sketches_set_based_seconds": _best(cur, set_based, repeats),
+                "daily_sketches_hll_add_agg_seconds": _best(cur, per_row, repeats),
+            },
+            "accuracy": accuracy,
+            "latency_seconds": {case: _best(cur, sql, repeats) for case, sql in LATENCY_CASES.items()},
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main(dsn: str, orders=DEFAULT_ORDERS, campaigns: int = DEFAULT_CAMPAIGNS, repeats: int = 3,
+         out: str = None) -> int:
+    print(f"⏳ HLL sketch benchmark (orders={list(orders)}, campaigns={campaigns}, repeats={repeats})")
+    params = psycopg2.extensions.parse_dsn(dsn)
+    params.pop("dbname", None)
+    results = {}
+    for n in orders:
+        result = run_size(params, n, campaigns, repeats)
+        results[str(n)] = result
+        print(f"  @{n}: build {result['build']}")
+        for window, err in result["accuracy"].items():
+            print(f"  @{n}: {window:<9} mean error {err['mean_error']:.2%}   worst {err['max_error']:.2%}"
+                  f"   (~{err['mean_exact']} customers)")
+        for case, seconds in result["latency_seconds"].items():
+            print(f"  @{n}: {case:<20} {seconds:>8.4f}s")
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "orders": list(orders),
+            "campaigns": campaigns,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+    if out:
+        with open(out, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"📝 Wrote results to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Campaign customer sketch accuracy and latency")
+    parser.add_argument("--dsn", default=os.getenv("SHOPZADA_BENCH_DSN"),
+                        help="libpq DSN of a server to create the bench_hll database on")
+    parser.add_argument("--orders", default=",".join(str(n) for n in DEFAULT_ORDERS),
+                        help="comma-separated campaign order counts")
+    parser.add_argument("--campaigns", type=int, default=DEFAULT_CAMPAIGNS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn (or SHOPZADA_BENCH_DSN) is required")
+    sys.exit(main(
+        dsn=args.dsn,
+        orders=[int(n) for n in args.orders.split(",") if n],
+        campaigns=args.campaigns,
+        repeats=args.repeats,
+        out=args.out,
+    ))
@@ -0,0 +1,399 @@
+"""
+Micro-benchmarks for the ingestion cleaning functions and COPY paths.
+
+    python -m benchmarks.bench_ingestion --sizes 10000,100000,1000000
+    python -m benchmarks.bench_ingestion --save-baseline        # record a baseline
+    python -m benchmarks.bench_ingestion --dsn "host=localhost dbname=bench user=postgres"
+
+Inputs are generated by benchmarks.synthetic_sources with a fixed seed and
+round-tripped through CSV, so every function sees the same dtypes it gets
+from a real download. Each case reports rows/s (best of --repeats) and the
+tracemalloc peak of one extra traced run.
+
+Without --dsn the COPY cases only time the CSV buffer build. With --dsn
+they also run copy_expert into a TEMP table that has the staging table's
+layout.
+
+When a baseline exists, every case is compared with it. The exit code is
+1 if any case's throughput dropped by more than --tolerance.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks._workspace import REPO_ROOT, load_script
+from benchmarks.synthetic_sources import BASE_COUNTS, ShopzadaGenerator, _write_tab_stuffed_csv
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baselines", "ingestion.json")
+SEED = 20240101
+
+
+# ---------- fixed inputs ----------
+
+def _roundtrip_csv(df: pd.DataFrame, index: bool = True) -> pd.DataFrame:
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=index)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
+
+
+def _entity_gen(n: int) -> ShopzadaGenerator:
+    """Generator sized so a master entity has about n rows (soft duplicates included)."""
+    gen = ShopzadaGenerator(seed=SEED)
+    gen.counts.update(users=n, merchants=n, staff=n, campaigns=n, products=max(n // 10, 1))
+    return gen
+
+
+def _order_gen(orders: int) -> ShopzadaGenerator:
+    """Generator with at least `orders` orders to draw dates from (1x up to 500k)."""
+    return ShopzadaGenerator(scale=max(orders / BASE_COUNTS["orders"], 1), seed=SEED)
+
+
+def raw_orders(n):
+    gen = _order_gen(n)
+    gen.counts["users"] = max(n // 100, 1)
+    frame = gen.with_exact_duplicates(gen.orders_frame(np.arange(n), "%m/%d/%y"))
+    return _roundtrip_csv(frame)
+
+
+def _raw_line_items(n):
+    gen = ShopzadaGenerator(seed=SEED)
+    # about (MAX_LINES_PER_ORDER + 1) / 2 lines per order
+    prices, products = gen.line_items(np.arange(max(n // 3, 1)))
+    return _roundtrip_csv(prices.iloc[:n]), _roundtrip_csv(products.iloc[:n])
+
+
+def raw_prices(n):
+    return _raw_line_items(n)[0]
+
+
+def raw_products(n):
+    return _raw_line_items(n)[1]
+
+
+def raw_campaigns(n):
+    gen = _entity_gen(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "campaign_data.csv")
+        _write_tab_stuffed_csv(path, gen.campaigns_frame(np.arange(n)))
+        return pd.read_csv(path)
+
+
+def raw_links(n):
+    orders = int(n / 0.3) + 1
+    links = _order_gen(orders).campaign_links_frame(np.arange(orders))
+    return _roundtrip_csv(links.iloc[:n])
+
+
+def _soft_duplicated(frame_fn, dup_hasher, n):
+    gen = _entity_gen(n)
+    n_rows, entity_of = gen._with_soft_duplicates(n, gen._h[dup_hasher])
+    return _roundtrip_csv(getattr(gen, frame_fn)(np.arange(n_rows), entity_of))
+
+
+def raw_users(n):
+    # user_data.json is loaded without an index column
+    return _soft_duplicated("users_frame", "userdup", n).drop(columns=["Unnamed: 0"])
+
+
+def raw_merchants(n):
+    return _soft_duplicated("merchants_frame", "mercdup", n)
+
+
+def raw_staff(n):
+    return _soft_duplicated("staff_frame", "staffdup", n)
+
+
+# ---------- cases ----------
+
+@dataclass
+class Case:
+    name: str
+    script: str
+    build: Callable[[int], pd.DataFrame]
+    run: Callable
+    # COPY cases: staging layout + the script's cleaning step to produce the input
+    copy_ddl: Optional[str] = None
+    copy_columns: Optional[list] = None
+
+
+CLEANING_CASES = [
+    Case("standardize_order_df", "f/ingestion/ingest_order_data", raw_orders,
+         lambda m, df: m._standardize_order_df(df)),
+    Case("clean_line_item_prices", "f/ingestion/ingest_line_item_data_prices", raw_prices,
+         lambda m, df: m.clean_dataframe(df)),
+    Case("clean_line_item_products", "f/ingestion/ingest_line_item_data_products", raw_products,
+         lambda m, df: m.clean_dataframe(df)),
+    Case("standardize_campaign_df", "f/ingestion/ingest_campaign_data", raw_campaigns,
+         lambda m, df: m._standardize_campaign_df(df, source_type="dirty_historical")),
+    Case("standardize_links_df", "f/ingestion/ingest_transactional_campaign_data", raw_links,
+         lambda m, df: m._standardize_links_df(df)),
+    Case("soft_dedup_user", "f/ingestion/ingest_user_data", raw_users,
+         lambda m, df: m._standardize_user_df(df)),
+    Case("soft_dedup_merchant", "f/ingestion/ingest_merchant_data", raw_merchants,
+         lambda m, df: m._standardize_merchant_df(df)),
+    Case("soft_dedup_staff", "f/ingestion/ingest_staff_data", raw_staff,
+         lambda m, df: m._standardize_staff_df(df)),
+]
+
+def _encoded(module, df: pd.DataFrame) -> pd.DataFrame:
+    """The script's ID_COLUMNS encoding (f.common.ids), as main() applies it before COPY."""
+    from f.common.ids import encode_ids
+
+    encode_ids(df, module.ID_COLUMNS)
+    return df
+
+
+# Layouts mirror the CREATE TABLE / COPY column lists in each ingestion script.
+COPY_CASES = [
+    Case("copy_order_data", "f/ingestion/ingest_order_data", raw_orders,
+         lambda m, df: _encoded(m, m._standardize_order_df(df)),
+         "order_id UUID, user_id BIGINT, estimated_arrival INTEGER, transaction_date TIMESTAMP",
+         ["order_id", "user_id", "estimated_arrival", "transaction_date"]),
+    Case("copy_line_item_prices", "f/ingestion/ingest_line_item_data_prices", raw_prices,
+         lambda m, df: _encoded(m, m.assign_line_no(m.clean_dataframe(df))),
+         "order_id UUID, line_no INTEGER, price BIGINT, quantity INTEGER",
+         ["order_id", "line_no", "price", "quantity"]),
+    Case("copy_line_item_products", "f/ingestion/ingest_line_item_data_products", raw_products,
+         lambda m, df: _encoded(m, m.drop_missing_ids(m.assign_line_no(m.clean_dataframe(df)))),
+         "order_id UUID, line_no INTEGER, product_name TEXT, product_id BIGINT",
+         ["order_id", "line_no", "product_name", "product_id"]),
+    Case("copy_campaign_data", "f/ingestion/ingest_campaign_data", raw_campaigns,
+         lambda m, df: m._standardize_campaign_df(df, source_type="dirty_historical"),
+         "campaign_id TEXT, campaign_name TEXT, campaign_description TEXT, discount NUMERIC",
+         ["campaign_id", "campaign_name", "campaign_description", "discount"]),
+    Case("copy_transactional_campaign", "f/ingestion/ingest_transactional_campaign_data", raw_links,
+         lambda m, df: _encoded(m, m._standardize_links_df(df)),
+         "transaction_date TIMESTAMP, campaign_id TEXT, order_id UUID, estimated_arrival INTEGER, availed INTEGER",
+         ["transaction_date", "campaign_id", "order_id", "estimated_arrival", "availed"]),
+    Case("copy_user_data", "f/ingestion/ingest_user_data", raw_users,
+         lambda m, df: _encoded(m, m._standardize_user_df(df)),
+         "user_id BIGINT, creation_date TIMESTAMP, name TEXT, street TEXT, state TEXT, city TEXT, country TEXT, "
+         "birthdate DATE, gender TEXT, device_address TEXT, user_type TEXT, "
+         "possible_duplicate BOOLEAN, possible_duplicate_of BIGINT",
+         ["user_id", "creation_date", "name", "street", "state", "city", "country", "birthdate", "gender",
+          "device_address", "user_type", "possible_duplicate", "possible_duplicate_of"]),
+    Case("copy_merchant_data", "f/ingestion/ingest_merchant_data", raw_merchants,
+         lambda m, df: _encoded(m, m._standardize_merchant_df(df)),
+         "merchant_id BIGINT, creation_date TIMESTAMP, name TEXT, street TEXT, state TEXT, city TEXT, "
+         "country TEXT, contact_number TEXT, possible_duplicate BOOLEAN, possible_duplicate_of BIGINT",
+         ["merchant_id", "creation_date", "name", "street", "state", "city", "country", "contact_number",
+          "possible_duplicate", "possible_duplicate_of"]),
+    Case("copy_staff_data", "f/ingestion/ingest_staff_data", raw_staff,
+         lambda m, df: _encoded(m, m._standardize_staff_df(df)),
+         "staff_id BIGINT, name TEXT, job_level TEXT, street TEXT, state TEXT, city TEXT, country TEXT, "
+         "contact_number TEXT, creation_date TIMESTAMP, possible_duplicate BOOLEAN, possible_duplicate_of BIGINT",
+         ["staff_id", "name", "job_level", "street", "state", "city", "country", "contact_number",
+          "creation_date", "possible_duplicate", "possible_duplicate_of"]),
+]
+
+
+def _copy_runner(case: Case, conn):
+    """Same buffer + copy_expert sequence the ingestion scripts use."""
+    table = f"bench_{case.name}"
+    if conn is not None:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} ({case.copy_ddl});")
+        conn.commit()
+
+    def run(df):
+        buffer = io.StringIO()
+        df[case.copy_columns].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        if conn is not None:
+            with conn.cursor() as cur:
+                cur.execute(f"TRUNCATE {table};")
+                cur.copy_expert(
+                    f"COPY {table} ({', '.join(case.copy_columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+                )
+            conn.commit()
+        return buffer
+
+    return run
+
+
+# ---------- measurement ----------
+
+def _measure(fn, make_input, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        arg = make_input()
+        t0 = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - t0)
+        del arg
+
+    # one extra run under tracemalloc for the peak; not used for timing
+    arg = make_input()
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(timings), "peak_mb": round(peak / (1024 * 1024), 2)}
+
+
+def run_suite(sizes, repeats: int = 3, only=None, dsn: str = None) -> dict:
+    # the order CSV dates ("10/12/21") make to_datetime warn on every call
+    warnings.filterwarnings("ignore", category=UserWarning)
+    conn = None
+    if dsn:
+        import psycopg2
+
+        conn = psycopg2.connect(dsn)
+
+    results = {}
+    try:
+        for case in CLEANING_CASES + COPY_CASES:
+            if only and not any(pattern in case.name for pattern in only):
+                continue
+            module = load_script(case.script)
+            copy_run = _copy_runner(case, conn) if case.copy_ddl else None
+            for n in sizes:
+                raw = case.build(n)
+                if copy_run is None:
+                    fn = lambda df: case.run(module, df)  # noqa: E731
+                    make_input = raw.copy
+                else:
+                    cleaned = case.run(module, raw.copy())
+                    fn = copy_run
+                    make_input = lambda: cleaned  # noqa: E731
+                rows = len(raw)
+                m = _measure(fn, make_input, repeats)
+                key = f"{case.name}@{n}"
+                results[key] = {
+                    "case": case.name,
+                    "size": n,
+                    "rows": rows,
+                    "seconds": round(m["seconds"], 4),
+                    "rows_per_s": round(rows / m["seconds"], 1) if m["seconds"] else None,
+                    "peak_mb": m["peak_mb"],
+                    "copy_to_db": bool(copy_run is not None and conn is not None),
+                }
+                print(f"  {key:<40} {rows:>10,} rows {m['seconds']:>9.3f}s "
+                      f"{results[key]['rows_per_s'] or 0:>14,.0f} rows/s  peak={m['peak_mb']:>9.2f}MB")
+    finally:
+        if conn is not None:
+            conn.close()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Cases whose throughput fell below (1 - tolerance) x baseline."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get("results", {}).get(key)
+        if not base or not base.get("rows_per_s") or not current.get("rows_per_s"):
+            continue
+        if base.get("copy_to_db") != current.get("copy_to_db"):
+            continue
+        ratio = current["rows_per_s"] / base["rows_per_s"]
+        current["vs_baseline"] = round(ratio, 3)
+        current["peak_mb_vs_baseline"] = round(current["peak_mb"] - base["peak_mb"], 2)
+        if ratio < 1 - tolerance:
+            regressions.append((key, ratio))
+    return regressions
+
+
+def _memory_gb() -> Optional[float]:
+    try:
+        return round(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3, 1)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def main(sizes=DEFAULT_SIZES, repeats: int = 3, only=None, dsn: str = None, out: str = None,
+         baseline_path: str = DEFAULT_BASELINE, save_baseline: bool = False, tolerance: float = 0.15) -> int:
+    print(f"⏳ Ingestion micro-benchmarks (sizes={list(sizes)}, repeats={repeats}, "
+          f"copy={'postgres' if dsn else 'buffer only'})")
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "memory_gb": _memory_gb(),
+            "copy": "postgres" if dsn else "buffer only",
+            "sizes": list(sizes),
+            "repeats": repeats,
+            "seed": SEED,
+        },
+        "results": run_suite(sizes, repeats=repeats, only=only, dsn=dsn),
+    }
+
+    exit_code = 0
+    if save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"💾 Saved baseline to {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+        regressions = compare(report["results"], baseline, tolerance)
+        hardware = ("machine", "cpus", "memory_gb")
+        recorded = {k: baseline.get("meta", {}).get(k) for k in hardware}
+        if recorded != {k: report["meta"][k] for k in hardware}:
+            print(f"⚠️ Baseline was recorded on other hardware ({recorded}); ratios are only indicative.")
+        report["baseline"] = {"path": baseline_path, "created_at": baseline.get("meta", {}).get("created_at"),
+                              "tolerance": tolerance, "regressions": [k for k, _ in regressions]}
+        if regressions:
+            exit_code = 1
+            print(f"❌ {len(regressions)} case(s) slower than baseline by more than {tolerance:.0%}:")
+            for key, ratio in regressions:
+                print(f"  {key}: {ratio:.2f}x baseline throughput")
+        else:
+            print(f"✅ No regressions against baseline ({baseline_path}).")
+    else:
+        print(f"ℹ️ No baseline at {baseline_path}; run with --save-baseline to record one.")
+
+    if out:
+        with open(out, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"📝 Wrote results to {out}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestion cleaning/COPY micro-benchmarks")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated input sizes (rows)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", default=None, help="comma-separated substrings of case names to run")
+    parser.add_argument("--dsn", default=os.getenv("SHOPZADA_BENCH_DSN"),
+                        help="libpq DSN; COPY cases load into TEMP tables when set")
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed throughput drop vs baseline before failing (0.15 = 15%%)")
+    args = parser.parse_args()
+    sys.exit(main(
+        sizes=[int(s) for s in args.sizes.split(",") if s],
+        repeats=args.repeats,
+        only=[s for s in args.only.split(",") if s] if args.only else None,
+        dsn=args.dsn,
+        out=args.out,
+        baseline_path=args.baseline,
+        save_baseline=args.save_baseline,
+        tolerance=args.tolerance,
+    ))
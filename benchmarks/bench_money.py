@@ -0,0 +1,178 @@
+"""
+Aggregation speed of NUMERIC amounts against BIGINT cents.
+
+    python -m benchmarks.bench_money --dsn "host=localhost dbname=bench user=postgres"
+    python -m benchmarks.bench_money --sizes 1000000 --repeats 5 --out /tmp/money.json
+
+Each size builds two UNLOGGED tables with the same n order rows, one with
+NUMERIC amounts in units (the old layout) and one with BIGINT cents
+(f.common.money). Both run the aggregations the pipeline runs over money:
+
+- campaign_performance: COUNT/SUM/AVG per (campaign_key, date_key), as in
+  FACT_CAMPAIGN_PERFORMANCE
+- rollup_month:         SUM per (month, merchant_key), as in BUILD_ROLLUPS
+- order_totals:         SUM(quantity * price) per order, as in the
+                        f.common.line_items order totals
+- grand_total:          one SUM and AVG over every row
+
+Each case reports the server-side execution seconds (best of --repeats) and the speedup of cents
+over NUMERIC. The results of both layouts are checked to agree.
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+DEFAULT_SIZES = (1_000_000, 5_000_000)
+LAYOUTS = ("numeric", "cents")
+TABLE = "bench_money_{layout}"
+
+# Order rows with amounts in units; the cents table is derived from it
+NUMERIC_DDL = """
+    SELECT setseed(0.2024);
+    CREATE UNLOGGED TABLE {table} AS
+    SELECT
+        i / 3 AS order_no,
+        1 + (i % 50) AS campaign_key,
+        to_char(date '2020-01-01' + (i % 1400), 'YYYYMMDD')::int AS date_key,
+        1 + (i % 5000) AS merchant_key,
+        1 + (random() * 9)::int AS quantity,
+        round((5 + random() * 95)::numeric, 2) AS price,
+        round((5 + random() * 950)::numeric, 2) AS total_amount
+    FROM generate_series(0, {n} - 1) i;
+"""
+CENTS_DDL = """
+    CREATE UNLOGGED TABLE {table} AS
+    SELECT order_no, campaign_key, date_key, merchant_key, quantity,
+           (price * 100)::bigint AS price,
+           (total_amount * 100)::bigint AS total_amount
+    FROM {source};
+"""
+
+# case -> layout -> SELECT over {table}. The cents forms cast back to
+# bigint as the pipeline does.
+CASES = {
+    "campaign_performance": {
+        "numeric": """SELECT campaign_key, date_key, COUNT(*), SUM(total_amount), AVG(total_amount)
+                      FROM {table} GROUP BY campaign_key, date_key""",
+        "cents": """SELECT campaign_key, date_key, COUNT(*), SUM(total_amount)::bigint,
+                           round(AVG(total_amount))::bigint
+                    FROM {table} GROUP BY campaign_key, date_key""",
+    },
+    "rollup_month": {
+        "numeric": "SELECT date_key / 100, merchant_key, SUM(total_amount) FROM {table} GROUP BY 1, 2",
+        "cents": "SELECT date_key / 100, merchant_key, SUM(total_amount)::bigint FROM {table} GROUP BY 1, 2",
+    },
+    "order_totals": {
+        "numeric": "SELECT order_no, SUM(quantity * price) FROM {table} GROUP BY order_no",
+        "cents": "SELECT order_no, SUM(quantity * price)::bigint FROM {table} GROUP BY order_no",
+    },
+    "grand_total": {
+        "numeric": "SELECT SUM(total_amount), AVG(total_amount) FROM {table}",
+        "cents": "SELECT SUM(total_amount)::bigint, round(AVG(total_amount))::bigint FROM {table}",
+    },
+}
+
+# Both layouts must agree (in cents) before any timing is reported
+CHECK_SQL = {
+    "numeric": "SELECT (SUM(total_amount) * 100)::bigint, (SUM(quantity * price) * 100)::bigint FROM {table}",
+    "cents": "SELECT SUM(total_amount)::bigint, SUM(quantity * price)::bigint FROM {table}",
+}
+
+
+def _build(cur, n: int):
+    numeric, cents = (TABLE.format(layout=layout) for layout in LAYOUTS)
+    for table in (numeric, cents):
+        cur.execute(f"DROP TABLE IF EXISTS {table};")
+    cur.execute(NUMERIC_DDL.format(table=numeric, n=int(n)))
+    cur.execute(CENTS_DDL.format(table=cents, source=numeric))
+    for table in (numeric, cents):
+        cur.execute(f"VACUUM ANALYZE {table};")
+
+
+def _time(cur, sql: str) -> float:
+    # Server-side execution time. Wrapping the query (count(*) over it)
+    # would let the planner drop the aggregates nobody reads, and fetching
+    # would time the transfer instead.
+    cur.execute(f"EXPLAIN (ANALYZE, TIMING OFF, FORMAT JSON) {sql};")
+    return cur.fetchone()[0][0]["Execution Time"] / 1000
+
+
+def run_suite(dsn: str, sizes, cases=tuple(CASES), repeats: int = 3) -> dict:
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    cur = conn.cursor()
+    results = {}
+    try:
+        for n in sizes:
+            _build(cur, n)
+            totals = {}
+            for layout in LAYOUTS:
+                cur.execute(CHECK_SQL[layout].format(table=TABLE.format(layout=layout)))
+                totals[layout] = cur.fetchone()
+            if totals["numeric"] != totals["cents"]:
+                raise RuntimeError(f"@{n}: NUMERIC totals {totals['numeric']} != cents totals {totals['cents']}")
+
+            for case in cases:
+                seconds = {}
+                for layout in LAYOUTS:
+                    sql = CASES[case][layout].format(table=TABLE.format(layout=layout))
+                    _time(cur, sql)  # warm the buffer cache
+                    seconds[layout] = min(_time(cur, sql) for _ in range(repeats))
+                key = f"{case}@{n}"
+                results[key] = {
+                    "case": case,
+                    "rows": n,
+                    "numeric_seconds": round(seconds["numeric"], 3),
+                    "cents_seconds": round(seconds["cents"], 3),
+                    "speedup": round(seconds["numeric"] / seconds["cents"], 2),
+                }
+                print(f"  {key:<30} numeric {seconds['numeric']:>8.3f}s   cents {seconds['cents']:>8.3f}s"
+                      f"   x{results[key]['speedup']:.2f}")
+    finally:
+        for layout in LAYOUTS:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLE.format(layout=layout)};")
+        cur.close()
+        conn.close()
+    return results
+
+
+def main(dsn: str, sizes=DEFAULT_SIZES, cases=tuple(CASES), repeats: int = 3, out: str = None) -> int:
+    print(f"⏳ Money aggregation benchmark (sizes={list(sizes)}, cases={list(cases)}, repeats={repeats})")
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "sizes": list(sizes),
+            "repeats": repeats,
+        },
+        "results": run_suite(dsn, sizes, cases=cases, repeats=repeats),
+    }
+    if out:
+        with open(out, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"📝 Wrote results to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NUMERIC vs BIGINT cents aggregation speed")
+    parser.add_argument("--dsn", default=os.getenv("SHOPZADA_BENCH_DSN"), help="libpq DSN of a scratch database")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated row counts")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"comma-separated subset of {tuple(CASES)}")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn (or SHOPZADA_BENCH_DSN) is required")
+    sys.exit(main(
+        dsn=args.dsn,
+        sizes=[int(s) for s in args.sizes.split(",") if s],
+        cases=[c for c in args.cases.split(",") if c],
+        repeats=args.repeats,
+        out=args.out,
+    ))
@@ -0,0 +1,476 @@
+"""
+End-to-end pipeline benchmark against a throwaway local Postgres.
+
+    python -m benchmarks.bench_pipeline --scales 0.1,1,5 --out /tmp/pipeline.json --plot /tmp/pipeline.png
+    python -m benchmarks.bench_pipeline --scales 1 --docker              # postgres:16 in docker
+    python -m benchmarks.bench_pipeline --scales 1 --dsn "host=localhost user=postgres password=..."
+
+For each scale factor the harness:
+
+1. generates the sources with benchmarks.synthetic_sources (not timed)
+   and serves them over a local HTTP server that stands in for
+   raw.githubusercontent.com,
+2. creates a fresh database,
+3. runs every step of workflows/ETL_flow.flow in flow order, in this
+   process, with connections to host "db" redirected to the disposable
+   server,
+4. records per-step and per-stage seconds and RSS peak, plus the row count
+   of every table at the end.
+
+Branches that Windmill runs in parallel are run one after another here, so
+each step's time is its own.
+
+The scaling report fits each stage against the number of source rows. A
+log-log slope above --superlinear between two scale factors means that
+stage grows faster than its input.
+
+Postgres comes from --dsn, from --docker, or from initdb/pg_ctl found on
+PATH or under --pg-bin. The clean step imports `wmill`, so the Windmill
+client (pip install wmill) has to be installed locally.
+"""
+
+import argparse
+import contextlib
+import functools
+import glob
+import http.server
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import psycopg2
+import yaml
+
+from benchmarks._workspace import REPO_ROOT, install, load_script
+from benchmarks import synthetic_sources
+
+FLOW_PATH = os.path.join(REPO_ROOT, "workflows", "ETL_flow.flow", "flow.yaml")
+RAW_PREFIX = "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/"
+BENCH_DB = "shopzada_bench"
+PASSWORD = "shopzada"
+DEFAULT_SUPERLINEAR = 1.2
+
+
+# ---------- flow ----------
+
+def flow_steps(flow_path: str = FLOW_PATH) -> list:
+    """Script paths of a Windmill flow, in execution order (branches flattened)."""
+    with open(flow_path) as fh:
+        flow = yaml.safe_load(fh)
+
+    steps = []
+
+    def walk(modules):
+        for module in modules or []:
+            value = module.get("value", {})
+            kind = value.get("type")
+            if kind == "script":
+                steps.append(value["path"])
+            elif kind in ("branchall", "branchone"):
+                for branch in value.get("branches", []):
+                    walk(branch.get("modules"))
+                walk(value.get("default"))
+            elif kind in ("forloopflow", "whileloopflow"):
+                walk(value.get("modules"))
+
+    walk(flow["value"]["modules"])
+    return steps
+
+
+def stage_of(script_path: str) -> str:
+    folder, name = script_path.split("/")[1:3]
+    if folder == "transformers":
+        if name.startswith("DIM_"):
+            return "dimensions"
+        if name.startswith("FACT_"):
+            return "facts"
+        if name == "BUILD_INDEXES":
+            return "indexes"
+        if name == "BUILD_ROLLUPS":
+            return "rollups"
+    return folder
+
+
+# ---------- disposable postgres ----------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(params: dict, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            psycopg2.connect(dbname="postgres", **params).close()
+            return
+        except psycopg2.OperationalError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def _find_pg_bin(pg_bin: str = None) -> str:
+    candidates = [pg_bin] if pg_bin else []
+    on_path = shutil.which("initdb")
+    if on_path:
+        candidates.append(os.path.dirname(on_path))
+    candidates += sorted(glob.glob("/usr/lib/postgresql/*/bin"), reverse=True)
+    candidates += sorted(glob.glob("/usr/local/opt/postgresql*/bin"), reverse=True)
+    for path in candidates:
+        if path and os.path.exists(os.path.join(path, "initdb")) and os.path.exists(os.path.join(path, "pg_ctl")):
+            return path
+    raise RuntimeError("initdb/pg_ctl not found; pass --pg-bin, --docker or --dsn")
+
+
+@contextlib.contextmanager
+def disposable_postgres(dsn: str = None, docker: bool = False, pg_bin: str = None):
+    """Yields psycopg2 connect kwargs (without dbname) for a server we may create databases on."""
+    if dsn:
+        params = psycopg2.extensions.parse_dsn(dsn)
+        params.pop("dbname", None)
+        yield params
+        return
+
+    port = _free_port()
+    params = {"host": "127.0.0.1", "port": port, "user": "postgres", "password": PASSWORD}
+
+    if docker:
+        container = subprocess.check_output([
+            "docker", "run", "-d", "--rm", "--shm-size=1g",
+            "-e", f"POSTGRES_PASSWORD={PASSWORD}", "-p", f"127.0.0.1:{port}:5432", "postgres:16",
+        ], text=True).strip()
+        try:
+            _wait_ready(params)
+            yield params
+        finally:
+            subprocess.run(["docker", "stop", container], stdout=subprocess.DEVNULL, check=False)
+        return
+
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        raise RuntimeError("initdb refuses to run as root; use --docker or --dsn")
+    bin_dir = _find_pg_bin(pg_bin)
+    data_dir = tempfile.mkdtemp(prefix="shopzada_pg_")
+    try:
+        subprocess.run([os.path.join(bin_dir, "initdb"), "-D", data_dir, "-U", "postgres", "--auth=trust"],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([
+            os.path.join(bin_dir, "pg_ctl"), "-D", data_dir, "-w", "-l", os.path.join(data_dir, "server.log"),
+            "-o", f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1", "start",
+        ], check=True, stdout=subprocess.DEVNULL)
+        try:
+            _wait_ready(params)
+            yield params
+        finally:
+            subprocess.run([os.path.join(bin_dir, "pg_ctl"), "-D", data_dir, "-m", "fast", "stop"],
+                           check=False, stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _recreate_database(params: dict, dbname: str):
+    conn = psycopg2.connect(dbname="postgres", **params)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS {dbname} WITH (FORCE);")
+        cur.execute(f"CREATE DATABASE {dbname};")
+    conn.close()
+
+
+@contextlib.contextmanager
+def redirect_connections(params: dict, dbname: str):
+    """
+    Points every psycopg2.connect(host="db", ...) at the disposable server.
+    The clean step builds its SQLAlchemy URL from the DB_* environment
+    variables when it is imported, so those are set too.
+    """
+    original = psycopg2.connect
+    env = {
+        "DB_HOST": str(params.get("host", "localhost")),
+        "DB_PORT": str(params.get("port", 5432)),
+        "DB_USER": str(params.get("user", "postgres")),
+        "DB_PASSWORD": str(params.get("password", "")),
+        "DB_NAME": dbname,
+    }
+    saved_env = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+
+    @functools.wraps(original)
+    def connect(*args, **kwargs):
+        if kwargs.get("host") == "db":
+            kwargs.update(params)
+            kwargs["dbname"] = dbname
+            kwargs.pop("database", None)
+        return original(*args, **kwargs)
+
+    psycopg2.connect = connect
+    try:
+        yield
+    finally:
+        psycopg2.connect = original
+        for k, v in saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+# ---------- sources ----------
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_directory(root: str):
+    handler = functools.partial(_QuietHandler, directory=root)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# (module name, constant) -> URL as written in the script
+_ORIGINAL_URLS = {}
+
+
+def _point_urls_at(module, base_url: str):
+    for name, value in list(vars(module).items()):
+        if name.isupper() and isinstance(value, str) and value.startswith(RAW_PREFIX):
+            _ORIGINAL_URLS[(module.__name__, name)] = value
+    for (module_name, name), url in _ORIGINAL_URLS.items():
+        if module_name == module.__name__:
+            setattr(module, name, base_url + url[len(RAW_PREFIX):])
+
+
+def _sources_for(scale: float, seed: int, sources_root: str = None) -> tuple:
+    """Generate (or reuse) the sources for one scale. Returns (root, manifest)."""
+    root = os.path.join(sources_root, f"sf{scale:g}") if sources_root else tempfile.mkdtemp(prefix="shopzada_src_")
+    manifest_path = os.path.join(root, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as fh:
+            manifest = json.load(fh)
+        if manifest.get("scale") == scale and manifest.get("seed") == seed:
+            print(f"♻️ Reusing sources in {root}")
+            return root, manifest
+    return root, synthetic_sources.main(scale=scale, seed=seed, out_dir=root)
+
+
+# ---------- running ----------
+
+def _row_counts(params: dict, dbname: str) -> dict:
+    conn = psycopg2.connect(dbname=dbname, **params)
+    counts = {}
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+            ORDER BY c.relname;
+        """)
+        for (table,) in cur.fetchall():
+            cur.execute(f'SELECT count(*) FROM "{table}";')
+            counts[table] = cur.fetchone()[0]
+        cur.execute("SELECT pg_database_size(current_database());")
+        counts["_database_size_mb"] = round(cur.fetchone()[0] / (1024 * 1024), 1)
+    conn.close()
+    return counts
+
+
+def run_scale(scale: float, params: dict, steps: list, seed: int = 0, sources_root: str = None) -> dict:
+    from f.common.memory_profile import MemoryProfiler
+
+    root, manifest = _sources_for(scale, seed, sources_root)
+    source_rows = sum(f["rows"] for f in manifest["files"].values())
+    _recreate_database(params, BENCH_DB)
+
+    profiler = MemoryProfiler(enabled=True, trace_allocations=False)
+    step_results, failed = [], None
+    t_start = time.perf_counter()
+    with serve_directory(root) as base_url, redirect_connections(params, BENCH_DB):
+        for path in steps:
+            module = load_script(path)
+            _point_urls_at(module, base_url)
+            print(f"▶️ [{scale:g}x] {path}")
+            try:
+                with profiler.phase(path):
+                    returned = module.main()
+            except Exception as e:  # keep the partial timings
+                failed = {"step": path, "error": f"{type(e).__name__}: {e}"}
+                print(f"❌ {path} failed: {failed['error']}")
+                break
+            phase = profiler.phases[path]
+            step_results.append({
+                "step": path,
+                "stage": stage_of(path),
+                "seconds": phase["seconds"],
+                "rss_peak_mb": phase["rss_peak_mb"],
+                "rss_delta_mb": phase["rss_delta_mb"],
+                "rows_loaded": returned.get("rows_loaded") if isinstance(returned, dict) else None,
+            })
+    total = time.perf_counter() - t_start
+
+    stages = {}
+    for step in step_results:
+        stage = stages.setdefault(step["stage"], {"seconds": 0.0, "rss_peak_mb": 0.0})
+        stage["seconds"] = round(stage["seconds"] + step["seconds"], 3)
+        stage["rss_peak_mb"] = max(stage["rss_peak_mb"], step["rss_peak_mb"])
+
+    if not sources_root:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "scale": scale,
+        "source_rows": source_rows,
+        "total_seconds": round(total, 3),
+        "stages": stages,
+        "steps": step_results,
+        "row_counts": _row_counts(params, BENCH_DB),
+        "failed": failed,
+    }
+
+
+# ---------- scaling report ----------
+
+def scaling_report(runs: list, superlinear: float = DEFAULT_SUPERLINEAR) -> dict:
+    """
+    Seconds per million source rows and the log-log slope between
+    consecutive scale factors, per stage and for the whole pipeline.
+    A slope of 1.0 is linear.
+    """
+    runs = sorted((r for r in runs if not r["failed"]), key=lambda r: r["source_rows"])
+    series = {"total": [(r["source_rows"], r["total_seconds"]) for r in runs]}
+    for r in runs:
+        for stage, s in r["stages"].items():
+            series.setdefault(stage, []).append((r["source_rows"], s["seconds"]))
+
+    report = {}
+    for name, points in series.items():
+        slopes = []
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            if x1 > x0 and y0 > 0 and y1 > 0:
+                slopes.append(round(math.log(y1 / y0) / math.log(x1 / x0), 3))
+        report[name] = {
+            "seconds_per_million_rows": [round(y / x * 1e6, 3) for x, y in points if x],
+            "loglog_slopes": slopes,
+            "superlinear": any(s > superlinear for s in slopes),
+        }
+    return report
+
+
+def plot_curves(runs: list, path: str):
+    """rows vs seconds and rows vs RSS, one line per stage (needs matplotlib)."""
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("ℹ️ matplotlib is not installed; skipping the plot (the JSON report has the same data).")
+        return
+
+    runs = sorted((r for r in runs if not r["failed"]), key=lambda r: r["source_rows"])
+    stages = sorted({s for r in runs for s in r["stages"]})
+    fig, (ax_t, ax_m) = plt.subplots(1, 2, figsize=(13, 5))
+    x = [r["source_rows"] for r in runs]
+    for stage in stages:
+        ax_t.plot(x, [r["stages"].get(stage, {}).get("seconds") for r in runs], marker="o", label=stage)
+        ax_m.plot(x, [r["stages"].get(stage, {}).get("rss_peak_mb") for r in runs], marker="o", label=stage)
+    ax_t.plot(x, [r["total_seconds"] for r in runs], marker="s", color="black", label="total")
+    if x:
+        # linear reference through the first total point
+        ax_t.plot(x, [runs[0]["total_seconds"] * xi / x[0] for xi in x], linestyle=":", color="grey", label="linear")
+    for ax, label in ((ax_t, "seconds"), (ax_m, "RSS peak (MB)")):
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("source rows")
+        ax.set_ylabel(label)
+        ax.grid(True, which="both", alpha=0.3)
+    ax_t.legend(fontsize="small")
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    print(f"📈 Wrote scaling curves to {path}")
+
+
+def main(scales=(0.1, 1.0), seed: int = 0, dsn: str = None, docker: bool = False, pg_bin: str = None,
+         flow_path: str = FLOW_PATH, sources_root: str = None, out: str = None, plot: str = None,
+         superlinear: float = DEFAULT_SUPERLINEAR) -> dict:
+    install()
+    steps = flow_steps(flow_path)
+    print(f"⏳ Pipeline benchmark: {len(steps)} steps from {os.path.relpath(flow_path, REPO_ROOT)}, "
+          f"scales={list(scales)}")
+
+    runs = []
+    with disposable_postgres(dsn=dsn, docker=docker, pg_bin=pg_bin) as params:
+        for scale in scales:
+            runs.append(run_scale(scale, params, steps, seed=seed, sources_root=sources_root))
+            r = runs[-1]
+            print(f"✅ {scale:g}x: {r['source_rows']:,} source rows in {r['total_seconds']:.1f}s "
+                  + " ".join(f"{k}={v['seconds']:.1f}s" for k, v in r["stages"].items()))
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "flow": os.path.relpath(flow_path, REPO_ROOT),
+            "steps": steps,
+            "seed": seed,
+            "python": sys.version.split()[0],
+        },
+        "runs": runs,
+        "scaling": scaling_report(runs, superlinear),
+    }
+
+    print("📊 Scaling (log-log slope between scale factors; 1.0 = linear):")
+    for name, s in report["scaling"].items():
+        flag = "  ⚠️ super-linear" if s["superlinear"] else ""
+        print(f"  {name:<12} slopes={s['loglog_slopes']} s/Mrow={s['seconds_per_million_rows']}{flag}")
+
+    if out:
+        with open(out, "w") as fh:
+            json.dump(report, fh, indent=2, default=str)
+        print(f"📝 Wrote results to {out}")
+    if plot:
+        plot_curves(runs, plot)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end Shopzada pipeline benchmark")
+    parser.add_argument("--scales", default="0.1,1", help="comma-separated scale factors")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dsn", default=os.getenv("SHOPZADA_BENCH_DSN"),
+                        help="use an existing server (needs CREATE DATABASE rights)")
+    parser.add_argument("--docker", action="store_true", help="start postgres:16 in docker")
+    parser.add_argument("--pg-bin", default=None, help="directory with initdb/pg_ctl")
+    parser.add_argument("--flow", default=FLOW_PATH)
+    parser.add_argument("--sources-root", default=None,
+                        help="keep generated sources here (one sf<scale> folder each) and reuse them")
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--plot", default=None, help="write scaling curves (PNG) here")
+    parser.add_argument("--superlinear", type=float, default=DEFAULT_SUPERLINEAR)
+    args = parser.parse_args()
+    main(
+        scales=[float(s) for s in args.scales.split(",") if s],
+        seed=args.seed,
+        dsn=args.dsn,
+        docker=args.docker,
+        pg_bin=args.pg_bin,
+        flow_path=args.flow,
+        sources_root=args.sources_root,
+        out=args.out,
+        plot=args.plot,
+        superlinear=args.superlinear,
+    )
@@ -0,0 +1,817 @@
+"""
+Synthetic Shopzada source generator.
+
+Writes every departmental source file at a chosen scale factor, in the
+same native format, layout and dirtiness as the files under datasets/:
+
+    python -m benchmarks.synthetic_sources --scale 10 --seed 7 --out /tmp/shopzada_sf10
+
+The output directory mirrors the GitHub raw layout the ingestion scripts
+download from (<out>/datasets/<Department>/<file>), so it can be served
+as-is in place of https://raw.githubusercontent.com/.../main/.
+
+Every value is a pure function of (seed, entity, row index). Files are
+written in chunks with no cross-chunk state. That keeps the output
+identical for a given seed, keeps order_id/user_id/merchant_id/staff_id/
+product_id/campaign_id consistent across all sources, and keeps memory
+flat. The exception is the pickle order slice, which has to be built in
+one piece.
+"""
+
+import argparse
+import html
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+# Row counts at scale factor 1x. These roughly match the shipped datasets/.
+BASE_COUNTS = {
+    "users": 5_000,
+    "merchants": 5_000,
+    "staff": 5_000,
+    "products": 750,
+    "campaigns": 10,
+    "orders": 500_000,
+}
+
+# Share of extra rows re-emitted for an existing id (soft duplicates)
+SOFT_DUPLICATE_RATE = 0.04
+# Share of order rows written twice into the same slice (exact duplicates)
+EXACT_DUPLICATE_RATE = 0.005
+CAMPAIGN_LINK_RATE = 0.30
+DELAY_RATE = 0.10
+MAX_LINES_PER_ORDER = 5
+
+CHUNK_ROWS = 250_000
+
+# Excel caps a sheet at 1,048,576 rows (one is the header)
+XLSX_MAX_ROWS = 1_048_575
+
+# (file name, format, first day, last day exclusive). Orders are assigned to
+# slices in proportion to the number of days each slice covers.
+ORDER_SLICES = [
+    ("order_data_20200101-20200701.parquet", "parquet", "2020-01-01", "2020-07-01"),
+    ("order_data_20200701-20211001.pickle", "pickle", "2020-07-01", "2021-10-01"),
+    ("order_data_20211001-20220101.csv", "csv", "2021-10-01", "2022-01-01"),
+    ("order_data_20220101-20221201.xlsx", "xlsx", "2022-01-01", "2022-12-01"),
+    ("order_data_20221201-20230601.json", "json", "2022-12-01", "2023-06-01"),
+    ("order_data_20230601-20240101.html", "html", "2023-06-01", "2024-01-01"),
+]
+
+# Line item / order-merchant sources are split across three files by order range
+LINE_ITEM_SPLIT = [("1", "csv"), ("2", "csv"), ("3", "parquet")]
+ORDER_MERCHANT_SPLIT = [("1", "parquet"), ("2", "parquet"), ("3", "csv")]
+
+DEPARTMENTS = {
+    "business": "Business Department",
+    "customer": "Customer Management Department",
+    "enterprise": "Enterprise Department",
+    "marketing": "Marketing Department",
+    "operations": "Operations Department",
+}
+
+FIRST_NAMES = np.array([
+    "Zion", "Kattie", "Aiden", "Randall", "Christian", "Edgardo", "Jordi", "Maria", "Liam", "Noah",
+    "Olivia", "Emma", "Ava", "Sophia", "Mason", "Lucas", "Mia", "Amelia", "Ethan", "Harper",
+    "Elijah", "Karl", "Andre", "Brandon", "Ian", "Rob", "Mark", "Kernel", "Luna", "Chloe",
+])
+LAST_NAMES = np.array([
+    "Feest", "Bergstrom", "Corwin", "Hessel", "Fadel", "Gleichner", "Senger", "Stamm", "Nader",
+    "Smith", "Johnson", "Brown", "Garcia", "Miller", "Davis", "Lopez", "Wilson", "Anderson",
+    "Thomas", "Moore", "Martin", "Lee", "Walker", "Hall", "Young", "King", "Wright", "Scott",
+])
+STREET_WORDS = np.array([
+    "West Trace", "North Isle", "Springs", "Coves", "Land", "Camp", "Expressway", "Centers",
+    "Harbor", "Ridge", "Meadow", "Summit", "Valley", "Park", "Station", "Mill",
+])
+STREET_SUFFIXES = np.array(["side", "bury", "view", "haven", "chester", "shire", "town", "burgh", "port", "ville"])
+STATES = np.array([
+    "New Jersey", "South Carolina", "Colorado", "Virginia", "Maine", "Texas", "New Mexico",
+    "Rhode Island", "Ohio", "Oregon", "Florida", "Georgia", "Nevada", "Utah", "Iowa", "Kansas",
+])
+CITIES = np.array([
+    "Birmingham", "Boise", "Cleveland", "Atlanta", "Indianapolis", "Omaha", "San Diego",
+    "Corpus Christi", "Bakersfield", "Denver", "Austin", "Tampa", "Reno", "Fresno", "Tulsa",
+])
+COUNTRIES = np.array([
+    "Hong Kong", "Brunei Darussalam", "Sint Maarten (Dutch part)", "Mali", "Chad", "Cook Islands",
+    "Pakistan", "Albania", "Timor-Leste", "Philippines", "Japan", "Kenya", "Peru", "Norway",
+])
+USER_TYPES = np.array(["basic"] * 7 + ["verified"] * 2 + ["premium"])
+GENDERS = np.array(["male", "female"])
+JOB_TITLES = np.array([
+    "Student", "Student", "Student", "Technician", "Coordinator", "Consultant", "Planner",
+    "Engineer", "Designer", "Analyst", "Manager", "Architect",
+])
+JOB_LEVELS = np.array([
+    "Paradigm", "Markets", "Configuration", "Infrastructure", "Web", "Interactions", "Directives",
+    "Assurance", "Program", "Operations", "Creative", "Brand", "Metrics", "Integration", "Identity",
+])
+STAFF_LEVELS = np.array(["entry"] * 5 + ["intermediate"] * 3 + ["senior"] * 2)
+BANKS = np.array(["bpi", "bdo", "chinabank", "robinsonsbank", "metrobank", "mayabank", "eastwest", "securitybank"])
+MERCHANT_WORDS = np.array([
+    "Whitby", "YourMapper", "United", "TransparaGov", "Mayflower", "Blue", "Apex", "Nimbus",
+    "Golden", "Summit", "Vertex", "Harbor", "Pioneer", "Quantum", "Evergreen", "Atlas",
+])
+MERCHANT_SUFFIXES = np.array(["Group", "Inc", "Co", "Holdings", "Trading", "Labs", "Partners", "Mart"])
+PRODUCT_TYPES = np.array([
+    "readymade_breakfast", "readymade_lunch", "readymade_dinner", "grocery", "accessories",
+    "electronics and technology", "toys and entertainment", "furniture", "kitchenware", "tools",
+])
+PRODUCT_WORDS = np.array([
+    "Grandmas", "swedish", "thin", "pancakes", "Wok", "wok", "Widget", "Classic", "Deluxe",
+    "Organic", "Spicy", "Crispy", "Smart", "Mini", "Ultra", "Eco",
+])
+CAMPAIGN_NAMES = np.array([
+    "wouldn't you know it", "could be written on the back of a postage stamp", "me neither",
+    "bigger than a breadbox", "not my cup of tea", "the whole nine yards", "once in a blue moon",
+])
+CAMPAIGN_BLURBS = np.array([
+    "Twee retro vinyl single-origin coffee sartorial fanny pack brunch offal health.",
+    "Fanny pack gentrify cardigan messenger bag.",
+    "DIY pug leggings everyday craft beer cardigan knausgaard +1 crucifix flannel.",
+    "Kale chips artisan banh mi selvage pour-over.",
+])
+# The three dirty spellings that show up in campaign_data.csv
+DISCOUNT_FORMATS = ("{}%", "{}pct", "{}%%")
+# The dirty quantity units seen in line_item_data_prices
+QUANTITY_UNITS = np.array(["pieces", "px", "PC", "pcs"])
+
+
+# ---------- deterministic hashing ----------
+
+_MASK = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _splitmix(x: np.ndarray) -> np.ndarray:
+    x = x.astype(np.uint64, copy=True)
+    with np.errstate(over="ignore"):
+        x += np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class _Hasher:
+    """Per-(seed, entity) stream of 64-bit hashes addressed by row index."""
+
+    def __init__(self, seed: int, entity: str):
+        salt = np.frombuffer(entity.encode().ljust(8, b"_")[:8], dtype=np.uint64)
+        self.key = _splitmix(np.array([seed], dtype=np.uint64) ^ salt)[0]
+
+    def bits(self, idx: np.ndarray, field: int) -> np.ndarray:
+        with np.errstate(over="ignore"):
+            mixed = idx.astype(np.uint64) * np.uint64(0x100000001B3) + np.uint64(field)
+        return _splitmix(mixed ^ self.key)
+
+    def ints(self, idx, field, n) -> np.ndarray:
+        return (self.bits(idx, field) % np.uint64(n)).astype(np.int64)
+
+    def unit(self, idx, field) -> np.ndarray:
+        return (self.bits(idx, field) >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+    def pick(self, idx, field, choices: np.ndarray) -> np.ndarray:
+        return choices[self.ints(idx, field, len(choices))]
+
+
+# ---------- vectorized formatting ----------
+
+_HEX = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+_UUID_DASHES = (8, 13, 18, 23)
+
+
+def _uuid_strings(hi: np.ndarray, lo: np.ndarray) -> np.ndarray:
+    """Format two uint64 arrays as version-4 UUID strings, without a Python loop."""
+    hi = (hi & np.uint64(0xFFFFFFFFFFFF0FFF)) | np.uint64(0x0000000000004000)
+    lo = (lo & np.uint64(0x3FFFFFFFFFFFFFFF)) | np.uint64(0x8000000000000000)
+    raw = np.empty((len(hi), 2), dtype=">u8")
+    raw[:, 0] = hi
+    raw[:, 1] = lo
+    octets = raw.view(np.uint8).reshape(-1, 16)
+    nibbles = np.empty((len(hi), 32), dtype=np.uint8)
+    nibbles[:, 0::2] = octets >> 4
+    nibbles[:, 1::2] = octets & 0x0F
+    chars = _HEX[nibbles]
+    out = np.full((len(hi), 36), ord("-"), dtype=np.uint8)
+    out[:, 0:8] = chars[:, 0:8]
+    out[:, 9:13] = chars[:, 8:12]
+    out[:, 14:18] = chars[:, 12:16]
+    out[:, 19:23] = chars[:, 16:20]
+    out[:, 24:36] = chars[:, 20:32]
+    return out.view("S36").ravel().astype(str)
+
+
+def _prefixed_ids(prefix: str, numbers: np.ndarray, width: int) -> np.ndarray:
+    digits = np.char.zfill(numbers.astype(str), width)
+    return np.char.add(prefix, digits)
+
+
+def _timestamps(h: _Hasher, idx, field, start: str, end: str, unit: str = "s") -> pd.DatetimeIndex:
+    lo = np.datetime64(start, unit).astype(np.int64)
+    hi = np.datetime64(end, unit).astype(np.int64)
+    offsets = (h.unit(idx, field) * (hi - lo)).astype(np.int64)
+    return pd.DatetimeIndex((lo + offsets).astype(f"datetime64[{unit}]"))
+
+
+def _names(h: _Hasher, idx, field) -> np.ndarray:
+    return np.char.add(np.char.add(h.pick(idx, field, FIRST_NAMES), " "), h.pick(idx, field + 1, LAST_NAMES))
+
+
+def _streets(h: _Hasher, idx, field) -> np.ndarray:
+    number = (h.ints(idx, field, 99_000) + 100).astype(str)
+    street = np.char.add(np.char.add(number, " "), h.pick(idx, field + 1, STREET_WORDS))
+    return np.char.add(np.char.add(street, " "), h.pick(idx, field + 2, STREET_SUFFIXES))
+
+
+def _phones(h: _Hasher, idx, field) -> np.ndarray:
+    """Phone numbers in the three mixed layouts used by merchant/staff data."""
+    a = np.char.zfill(h.ints(idx, field, 1000).astype(str), 3)
+    b = np.char.zfill(h.ints(idx, field + 1, 1000).astype(str), 3)
+    c = np.char.zfill(h.ints(idx, field + 2, 10000).astype(str), 4)
+    layout = h.ints(idx, field + 3, 3)
+    dotted = np.char.add(np.char.add(np.char.add(np.char.add(a, "."), b), "."), c)
+    paren = np.char.add(np.char.add(np.char.add(np.char.add("(", a), ")"), b), np.char.add("-", c))
+    dashed = np.char.add(np.char.add(np.char.add("1-", a), np.char.add("-", b)), np.char.add("-", c))
+    return np.where(layout == 0, dotted, np.where(layout == 1, paren, dashed))
+
+
+# ---------- the generator ----------
+
+class ShopzadaGenerator:
+    """
+    Generates every Shopzada source at `scale` x the shipped volume.
+
+    Entities are numbered 0..n-1. Every source derives its ids from those
+    numbers, so a foreign key drawn anywhere always refers to a row that
+    exists in its master source.
+    """
+
+    def __init__(self, scale: float = 1.0, seed: int = 0, chunk_rows: int = CHUNK_ROWS):
+        if scale <= 0:
+            raise ValueError("scale must be positive")
+        self.scale = scale
+        self.seed = seed
+        self.chunk_rows = chunk_rows
+        self.counts = {k: max(1, int(round(v * scale))) for k, v in BASE_COUNTS.items()}
+
+        # Zero-padded like the real sources (the widths of ids.ID_KINDS);
+        # larger counts just get more digits, as they would upstream
+        self._widths = {"users": 5, "merchants": 4, "staff": 7, "products": 5, "campaigns": 5}
+        self._h = {name: _Hasher(seed, name) for name in (
+            "users", "userdup", "jobs", "cards", "merchant", "mercdup", "staff", "staffdup",
+            "product", "campaign", "orders", "lines", "links", "delays",
+        )}
+
+        # Orders are numbered in slice order, so each slice is a contiguous range
+        days = [(pd.Timestamp(e) - pd.Timestamp(s)).days for _, _, s, e in ORDER_SLICES]
+        bounds = np.floor(np.cumsum([0] + days) / sum(days) * self.counts["orders"]).astype(np.int64)
+        self.slice_ranges = [(int(bounds[i]), int(bounds[i + 1])) for i in range(len(ORDER_SLICES))]
+
+    # ----- id helpers shared by every source -----
+
+    def user_ids(self, idx):
+        return _prefixed_ids("USER", idx, self._widths["users"])
+
+    def merchant_ids(self, idx):
+        return _prefixed_ids("MERCHANT", idx, self._widths["merchants"])
+
+    def staff_ids(self, idx):
+        return _prefixed_ids("STAFF", idx, self._widths["staff"])
+
+    def product_ids(self, idx):
+        return _prefixed_ids("PRODUCT", idx, self._widths["products"])
+
+    def campaign_ids(self, idx):
+        return _prefixed_ids("CAMPAIGN", idx, self._widths["campaigns"])
+
+    def order_ids(self, idx):
+        h = self._h["orders"]
+        return _uuid_strings(h.bits(idx, 0), h.bits(idx, 1))
+
+    def _chunks(self, start: int, stop: int):
+        for lo in range(start, stop, self.chunk_rows):
+            yield np.arange(lo, min(lo + self.chunk_rows, stop), dtype=np.int64)
+
+    # ----- soft-duplicated master data -----
+
+    def _with_soft_duplicates(self, n: int, dup_hasher: _Hasher):
+        """Row r < n is entity r; rows past n re-emit a random earlier entity."""
+        n_rows = n + int(n * SOFT_DUPLICATE_RATE)
+
+        def entity_of(rows):
+            out = rows.copy()
+            dup = rows >= n
+            out[dup] = dup_hasher.ints(rows[dup], 0, n)
+            return out
+
+        return n_rows, entity_of
+
+    def users_frame(self, rows, entity_of) -> pd.DataFrame:
+        h, hd = self._h["users"], self._h["userdup"]
+        ent = entity_of(rows)
+        dup = rows != ent
+        created = _timestamps(h, ent, 10, "2020-01-01", "2023-12-31")
+        # duplicates get their own creation_date, which decides the master
+        created = created.where(~dup, _timestamps(hd, rows, 11, "2020-01-01", "2023-12-31"))
+        city = np.where(dup & (hd.ints(rows, 12, 2) == 0), hd.pick(rows, 13, CITIES), h.pick(ent, 14, CITIES))
+        octets = [np.char.zfill(np.char.lower(np.vectorize(lambda v: format(v, "x"))(h.ints(ent, 20 + i, 256))), 2)
+                  for i in range(6)]
+        mac = octets[0]
+        for o in octets[1:]:
+            mac = np.char.add(np.char.add(mac, ":"), o)
+        return pd.DataFrame({
+            "user_id": self.user_ids(ent),
+            "creation_date": created.strftime("%Y-%m-%d %H:%M:%S"),
+            "name": _names(h, ent, 1),
+            "street": _streets(h, ent, 3),
+            "state": h.pick(ent, 6, STATES),
+            "city": city,
+            "country": h.pick(ent, 7, COUNTRIES),
+            "birthdate": _timestamps(h, ent, 8, "1950-01-01", "2008-01-01").strftime("%Y-%m-%d %H:%M:%S"),
+            "gender": h.pick(ent, 9, GENDERS),
+            "device_address": mac,
+            "user_type": h.pick(ent, 15, USER_TYPES),
+        })
+
+    def user_job_frame(self, rows, entity_of) -> pd.DataFrame:
+        h = self._h["jobs"]
+        ent = entity_of(rows)
+        title = h.pick(rows, 1, JOB_TITLES)
+        level = h.pick(rows, 2, JOB_LEVELS).astype(object)
+        level[title == "Student"] = None  # students have no job level (NaN in source)
+        return pd.DataFrame({
+            "user_id": self.user_ids(ent),
+            "name": _names(self._h["users"], ent, 1),
+            "job_title": title,
+            "job_level": level,
+        }, index=rows)
+
+    def credit_card_frame(self, rows) -> pd.DataFrame:
+        h = self._h["cards"]
+        return pd.DataFrame({
+            "user_id": self.user_ids(rows),
+            "name": _names(self._h["users"], rows, 1),
+            "credit_card_number": (h.ints(rows, 1, 9_000_000_000) + 1_000_000_000).astype(np.int64),
+            "issuing_bank": h.pick(rows, 2, BANKS),
+        })
+
+    def merchants_frame(self, rows, entity_of) -> pd.DataFrame:
+        h, hd = self._h["merchant"], self._h["mercdup"]
+        ent = entity_of(rows)
+        dup = rows != ent
+        created = _timestamps(h, ent, 1, "2020-01-01", "2023-12-31")
+        created = created.where(~dup, _timestamps(hd, rows, 2, "2020-01-01", "2023-12-31"))
+        return pd.DataFrame({
+            "merchant_id": self.merchant_ids(ent),
+            "creation_date": created.strftime("%Y-%m-%d %H:%M:%S"),
+            "name": np.char.add(np.char.add(h.pick(ent, 3, MERCHANT_WORDS), " "), h.pick(ent, 4, MERCHANT_SUFFIXES)),
+            "street": _streets(h, ent, 5),
+            "state": h.pick(ent, 8, STATES),
+            "city": h.pick(ent, 9, CITIES),
+            "country": h.pick(ent, 10, COUNTRIES),
+            "contact_number": _phones(h, ent, 11),
+        }, index=rows)
+
+    def staff_frame(self, rows, entity_of) -> pd.DataFrame:
+        h, hd = self._h["staff"], self._h["staffdup"]
+        ent = entity_of(rows)
+        dup = rows != ent
+        created = _timestamps(h, ent, 1, "2020-01-01", "2023-12-31")
+        created = created.where(~dup, _timestamps(hd, rows, 2, "2020-01-01", "2023-12-31"))
+        return pd.DataFrame({
+            "staff_id": self.staff_ids(ent),
+            "name": _names(h, ent, 3),
+            "job_level": h.pick(ent, 5, STAFF_LEVELS),
+            "street": _streets(h, ent, 6),
+            "state": h.pick(ent, 9, STATES),
+            "city": h.pick(ent, 10, CITIES),
+            "country": h.pick(ent, 11, COUNTRIES),
+            "contact_number": _phones(h, ent, 12),
+            "creation_date": created.strftime("%Y-%m-%d %H:%M:%S"),
+        }, index=rows)
+
+    def product_names(self, rows) -> np.ndarray:
+        h = self._h["product"]
+        return np.char.add(np.char.add(h.pick(rows, 1, PRODUCT_WORDS), " "), h.pick(rows, 2, PRODUCT_WORDS))
+
+    def products_frame(self, rows) -> pd.DataFrame:
+        h = self._h["product"]
+        return pd.DataFrame({
+            "product_id": self.product_ids(rows),
+            "product_name": self.product_names(rows),
+            "product_type": h.pick(rows, 3, PRODUCT_TYPES),
+            "price": np.round(h.unit(rows, 4) * 95 + 5, 2),
+        })
+
+    def product_prices(self, product_idx) -> np.ndarray:
+        return np.round(self._h["product"].unit(product_idx, 4) * 95 + 5, 2)
+
+    def campaigns_frame(self, rows) -> pd.DataFrame:
+        h = self._h["campaign"]
+        pct = h.ints(rows, 3, 50) + 1
+        fmt = h.ints(rows, 4, len(DISCOUNT_FORMATS))
+        discount = [DISCOUNT_FORMATS[f].format(p) for f, p in zip(fmt, pct)]
+        blurb = h.pick(rows, 2, CAMPAIGN_BLURBS)
+        author = _names(self._h["users"], h.ints(rows, 5, self.counts["users"]), 1)
+        description = ['"' + '""' + b + '"" - ' + a + '"' for b, a in zip(blurb, author)]
+        return pd.DataFrame({
+            "campaign_id": self.campaign_ids(rows),
+            "campaign_name": h.pick(rows, 1, CAMPAIGN_NAMES),
+            "campaign_description": description,
+            "discount": discount,
+        }, index=rows)
+
+    # ----- orders and everything keyed by order -----
+
+    def order_dates(self, idx) -> pd.DatetimeIndex:
+        if len(idx) and (idx.min() < 0 or idx.max() >= self.counts["orders"]):
+            raise ValueError(f"order index outside 0..{self.counts['orders'] - 1}")
+        out = np.empty(len(idx), dtype="datetime64[s]")
+        for (lo, hi), (_, _, start, end) in zip(self.slice_ranges, ORDER_SLICES):
+            sel = (idx >= lo) & (idx < hi)
+            if sel.any():
+                out[sel] = _timestamps(self._h["orders"], idx[sel], 2, start, end).values.astype("datetime64[s]")
+        return pd.DatetimeIndex(out).normalize()
+
+    def estimated_arrival(self, idx) -> np.ndarray:
+        return self._h["orders"].ints(idx, 4, 14) + 2
+
+    def orders_frame(self, idx, date_format: str = None) -> pd.DataFrame:
+        h = self._h["orders"]
+        dates = self.order_dates(idx)
+        return pd.DataFrame({
+            "order_id": self.order_ids(idx),
+            "user_id": self.user_ids(h.ints(idx, 3, self.counts["users"])),
+            "estimated arrival": np.char.add(self.estimated_arrival(idx).astype(str), "days"),
+            "transaction_date": dates.strftime(date_format or "%Y-%m-%d"),
+        }, index=idx)
+
+    def with_exact_duplicates(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Repeat a few rows in place (drop_duplicates() must remove them)."""
+        idx = frame.index.to_numpy()
+        repeats = np.where(self._h["orders"].unit(idx, 9) < EXACT_DUPLICATE_RATE, 2, 1)
+        return frame.iloc[np.repeat(np.arange(len(frame)), repeats)]
+
+    def line_count(self, order_idx) -> np.ndarray:
+        return self._h["lines"].ints(order_idx, 0, MAX_LINES_PER_ORDER) + 1
+
+    def line_items(self, order_idx):
+        """
+        Line items for a block of orders, in file order. Returns the prices
+        frame and the products frame; row i of one pairs with row i of the
+        other, which is how the two files line up in production.
+        """
+        h = self._h["lines"]
+        counts = self.line_count(order_idx)
+        owner = np.repeat(order_idx, counts)
+        line_no = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        key = owner * MAX_LINES_PER_ORDER + line_no
+        product = h.ints(key, 1, self.counts["products"])
+        quantity = h.ints(key, 2, 9) + 1
+        order_ids = np.repeat(self.order_ids(order_idx), counts)
+        index = pd.RangeIndex(len(owner))
+
+        unit = h.pick(key, 3, QUANTITY_UNITS)
+        prices = pd.DataFrame({
+            "order_id": order_ids,
+            "price": self.product_prices(product),
+            "quantity": np.char.add(quantity.astype(str), unit),
+        }, index=index)
+        products = pd.DataFrame({
+            "order_id": order_ids,
+            "product_name": self.product_names(product),
+            "product_id": self.product_ids(product),
+        }, index=index)
+        return prices, products
+
+    def order_merchant_frame(self, idx) -> pd.DataFrame:
+        h = self._h["orders"]
+        return pd.DataFrame({
+            "order_id": self.order_ids(idx),
+            "merchant_id": self.merchant_ids(h.ints(idx, 5, self.counts["merchants"])),
+            "staff_id": self.staff_ids(h.ints(idx, 6, self.counts["staff"])),
+        }, index=idx)
+
+    def campaign_links_frame(self, idx) -> pd.DataFrame:
+        h = self._h["links"]
+        idx = idx[h.unit(idx, 0) < CAMPAIGN_LINK_RATE]
+        return pd.DataFrame({
+            "transaction_date": self.order_dates(idx).strftime("%Y-%m-%d"),
+            "campaign_id": self.campaign_ids(h.ints(idx, 1, self.counts["campaigns"])),
+            "order_id": self.order_ids(idx),
+            "estimated arrival": np.char.add(self.estimated_arrival(idx).astype(str), "days"),
+            "availed": h.ints(idx, 2, 2),
+        }, index=idx)
+
+    def delays_frame(self, idx) -> pd.DataFrame:
+        h = self._h["delays"]
+        idx = idx[h.unit(idx, 0) < DELAY_RATE]
+        return pd.DataFrame({
+            "order_id": self.order_ids(idx),
+            "delay in days": h.ints(idx, 1, 7) + 1,
+        }, index=idx)
+
+    # ----- writing -----
+
+    def write_all(self, out_dir: str) -> dict:
+        """Write every source under out_dir/datasets/. Returns per-file row counts."""
+        written = {}
+        dirs = {k: os.path.join(out_dir, "datasets", v) for k, v in DEPARTMENTS.items()}
+        for d in dirs.values():
+            os.makedirs(d, exist_ok=True)
+
+        def record(path, rows, t0):
+            rel = os.path.relpath(path, out_dir)
+            written[rel] = {"rows": int(rows), "seconds": round(time.perf_counter() - t0, 2)}
+            print(f"  wrote {rel}: {rows:,} rows ({written[rel]['seconds']}s)")
+
+        n = self.counts
+
+        # Customer Management
+        t0 = time.perf_counter()
+        n_rows, entity_of = self._with_soft_duplicates(n["users"], self._h["userdup"])
+        path = os.path.join(dirs["customer"], "user_data.json")
+        _write_json_columns(path, (self.users_frame(r, entity_of) for r in self._chunks(0, n_rows)))
+        record(path, n_rows, t0)
+
+        t0 = time.perf_counter()
+        n_rows, entity_of = self._with_soft_duplicates(n["users"], self._h["jobs"])
+        path = os.path.join(dirs["customer"], "user_job.csv")
+        _write_csv(path, (self.user_job_frame(r, entity_of) for r in self._chunks(0, n_rows)), index=True)
+        record(path, n_rows, t0)
+
+        t0 = time.perf_counter()
+        path = os.path.join(dirs["customer"], "user_credit_card.pickle")
+        self.credit_card_frame(np.arange(n["users"])).to_pickle(path)
+        record(path, n["users"], t0)
+
+        # Enterprise
+        t0 = time.perf_counter()
+        n_rows, entity_of = self._with_soft_duplicates(n["merchants"], self._h["mercdup"])
+        path = os.path.join(dirs["enterprise"], "merchant_data.html")
+        _write_html(path, (self.merchants_frame(r, entity_of) for r in self._chunks(0, n_rows)))
+        record(path, n_rows, t0)
+
+        t0 = time.perf_counter()
+        n_rows, entity_of = self._with_soft_duplicates(n["staff"], self._h["staffdup"])
+        path = os.path.join(dirs["enterprise"], "staff_data.html")
+        _write_html(path, (self.staff_frame(r, entity_of) for r in self._chunks(0, n_rows)))
+        record(path, n_rows, t0)
+
+        for (suffix, fmt), (lo, hi) in zip(ORDER_MERCHANT_SPLIT, _split_range(n["orders"], 3)):
+            t0 = time.perf_counter()
+            path = os.path.join(dirs["enterprise"], f"order_with_merchant_data{suffix}.{fmt}")
+            frames = (self.order_merchant_frame(r) for r in self._chunks(lo, hi))
+            _write_parquet(path, frames) if fmt == "parquet" else _write_csv(path, frames, index=True)
+            record(path, hi - lo, t0)
+
+        # Business
+        t0 = time.perf_counter()
+        path = os.path.join(dirs["business"], "product_list.xlsx")
+        products = self.products_frame(np.arange(n["products"]))
+        # a few exact duplicate rows, as in the source workbook
+        products = pd.concat([products, products.iloc[:: max(1, len(products) // 10)]], ignore_index=True)
+        rows = _write_xlsx(path, [products])
+        record(path, rows, t0)
+
+        # Marketing
+        t0 = time.perf_counter()
+        path = os.path.join(dirs["marketing"], "campaign_data.csv")
+        _write_tab_stuffed_csv(path, self.campaigns_frame(np.arange(n["campaigns"])))
+        record(path, n["campaigns"], t0)
+
+        t0 = time.perf_counter()
+        path = os.path.join(dirs["marketing"], "transactional_campaign_data.csv")
+        rows = _write_csv(path, (self.campaign_links_frame(r) for r in self._chunks(0, n["orders"])), index=True)
+        record(path, rows, t0)
+
+        # Operations
+        # leave room for the exact duplicates written into the slice
+        xlsx_cap = int(XLSX_MAX_ROWS / (1 + 2 * EXACT_DUPLICATE_RATE))
+        overflow = []
+        for (name, fmt, _, _), (lo, hi) in zip(ORDER_SLICES, self.slice_ranges):
+            t0 = time.perf_counter()
+            path = os.path.join(dirs["operations"], name)
+            if fmt == "xlsx" and hi - lo > xlsx_cap:
+                # Excel cannot hold the slice. Keep the cap and hand the rest
+                # to the CSV slice so no order disappears.
+                print(f"  ⚠️ {name}: {hi - lo:,} rows exceed the Excel limit; "
+                      f"{hi - lo - xlsx_cap:,} rows moved to the CSV slice")
+                overflow.append((lo + xlsx_cap, hi))
+                hi = lo + xlsx_cap
+            rows = self._write_order_slice(path, fmt, lo, hi, extra=overflow if fmt == "csv" else ())
+            record(path, rows, t0)
+        if overflow:
+            # the CSV slice comes before the xlsx slice, so append afterwards
+            t0 = time.perf_counter()
+            name = next(s[0] for s in ORDER_SLICES if s[1] == "csv")
+            path = os.path.join(dirs["operations"], name)
+            rows = _write_csv(path, (self.with_exact_duplicates(self.orders_frame(r, "%m/%d/%y"))
+                                     for lo, hi in overflow for r in self._chunks(lo, hi)), index=True, append=True)
+            record(path + " (overflow)", rows, t0)
+
+        for suffix, fmt in LINE_ITEM_SPLIT:
+            lo, hi = _split_range(n["orders"], 3)[int(suffix) - 1]
+            t0 = time.perf_counter()
+            price_path = os.path.join(dirs["operations"], f"line_item_data_prices{suffix}.{fmt}")
+            product_path = os.path.join(dirs["operations"], f"line_item_data_products{suffix}.{fmt}")
+            rows = _write_line_items(self, price_path, product_path, fmt, lo, hi)
+            record(price_path, rows, t0)
+            record(product_path, rows, t0)
+
+        t0 = time.perf_counter()
+        path = os.path.join(dirs["operations"], "order_delays.html")
+        rows = _write_html(path, (self.delays_frame(r) for r in self._chunks(0, n["orders"])))
+        record(path, rows, t0)
+
+        return {"scale": self.scale, "seed": self.seed, "counts": self.counts, "files": written}
+
+    def _write_order_slice(self, path, fmt, lo, hi, extra=()) -> int:
+        frames = (self.with_exact_duplicates(self.orders_frame(r, "%m/%d/%y" if fmt == "csv" else None))
+                  for r in self._chunks(lo, hi))
+        if fmt == "csv":
+            return _write_csv(path, frames, index=True)
+        if fmt == "parquet":
+            return _write_parquet(path, frames, index=True)
+        if fmt == "json":
+            return _write_json_columns(path, frames)
+        if fmt == "html":
+            return _write_html(path, frames)
+        if fmt == "xlsx":
+            return _write_xlsx(path, frames)
+        if fmt == "pickle":
+            df = pd.concat(list(frames))
+            df.to_pickle(path)
+            return len(df)
+        raise ValueError(f"Unknown order slice format {fmt}")
+
+
+def _split_range(n: int, parts: int):
+    bounds = np.linspace(0, n, parts + 1).astype(np.int64)
+    return [(int(bounds[i]), int(bounds[i + 1])) for i in range(parts)]
+
+
+# ---------- format writers (all take an iterable of chunk frames) ----------
+
+def _write_csv(path, frames, index=False, append=False) -> int:
+    rows = 0
+    mode = "a" if append else "w"
+    header = not append
+    for df in frames:
+        df.to_csv(path, mode=mode, header=header, index=index)
+        mode, header = "a", False
+        rows += len(df)
+    return rows
+
+
+def _write_parquet(path, frames, index=False) -> int:
+    rows, writer = 0, None
+    try:
+        for df in frames:
+            table = pa.Table.from_pandas(df, preserve_index=index)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _write_json_columns(path, frames) -> int:
+    """
+    Writes the column-oriented layout of user_data.json
+    ({"col": {"0": v0, "1": v1, ...}, ...}). Each column is streamed to its
+    own temp file, then the files are stitched together.
+    """
+    tmp = tempfile.mkdtemp(prefix="shopzada_json_")
+    parts, columns, rows = {}, None, 0
+    try:
+        for df in frames:
+            if columns is None:
+                columns = list(df.columns)
+                parts = {c: open(os.path.join(tmp, f"{i}.part"), "w") for i, c in enumerate(columns)}
+            keys = [json.dumps(str(k)) for k in range(rows, rows + len(df))]
+            for c in columns:
+                values = df[c].tolist()
+                fh = parts[c]
+                fh.write(("," if rows else "") + ",".join(f"{k}:{json.dumps(v)}" for k, v in zip(keys, values)))
+            rows += len(df)
+        for fh in parts.values():
+            fh.close()
+        with open(path, "w") as out:
+            out.write("{")
+            for i, c in enumerate(columns or []):
+                out.write(("," if i else "") + json.dumps(c) + ":{")
+                with open(parts[c].name) as fh:
+                    shutil.copyfileobj(fh, out)
+                out.write("}")
+            out.write("}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return rows
+
+
+def _write_html(path, frames) -> int:
+    """pandas-style <table class="dataframe"> with an unnamed index column."""
+    rows, columns = 0, None
+    with open(path, "w") as out:
+        for df in frames:
+            if columns is None:
+                columns = list(df.columns)
+                out.write('<table border="1" class="dataframe">\n  <thead>\n    <tr style="text-align: right;">\n'
+                          "      <th></th>\n")
+                out.write("".join(f"      <th>{html.escape(str(c))}</th>\n" for c in columns))
+                out.write("    </tr>\n  </thead>\n  <tbody>\n")
+            body = [f"    <tr>\n      <th>{i}</th>\n" +
+                    "".join(f"      <td>{html.escape(str(v))}</td>\n" for v in values) + "    </tr>\n"
+                    for i, values in zip(range(rows, rows + len(df)), df.itertuples(index=False, name=None))]
+            out.write("".join(body))
+            rows += len(df)
+        out.write("  </tbody>\n</table>")
+    return rows
+
+
+def _write_xlsx(path, frames) -> int:
+    """
+    Streams rows through openpyxl's write-only mode, which is several times
+    faster than DataFrame.to_excel and never holds the sheet in memory. The
+    leading index column reproduces the "Unnamed: 0" of the source workbooks.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    rows = 0
+    for df in frames:
+        if rows == 0:
+            ws.append([None] + list(df.columns))
+        for i, values in zip(range(rows, rows + len(df)), df.itertuples(index=False, name=None)):
+            ws.append((i,) + values)
+        rows += len(df)
+    wb.save(path)
+    return rows
+
+
+def _write_tab_stuffed_csv(path, df: pd.DataFrame):
+    """campaign_data.csv: the whole tab-separated record sits in one CSV column."""
+    with open(path, "w") as out:
+        out.write("\t" + "\t".join(df.columns) + "\n")
+        for i, values in enumerate(df.itertuples(index=False, name=None)):
+            out.write("\t".join([str(i)] + [str(v) for v in values]) + "\n")
+
+
+def _write_line_items(gen: ShopzadaGenerator, price_path, product_path, fmt, lo, hi) -> int:
+    rows = 0
+    price_writer = product_writer = None
+    try:
+        for block in gen._chunks(lo, hi):
+            prices, products = gen.line_items(block)
+            prices.index += rows
+            products.index += rows
+            if fmt == "csv":
+                prices.to_csv(price_path, mode="a" if rows else "w", header=not rows, index=True)
+                products.to_csv(product_path, mode="a" if rows else "w", header=not rows, index=True)
+            else:
+                pt = pa.Table.from_pandas(prices, preserve_index=False)
+                dt = pa.Table.from_pandas(products, preserve_index=False)
+                if price_writer is None:
+                    price_writer = pq.ParquetWriter(price_path, pt.schema)
+                    product_writer = pq.ParquetWriter(product_path, dt.schema)
+                price_writer.write_table(pt)
+                product_writer.write_table(dt)
+            rows += len(prices)
+    finally:
+        for w in (price_writer, product_writer):
+            if w is not None:
+                w.close()
+    return rows
+
+
+def main(scale: float = 1.0, seed: int = 0, out_dir: str = "synthetic_sources", chunk_rows: int = CHUNK_ROWS):
+    print(f"⏳ Generating Shopzada sources at {scale}x (seed={seed}) into {out_dir} ...")
+    t0 = time.perf_counter()
+    manifest = ShopzadaGenerator(scale=scale, seed=seed, chunk_rows=chunk_rows).write_all(out_dir)
+    manifest["seconds"] = round(time.perf_counter() - t0, 2)
+    with open(os.path.join(out_dir, "manifest.json"), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    total = sum(f["rows"] for f in manifest["files"].values())
+    print(f"✅ Wrote {total:,} rows across {len(manifest['files'])} files in {manifest['seconds']}s.")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="scale factor vs. shipped datasets (1-1000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="synthetic_sources", help="output root (gets a datasets/ subfolder)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+    main(scale=args.scale, seed=args.seed, out_dir=args.out, chunk_rows=args.chunk_rows)
@@ -5,6 +5,10 @@ from sqlalchemy import create_engine, text
 import logging
 import psycopg2
 
+from f.common.ids import ensure_id_codec
+from f.common.pg_copy import copy_dataframe
+from f.common.scd2 import ensure_scd2_table, insert_members_sql
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -40,69 +44,63 @@ def get_db_engine():
         raise
 
 def recreate_tables(engine):
-    """Drop and recreate dimension tables."""
-    logging.info("Recreating dimension tables...")
-    
-    # DDL for dim_user
-    ddl_dim_user = """
-    CREATE TABLE dim_user (
-        user_key BIGINT PRIMARY KEY,
-        source_user_id TEXT NOT NULL,
-        name TEXT,
-        creation_date DATE,
-        valid_from DATE,
-        valid_to DATE,
-        is_current BOOLEAN
-    );
-    """
-    
-    # DDL for dim_merchant
-    ddl_dim_merchant = """
-    CREATE TABLE dim_merchant (
-        merchant_key BIGINT PRIMARY KEY,
-        source_merchant_id TEXT NOT NULL,
-        name TEXT,
-        valid_from TIMESTAMP,
-        valid_to TIMESTAMP,
-        is_current BOOLEAN
-    );
-    """
-    
-    # DDL for dim_staff
-    ddl_dim_staff = """
-    CREATE TABLE dim_staff (
-        staff_key BIGINT PRIMARY KEY,
-        source_staff_id TEXT NOT NULL,
-        name TEXT,
-        valid_from TIMESTAMP,
-        valid_to TIMESTAMP,
-        is_current BOOLEAN
-    );
-    """
-    
-    with engine.connect() as conn:
-        # Drop existing tables
-        conn.execute(text("DROP TABLE IF EXISTS dim_user CASCADE;"))
-        conn.execute(text("DROP TABLE IF EXISTS dim_merchant CASCADE;"))
-        conn.execute(text("DROP TABLE IF EXISTS dim_staff CASCADE;"))
-        
-        # Create tables
-        conn.execute(text(ddl_dim_user))
-        conn.execute(text(ddl_dim_merchant))
-        conn.execute(text(ddl_dim_staff))
+    """Create the versioned dimension tables if they do not exist yet."""
+    logging.info("Ensuring dimension tables...")
+
+    # The tables keep their history (SCD Type 2), so they are no longer
+    # dropped here; DIM_USER/DIM_MERCHANT/DIM_STAFF version them.
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        # Business keys are encoded IDs (f.common.ids); the codec is
+        # committed on its own first
+        ensure_id_codec(cur)
         conn.commit()
-    
-    logging.info("Tables recreated successfully.")
+        for table in ("dim_user", "dim_merchant", "dim_staff"):
+            ensure_scd2_table(cur, table)
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+    logging.info("Tables ready.")
 
-def extract_data(engine, table_name):
-    """Read data from a postgres table into a DataFrame."""
-    logging.info(f"Extracting data from {table_name}...")
+# Rows per batch read from staging
+EXTRACT_CHUNK_ROWS = 100_000
+
+# Staging columns each dimension needs, with the dtypes of the batches
+MEMBER_COLUMNS = {
+    'stg_user_data': {'user_id': 'Int64', 'name': 'string', 'possible_duplicate': 'boolean'},
+    'stg_merchant_data': {'merchant_id': 'Int64', 'name': 'string', 'possible_duplicate': 'boolean'},
+    'stg_staff_data': {'staff_id': 'Int64', 'name': 'string', 'possible_duplicate': 'boolean'},
+}
+
+def extract_batches(engine, table_name, columns, chunk_rows=EXTRACT_CHUNK_ROWS):
+    """
+    Stream `columns` (name -> dtype) of a postgres table as typed DataFrame
+    batches of up to `chunk_rows` rows.
+
+    Rows are read through a server-side (named) cursor, so only one batch
+    is held in memory at a time and unused staging columns are never sent.
+    """
+    logging.info(f"Extracting {', '.join(columns)} from {table_name}...")
+    conn = engine.raw_connection()
     try:
-        query = f"SELECT * FROM {table_name}"
-        return pd.read_sql(query, engine)
-    except Exception as e:
-        logging.error(f"Error extracting {table_name}: {e}")
-        return pd.DataFrame()
+        cur = conn.cursor(name=f"extract_{table_name}")
+        cur.itersize = chunk_rows
+        # A missing or unreadable staging table fails the step; it must not
+        # look like an empty one
+        cur.execute(f"SELECT {', '.join(columns)} FROM {table_name}")
+
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield pd.DataFrame(rows, columns=list(columns)).astype(columns)
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
 
 def clean_and_deduplicate(df, id_col):
     """
@@ -112,6 +110,9 @@ def clean_and_deduplicate(df, id_col):
     1. If 'possible_duplicate' is True, drop the row.
     2. Drop rows with missing source IDs.
     3. Remove strict duplicates on the source ID.
+
+    Only within `df`: an ID repeated across batches is deduplicated when
+    the members are inserted (load_new_members).
     """
     if df.empty:
         return df
@@ -145,179 +146,66 @@ def clean_and_deduplicate(df, id_col):
     
     return df_clean
 
-def assign_surrogate_keys(new_data_df, existing_dim_df, sk_col, source_id_col):
+def load_new_members(engine, batches, table, source_id_col):
     """
-    Assign surrogate keys to new data using the Max + 1 method.
+    Insert the cleaned business keys the dimension has never seen.
+
+    The batches are streamed into a temporary table with COPY and
+    anti-joined against the dimension in the database, so neither the
+    dimension nor the IDs seen so far are held in pandas. An ID staged by
+    more than one batch is inserted once (the first row copied wins).
+    Surrogate keys come from the dimension's sequence. Returns (rows
+    staged, rows inserted).
     """
-    if new_data_df.empty:
-        return pd.DataFrame()
-
-    if existing_dim_df.empty:
-        start_sk = 1
-        existing_ids = set()
-    else:
-        # Handle case where table exists but is empty or sk_col is null
-        max_sk = existing_dim_df[sk_col].max()
-        start_sk = 1 if pd.isna(max_sk) else int(max_sk) + 1
-        existing_ids = set(existing_dim_df[source_id_col].dropna())
-    
-    # Identify new records that aren't in the existing dimension
-    new_records_mask = ~new_data_df[source_id_col].isin(existing_ids)
-    records_to_add = new_data_df[new_records_mask].copy()
-    
-    if records_to_add.empty:
-        logging.info("No new records to add.")
-        return pd.DataFrame()
-    
-    # Assign keys
-    records_to_add[sk_col] = range(start_sk, start_sk + len(records_to_add))
+    staged = 0
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TEMP TABLE incoming_members (row_no BIGSERIAL, {source_id_col} BIGINT, name TEXT) ON COMMIT DROP;"
+        ))
+        with conn.connection.cursor() as cur:
+            for df in batches:
+                staged += copy_dataframe(cur, df[[source_id_col, 'name']], 'incoming_members')
+        members = f"""(
+            SELECT DISTINCT ON ({source_id_col}) {source_id_col}, name
+            FROM incoming_members
+            ORDER BY {source_id_col}, row_no
+        )"""
+        inserted = conn.execute(text(insert_members_sql(table, members))).rowcount if staged else 0
+
+    return staged, inserted
+
+def process_dimension(engine, stg_table, id_col, dim_table, source_id_col):
+    """Stream, clean and load the new members of one dimension."""
+    clean_batches = (
+        clean_and_deduplicate(batch, id_col).rename(columns={id_col: source_id_col})
+        for batch in extract_batches(engine, stg_table, MEMBER_COLUMNS[stg_table])
+    )
     
-    logging.info(f"Assigned {len(records_to_add)} new surrogate keys starting from {start_sk}.")
+    staged, inserted = load_new_members(engine, clean_batches, dim_table, source_id_col)
     
-    return records_to_add
+    if not staged:
+        logging.warning(f"Staging table {stg_table} has no rows to load.")
+    elif inserted:
+        logging.info(f"Inserted {inserted} new rows into {dim_table}.")
+    else:
+        logging.info("Dimension is up to date.")
 
 def process_dimension_users(engine):
     """ETL Process for User Dimension."""
     logging.info("--- Processing Dimension: Users ---")
-    
-    # 1. Extract
-    stg_users = extract_data(engine, 'stg_user_data')
-    dim_users_existing = extract_data(engine, 'dim_user')
-    
-    if stg_users.empty:
-        logging.warning("Staging table stg_user_data is empty.")
-        return
-
-    # 2. Transform (Clean)
-    clean_users = clean_and_deduplicate(stg_users, 'user_id')
-    
-    # 3. Transform (Surrogate Keys)
-    # Map staging columns to dimension columns
-    # stg: user_id, name, creation_date, ...
-    # dim: user_key, source_user_id, name, creation_date, valid_from, valid_to, is_current
-    
-    clean_users.rename(columns={'user_id': 'source_user_id'}, inplace=True)
-    
-    new_dim_records = assign_surrogate_keys(
-        clean_users, 
-        dim_users_existing, 
-        sk_col='user_key', 
-        source_id_col='source_user_id'
-    )
-    
-    # 4. Load
-    if not new_dim_records.empty:
-        # Select and order columns to match destination
-        # We need to ensure we only try to insert columns that exist in the target or handle defaults
-        
-        # Set SCD Type 2 fields (simplification: just inserting as current)
-        new_dim_records['is_current'] = True
-        new_dim_records['valid_from'] = pd.Timestamp.now().date()
-        new_dim_records['valid_to'] = None
-        
-        # Filter columns to only those present in dim_user (if we knew them strictly)
-        # For now, we'll assume the dataframe has extra columns that SQL might reject if not careful,
-        # but pandas to_sql usually handles matching names.
-        # We should strictly select columns based on the dimension definition.
-        
-        target_columns = ['user_key', 'source_user_id', 'name', 'creation_date', 'valid_from', 'valid_to', 'is_current']
-        
-        # Ensure all target cols exist (fill missing with None)
-        for col in target_columns:
-            if col not in new_dim_records.columns:
-                new_dim_records[col] = None
-        
-        final_df = new_dim_records[target_columns]
-        
-        logging.info(f"Ready to insert {len(final_df)} rows into dim_user.")
-        
-        # In a real run, uncomment the following line:
-        final_df.to_sql('dim_user', engine, if_exists='append', index=False)
-        
-        # For preview:
-        print(final_df.head())
-    else:
-        logging.info("Dimension is up to date.")
+    # stg: user_id, name, possible_duplicate (only the columns used)
+    # dim: user_key, source_user_id, name, valid_from, valid_to, is_current
+    process_dimension(engine, 'stg_user_data', 'user_id', 'dim_user', 'source_user_id')
 
 def process_dimension_merchants(engine):
     """ETL Process for Merchant Dimension."""
     logging.info("--- Processing Dimension: Merchants ---")
-    
-    stg_merch = extract_data(engine, 'stg_merchant_data')
-    dim_merch_existing = extract_data(engine, 'dim_merchant')
-    
-    if stg_merch.empty:
-        logging.warning("Staging table stg_merchant_data is empty.")
-        return
-    
-    clean_merch = clean_and_deduplicate(stg_merch, 'merchant_id')
-    clean_merch.rename(columns={'merchant_id': 'source_merchant_id'}, inplace=True)
-    
-    new_dim_records = assign_surrogate_keys(
-        clean_merch,
-        dim_merch_existing,
-        sk_col='merchant_key',
-        source_id_col='source_merchant_id'
-    )
-    
-    if not new_dim_records.empty:
-        new_dim_records['is_current'] = True
-        new_dim_records['valid_from'] = pd.Timestamp.now() # timestamp for merchant
-        new_dim_records['valid_to'] = None
-        
-        target_columns = ['merchant_key', 'source_merchant_id', 'name', 'valid_from', 'valid_to', 'is_current']
-        
-        for col in target_columns:
-            if col not in new_dim_records.columns:
-                new_dim_records[col] = None
-                
-        final_df = new_dim_records[target_columns]
-        
-        logging.info(f"Ready to insert {len(final_df)} rows into dim_merchant.")
-        final_df.to_sql('dim_merchant', engine, if_exists='append', index=False)
-        print(final_df.head())
-    else:
-        logging.info("Dimension is up to date.")
+    process_dimension(engine, 'stg_merchant_data', 'merchant_id', 'dim_merchant', 'source_merchant_id')
 
 def process_dimension_staff(engine):
     """ETL Process for Staff Dimension."""
     logging.info("--- Processing Dimension: Staff ---")
-    
-    stg_staff = extract_data(engine, 'stg_staff_data')
-    dim_staff_existing = extract_data(engine, 'dim_staff')
-    
-    if stg_staff.empty:
-        logging.warning("Staging table stg_staff_data is empty.")
-        return
-    
-    clean_staff = clean_and_deduplicate(stg_staff, 'staff_id')
-    clean_staff.rename(columns={'staff_id': 'source_staff_id'}, inplace=True)
-    
-    new_dim_records = assign_surrogate_keys(
-        clean_staff,
-        dim_staff_existing,
-        sk_col='staff_key',
-        source_id_col='source_staff_id'
-    )
-    
-    if not new_dim_records.empty:
-        new_dim_records['is_current'] = True
-        new_dim_records['valid_from'] = pd.Timestamp.now()
-        new_dim_records['valid_to'] = None
-        
-        target_columns = ['staff_key', 'source_staff_id', 'name', 'valid_from', 'valid_to', 'is_current']
-        
-        for col in target_columns:
-            if col not in new_dim_records.columns:
-                new_dim_records[col] = None
-                
-        final_df = new_dim_records[target_columns]
-        
-        logging.info(f"Ready to insert {len(final_df)} rows into dim_staff.")
-        final_df.to_sql('dim_staff', engine, if_exists='append', index=False)
-        print(final_df.head())
-    else:
-        logging.info("Dimension is up to date.")
+    process_dimension(engine, 'stg_staff_data', 'staff_id', 'dim_staff', 'source_staff_id')
 
 def main():
     try:
@@ -332,4 +220,5 @@ def main():
         logging.info("ETL Pipeline completed successfully.")
         
     except Exception as e:
-        logging.error(f"Pipeline failed: {e}")
\ No newline at end of file
+        logging.error(f"Pipeline failed: {e}")
+        raise
\ No newline at end of file
@@ -0,0 +1,77 @@
+# (campaign_key, date_key) groups of fact_orders touched by each load.
+#
+# FACT_ORDERS logs the groups an order left and the groups it entered, so
+# FACT_CAMPAIGN_PERFORMANCE can re-aggregate only those, and BUILD_ROLLUPS
+# only the months they fall in. Orders without a campaign are logged with
+# a NULL campaign_key (they still count towards the rollups). A full rebuild
+# clears the log and leaves one full_rebuild row instead: every group may
+# have changed. Consumers keep their position in etl_watermark
+# (f.common.watermark) against logged_at, capped at the commit horizon
+# like ingested_at: logged_at is the FACT_ORDERS transaction's start time.
+
+from f.common.indexes import ensure_index
+from f.common.watermark import capped, commit_horizon
+
+CHANGE_LOG_DDL = """
+    CREATE TABLE IF NOT EXISTS fact_orders_change_log (
+        change_id     BIGSERIAL PRIMARY KEY,
+        campaign_key  BIGINT,
+        date_key      INT,
+        full_rebuild  BOOLEAN NOT NULL DEFAULT false,
+        logged_at     TIMESTAMP NOT NULL DEFAULT now()
+    );
+"""
+
+
+def ensure_change_log(cur):
+    cur.execute(CHANGE_LOG_DDL)
+    ensure_index(cur, "fact_orders_change_log_logged_at_idx",
+                 "INDEX fact_orders_change_log_logged_at_idx ON fact_orders_change_log (logged_at)")
+
+
+def log_full_rebuild(cur):
+    cur.execute("DELETE FROM fact_orders_change_log;")
+    cur.execute("INSERT INTO fact_orders_change_log (full_rebuild) VALUES (true);")
+
+
+def log_groups(cur, groups_sql: str, params=None) -> int:
+    """Logs the distinct (campaign_key, date_key) groups produced by `groups_sql`."""
+    cur.execute(
+        f"""
+        INSERT INTO fact_orders_change_log (campaign_key, date_key)
+        SELECT DISTINCT campaign_key, date_key FROM ({groups_sql}) g;
+        """,
+        params,
+    )
+    return cur.rowcount
+
+
+def max_logged_at(cur):
+    horizon = commit_horizon(cur)
+    cur.execute("SELECT max(logged_at) FROM fact_orders_change_log;")
+    return capped(cur.fetchone()[0], horizon)
+
+
+def has_full_rebuild(cur, since, until) -> bool:
+    cur.execute(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM fact_orders_change_log
+            WHERE full_rebuild AND logged_at > %s AND logged_at <= %s
+        );
+        """,
+        (since, until),
+    )
+    return cur.fetchone()[0]
+
+
+def logged_months(cur, since, until):
+    """Months (YYYYMM) with a logged group in (since, until]."""
+    cur.execute(
+        """
+        SELECT DISTINCT date_key / 100 FROM fact_orders_change_log
+        WHERE NOT full_rebuild AND date_key IS NOT NULL AND logged_at > %s AND logged_at <= %s;
+        """,
+        (since, until),
+    )
+    return sorted(r[0] for r in cur.fetchall())
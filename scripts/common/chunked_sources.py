@@ -0,0 +1,90 @@
+# Chunked reads of the master-data sources, for soft_dedup_chunks.
+#
+# download() streams a source into a temporary file instead of holding the
+# response text. read_csv_chunks and read_html_chunks then parse that file
+# CHUNK_ROWS rows at a time, so no step holds the whole source at once.
+# read_html_chunks gives the same columns and values as
+# pd.read_html(...)[0]: it walks the first table with lxml's iterparse,
+# normalizes each cell's text with read_html's own rule (strip, then every
+# line break or run of two or more whitespace characters becomes one
+# space), and hands each block of rows to the parser read_html itself
+# uses. As with read_csv(chunksize=), dtypes are inferred per chunk.
+
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+import pandas as pd
+import requests
+from lxml import etree
+from pandas.io.parsers import TextParser
+
+CHUNK_ROWS = 100_000
+
+# the pattern pandas.io.html strips cells with, on pandas 2.x and 3.x alike
+_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+
+
+@contextmanager
+def download(url: str, timeout: int = 30, chunk_bytes: int = 1 << 20):
+    """Path of a temporary file holding the body of `url`, removed on exit."""
+    with tempfile.TemporaryDirectory(prefix="source_") as tmp:
+        path = os.path.join(tmp, "source")
+        with requests.get(url, timeout=timeout, stream=True) as resp:
+            resp.raise_for_status()
+            with open(path, "wb") as fh:
+                for block in resp.iter_content(chunk_bytes):
+                    fh.write(block)
+        yield path
+
+
+def read_csv_chunks(path: str, chunk_rows: int = CHUNK_ROWS, **kwargs):
+    """pd.read_csv(path) as DataFrames of `chunk_rows` rows; the index runs on across chunks."""
+    with pd.read_csv(path, chunksize=chunk_rows, **kwargs) as reader:
+        yield from reader
+
+
+def _cell_text(cell) -> str:
+    return _WHITESPACE.sub(" ", "".join(cell.itertext()).strip())
+
+
+def read_html_chunks(path: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    The first <table> of the HTML file at `path`, as DataFrames of
+    `chunk_rows` rows. Header cells come from the <thead> rows; an empty
+    one becomes "Unnamed: <position>" as in read_html.
+    """
+    header, rows, offset = None, [], 0
+
+    def frame():
+        df = TextParser([header] + rows, header=0).read()
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        return df
+
+    in_table = False
+    for event, element in etree.iterparse(path, events=("start", "end"), tag=("table", "tr"), html=True):
+        if element.tag == "table":
+            if event == "end":
+                break
+            in_table = True
+            continue
+        if event != "end" or not in_table:
+            continue
+        cells = [_cell_text(c) for c in element if c.tag in ("th", "td")]
+        if header is None and element.getparent().tag == "thead":
+            header = cells
+        elif header is not None:
+            rows.append(cells)
+        # parsed rows are dropped from the tree as they are read
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+        if len(rows) == chunk_rows:
+            yield frame()
+            offset += len(rows)
+            rows = []
+    if header is None:
+        raise ValueError(f"No table with a <thead> in {path}")
+    if rows:
+        yield frame()
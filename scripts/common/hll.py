@@ -0,0 +1,171 @@
+# HyperLogLog distinct-count sketches, as plain SQL/PL/pgSQL functions.
+#
+# A sketch is a bytea of 2^HLL_P one-byte registers. Values are hashed with
+# Postgres' 64-bit hashint8extended; the low HLL_P bits pick a register and
+# the register keeps the highest "position of the first 1 bit" seen in the
+# remaining bits. Sketches of the same precision merge by taking the
+# byte-wise max, so a daily sketch can be rolled up to any date range
+# without going back to the rows it was built from.
+#
+# With HLL_P = 11 a sketch is 2 KB and estimates are within about 2.3%
+# (one standard error).
+#
+# Sketches are built and merged without PL/pgSQL: each value (or each
+# non-empty register of a merged sketch) becomes an (index, rho) pair, and
+# hll_registers_agg writes the pairs into a sketch with the built-in
+# set_byte. hll_add_agg builds the same bytes through PL/pgSQL and is kept
+# for ad-hoc use; in a parallel plan its partial sketches are combined by
+# the PL/pgSQL hll_union, which is much slower (benchmarks/bench_hll.py).
+
+import hashlib
+
+HLL_P = 11
+HLL_M = 1 << HLL_P
+_HASH_BITS = 64 - HLL_P
+
+# Register index and rho of a bigint value, as SQL over {v}
+_INDEX_SQL = f"(hashint8extended({{v}}, 0) & {HLL_M - 1})::int"
+# leading zeros of the remaining _HASH_BITS bits, plus one
+_RHO_SQL = (
+    f"{_HASH_BITS + 1} - length(ltrim(((hashint8extended({{v}}, 0) >> {HLL_P})"
+    f" & {(1 << _HASH_BITS) - 1})::bit(64)::text, '0'))"
+)
+
+HLL_FUNCTIONS_DDL = f"""
+    -- Adds one bigint value to a sketch.
+    CREATE OR REPLACE FUNCTION hll_add(sketch bytea, v bigint) RETURNS bytea
+    LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+    DECLARE
+        h bigint;
+        idx int;
+        rho int;
+    BEGIN
+        IF v IS NULL THEN
+            RETURN sketch;
+        END IF;
+        idx := {_INDEX_SQL.format(v="v")};
+        rho := {_RHO_SQL.format(v="v")};
+        IF rho > get_byte(sketch, idx) THEN
+            sketch := set_byte(sketch, idx, rho);
+        END IF;
+        RETURN sketch;
+    END
+    $$;
+
+    -- Byte-wise max of two sketches (either may be NULL).
+    CREATE OR REPLACE FUNCTION hll_union(a bytea, b bytea) RETURNS bytea
+    LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+    DECLARE
+        r int;
+    BEGIN
+        IF a IS NULL THEN
+            RETURN b;
+        ELSIF b IS NULL THEN
+            RETURN a;
+        END IF;
+        FOR i IN 0 .. length(a) - 1 LOOP
+            r := get_byte(b, i);
+            IF r > get_byte(a, i) THEN
+                a := set_byte(a, i, r);
+            END IF;
+        END LOOP;
+        RETURN a;
+    END
+    $$;
+
+    -- Estimated number of distinct values in a sketch.
+    CREATE OR REPLACE FUNCTION hll_cardinality(sketch bytea) RETURNS double precision
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+        SELECT CASE
+            -- Linear counting is more accurate while many registers are empty
+            WHEN raw <= 2.5 * m AND zeros > 0 THEN m * ln(m / zeros)
+            ELSE raw
+        END
+        FROM (
+            SELECT
+                (0.7213 / (1 + 1.079 / m)) * m * m / total AS raw, m, zeros
+            FROM (
+                SELECT
+                    length(sketch)::double precision AS m,
+                    sum(power(2.0::double precision, -get_byte(sketch, i))) AS total,
+                    count(*) FILTER (WHERE get_byte(sketch, i) = 0)::double precision AS zeros
+                FROM generate_series(0, length(sketch) - 1) i
+            ) registers
+        ) e;
+    $$;
+
+    -- hll_registers_agg(idx, rho ORDER BY rho): sketch holding the highest
+    -- rho of each register index. Without the ORDER BY the last pair of an
+    -- index wins, which is enough when each index comes once.
+    CREATE OR REPLACE AGGREGATE hll_registers_agg(int, int) (
+        SFUNC = set_byte,
+        STYPE = bytea,
+        INITCOND = '\\x{"00" * HLL_M}'
+    );
+
+    -- Merges any number of sketches in one set-based pass over their
+    -- registers: hll_cardinality(hll_union_all(array_agg(sketch))). Reads
+    -- every register of every input (one get_byte each), but only the
+    -- non-empty ones are grouped, and each merged register is written once.
+    CREATE OR REPLACE FUNCTION hll_union_all(sketches bytea[]) RETURNS bytea
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+        SELECT hll_registers_agg(i, r)
+        FROM (
+            SELECT i, max(r) AS r
+            FROM (
+                SELECT i, get_byte(s, i) AS r
+                FROM unnest(sketches) s
+                CROSS JOIN generate_series(0, {HLL_M - 1}) i
+                WHERE s IS NOT NULL
+            ) bytes
+            WHERE r > 0
+            GROUP BY i
+        ) registers;
+    $$;
+
+    -- hll_add_agg(source_user_id): sketch of the distinct values in a group.
+    CREATE OR REPLACE AGGREGATE hll_add_agg(bigint) (
+        SFUNC = hll_add,
+        STYPE = bytea,
+        INITCOND = '\\x{"00" * HLL_M}',
+        COMBINEFUNC = hll_union,
+        PARALLEL = SAFE
+    );
+
+    -- hll_union_agg(sketch): merges the sketches of a group.
+    CREATE OR REPLACE AGGREGATE hll_union_agg(bytea) (
+        SFUNC = hll_union,
+        STYPE = bytea,
+        COMBINEFUNC = hll_union,
+        PARALLEL = SAFE
+    );
+"""
+
+
+def ensure_hll_functions(cur) -> bool:
+    """
+    Installs the sketch functions unless this version of them was already
+    applied: the md5 of HLL_FUNCTIONS_DDL is kept as the comment of
+    hll_union_agg, the last object it creates, as f.common.ids does for the
+    ID codec. Concurrent runs serialize on a transaction advisory lock:
+    commit right after calling it. Returns True when the DDL ran.
+    """
+    digest = hashlib.md5(HLL_FUNCTIONS_DDL.encode("utf-8")).hexdigest()
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('f.common.hll'));")
+    cur.execute("SELECT obj_description(to_regprocedure('hll_union_agg(bytea)'), 'pg_proc');")
+    if cur.fetchone()[0] == digest:
+        return False
+    cur.execute(HLL_FUNCTIONS_DDL)
+    cur.execute("COMMENT ON AGGREGATE hll_union_agg(bytea) IS %s;", (digest,))
+    return True
+
+
+def hll_sketch_agg(value: str) -> str:
+    """
+    Aggregate expression building the sketch of the bigint SQL expression
+    `value` over a group. NULLs are skipped; a group of only NULLs gets an
+    empty sketch, as with hll_add_agg.
+    """
+    rho = _RHO_SQL.format(v=value)
+    return f"hll_registers_agg({_INDEX_SQL.format(v=value)}, {rho} ORDER BY {rho})"
+
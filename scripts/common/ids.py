@@ -0,0 +1,212 @@
+# Compact identifiers for orders, users, merchants, staff and products.
+#
+# Order IDs are stored as UUID (16 bytes) and the prefixed IDs as BIGINT:
+# "USER28531" -> 28531. A value in its canonical form (the lowercase UUID
+# text, or the prefix followed by the digits at the kind's zero-padded
+# width) maps to and renders back from its key with no lookup. Any other
+# value (the test files' "USER-001", "ORD-NEW-001", ...) gets a
+# deterministic key of its own: a negative BIGINT from the first 60 bits of
+# its md5, or the md5 itself as a UUID. Its text is kept in id_alias so it
+# still renders. Equal text always gives equal keys, so joins behave
+# exactly as they did on TEXT.
+#
+# Python (encode_ids / render_key) and SQL
+# (encode_<kind>_id / render_<kind>_id, installed by ensure_id_codec)
+# implement the same mapping. Ingestion encodes before COPY; reports and
+# ad-hoc queries go through the SQL functions:
+#
+#     SELECT render_user_id(source_user_id), name FROM dim_user;
+#     SELECT * FROM fact_orders WHERE order_id = encode_order_id('ORD-NEW-001');
+
+import hashlib
+import uuid
+
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from f.common.money import report_view
+
+# kind -> (prefix, zero-padded width). Merchant IDs have four digits
+# ("MERCHANT0156") or five ("MERCHANT12345"); at width 4 both are
+# canonical, as more digits without a leading zero always are.
+ID_KINDS = {
+    "user": ("USER", 5),
+    "merchant": ("MERCHANT", 4),
+    "staff": ("STAFF", 7),
+    "product": ("PRODUCT", 5),
+}
+ORDER_KIND = "order"
+
+UUID_PATTERN = "[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+
+ID_ALIAS_DDL = """
+    CREATE TABLE IF NOT EXISTS id_alias (
+        kind TEXT NOT NULL,
+        key  TEXT NOT NULL,
+        raw  TEXT NOT NULL,
+        PRIMARY KEY (kind, key)
+    );
+"""
+
+
+def _digits_pattern(width: int) -> str:
+    # exactly `width` digits, or more without a leading zero (at most 18,
+    # so the value fits a BIGINT); [0-9] rather than \d, which matches
+    # non-ASCII digits in Python
+    return f"(?:[0-9]{{{width}}}|[1-9][0-9]{{{width},17}})"
+
+
+def _hashed_key(raw: str) -> int:
+    return -1 - int(hashlib.md5(raw.encode("utf-8")).hexdigest()[:15], 16)
+
+
+def _hashed_uuid(raw: str) -> str:
+    return str(uuid.UUID(hex=hashlib.md5(raw.encode("utf-8")).hexdigest()))
+
+
+def encode_key(values: pd.Series, kind: str) -> pd.Series:
+    """BIGINT keys (nullable Int64) of the `kind` IDs in `values`."""
+    prefix, width = ID_KINDS[kind]
+    text = values.astype("string")
+    canonical = text.str.fullmatch(prefix + _digits_pattern(width)).fillna(False).astype(bool)
+    keys = text.where(canonical).str.slice(len(prefix)).astype("Int64")
+    other = text.notna() & ~canonical
+    if other.any():
+        keys[other] = text[other].map(_hashed_key).astype("Int64")
+    return keys
+
+
+def encode_order_id(values: pd.Series) -> pd.Series:
+    """UUID text of the order IDs in `values` (nulls stay null)."""
+    text = values.astype("string")
+    other = text.notna() & ~text.str.fullmatch(UUID_PATTERN).fillna(False).astype(bool)
+    if other.any():
+        text = text.copy()
+        text[other] = text[other].map(_hashed_uuid)
+    return text
+
+
+def encode_ids(df: pd.DataFrame, columns: dict) -> pd.DataFrame:
+    """
+    Replaces each `df[column]` (`columns` maps column -> kind, "order" or
+    a key of ID_KINDS) by its encoded form, in place. Returns the kind,
+    key and raw text of every distinct non-canonical value, for
+    save_aliases.
+    """
+    aliases = []
+    for column, kind in columns.items():
+        raw = df[column].astype("string")
+        df[column] = encode_order_id(raw) if kind == ORDER_KIND else encode_key(raw, kind)
+        encoded = df[column].astype("string")
+        if kind == ORDER_KIND:
+            other = raw.notna() & (encoded != raw)
+        else:
+            other = raw.notna() & (df[column] < 0).fillna(False)
+        if other.any():
+            pairs = pd.DataFrame({"kind": kind, "key": encoded[other], "raw": raw[other]})
+            aliases.append(pairs.drop_duplicates())
+    if not aliases:
+        return pd.DataFrame(columns=["kind", "key", "raw"])
+    return pd.concat(aliases, ignore_index=True)
+
+
+def render_key(key: int, kind: str) -> str:
+    """Canonical text of a non-negative `kind` key."""
+    prefix, width = ID_KINDS[kind]
+    return f"{prefix}{key:0{width}d}"
+
+
+def _sql_functions() -> str:
+    statements = [f"""
+        CREATE OR REPLACE FUNCTION encode_order_id(raw TEXT) RETURNS UUID
+        LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+            SELECT CASE WHEN raw ~ '^{UUID_PATTERN}$' THEN raw::uuid ELSE md5(raw)::uuid END
+        $$;
+        CREATE OR REPLACE FUNCTION render_order_id(key UUID) RETURNS TEXT
+        LANGUAGE sql STABLE STRICT PARALLEL SAFE AS $$
+            SELECT COALESCE(
+                (SELECT a.raw FROM id_alias a WHERE a.kind = '{ORDER_KIND}' AND a.key = $1::text),
+                $1::text
+            )
+        $$;
+    """]
+    for kind, (prefix, width) in ID_KINDS.items():
+        statements.append(f"""
+            CREATE OR REPLACE FUNCTION encode_{kind}_id(raw TEXT) RETURNS BIGINT
+            LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+                SELECT CASE WHEN raw ~ '^{prefix}{_digits_pattern(width)}$'
+                    THEN substr(raw, {len(prefix) + 1})::bigint
+                    ELSE -1 - ('x' || substr(md5(raw), 1, 15))::bit(60)::bigint
+                END
+            $$;
+            CREATE OR REPLACE FUNCTION render_{kind}_id(key BIGINT) RETURNS TEXT
+            LANGUAGE sql STABLE STRICT PARALLEL SAFE AS $$
+                SELECT CASE WHEN $1 >= 0 THEN '{prefix}' || lpad($1::text, greatest({width}, length($1::text)), '0')
+                    ELSE (SELECT a.raw FROM id_alias a WHERE a.kind = '{kind}' AND a.key = $1::text)
+                END
+            $$;
+        """)
+    return "\n".join(statements)
+
+
+def ensure_id_codec(cur) -> bool:
+    """
+    Creates id_alias and the SQL encode_*/render_* functions unless this
+    version of them was already applied: the md5 of their DDL is kept as
+    id_alias's comment, as f.common.views.ensure_view does, so a change to
+    ID_KINDS or the functions reaches existing databases. Steps run in
+    parallel, so this serializes on a transaction advisory lock: commit
+    right after calling it. Returns True when the DDL ran.
+    """
+    ddl = ID_ALIAS_DDL + _sql_functions()
+    digest = hashlib.md5(ddl.encode("utf-8")).hexdigest()
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('f.common.ids'));")
+    cur.execute("SELECT obj_description(to_regclass('id_alias'), 'pg_class');")
+    if cur.fetchone()[0] == digest:
+        return False
+    cur.execute(ddl)
+    cur.execute("COMMENT ON TABLE id_alias IS %s;", (digest,))
+    return True
+
+
+def save_aliases(cur, aliases: pd.DataFrame) -> int:
+    """Records the aliases encode_ids returned. Returns the number of new ones."""
+    if aliases.empty:
+        return 0
+    execute_values(
+        cur,
+        "INSERT INTO id_alias (kind, key, raw) VALUES %s ON CONFLICT DO NOTHING;",
+        list(aliases[["kind", "key", "raw"]].itertuples(index=False, name=None)),
+        page_size=len(aliases),
+    )
+    return cur.rowcount
+
+
+def migrate_id_column(cur, table: str, column: str, kind: str) -> bool:
+    """
+    Converts a `table.column` created before the codec (TEXT) to its
+    encoded type, recording the aliases of its non-canonical values first.
+    Needs ensure_id_codec. Returns True when the column was converted.
+    """
+    cur.execute(
+        """
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s;
+        """,
+        (table, column),
+    )
+    row = cur.fetchone()
+    if row is None or row[0] != "text":
+        return False
+    sql_type = "UUID" if kind == ORDER_KIND else "BIGINT"
+    # the report view depends on the column; ensure_report_view rebuilds it
+    cur.execute(f"DROP VIEW IF EXISTS {report_view(table)};")
+    cur.execute(f"""
+        INSERT INTO id_alias (kind, key, raw)
+        SELECT DISTINCT %s, encode_{kind}_id({column})::text, {column}
+        FROM {table}
+        WHERE {column} IS NOT NULL AND render_{kind}_id(encode_{kind}_id({column})) IS DISTINCT FROM {column}
+        ON CONFLICT DO NOTHING;
+    """, (kind,))
+    cur.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {sql_type} USING encode_{kind}_id({column});")
+    return True
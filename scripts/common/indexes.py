@@ -0,0 +1,86 @@
+# Business-key indexes the transforms join on.
+#
+# Staging tables are dropped and recreated by every ingestion run, so
+# none of these survive a load. f/transformers/BUILD_INDEXES rebuilds them
+# after the dimensions are loaded and before the facts.
+#
+# The (order_id, line_no) indexes on the line-item staging tables are
+# built by their ingestion scripts (f.common.line_items) and are not
+# repeated here. stg_order_data.order_id, dim_campaign.campaign_id and
+# dim_product.product_id are already UNIQUE, and the versioned dim_user / dim_merchant / dim_staff get
+# their (business key, valid_from) index with the table (f.common.scd2).
+
+import time
+
+INDEX_SPECS = [
+    # Staging tables joined to stg_order_data by FACT_ORDERS; its own
+    # order_id is served by the index of its UNIQUE constraint
+    ("stg_order_with_merchant_data", ["order_id"]),
+    ("stg_transactional_campaign_data", ["order_id"]),
+    ("stg_order_delays", ["order_id"]),
+]
+
+
+def ensure_index(cur, name: str, definition: str) -> bool:
+    """
+    Runs `CREATE <definition>` when the index `name` is missing. CREATE
+    INDEX IF NOT EXISTS locks the table SHARE until commit even when the
+    index is there, so the catalog is checked first. Returns True when the
+    index was created.
+    """
+    cur.execute("SELECT to_regclass(%s) IS NULL;", (name,))
+    if not cur.fetchone()[0]:
+        return False
+    cur.execute(f"CREATE {definition};")
+    return True
+
+
+def index_name(table: str, columns) -> str:
+    return f"{table}_{'_'.join(columns)}_idx"
+
+
+def build_indexes(cur, specs=INDEX_SPECS):
+    """
+    Creates each declared index (IF NOT EXISTS) and re-analyzes its table.
+    Tables that do not exist yet are skipped. Returns one timing row per
+    spec.
+    """
+    results = []
+    analyzed = set()
+    for table, columns in specs:
+        name = index_name(table, columns)
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL, to_regclass(%s) IS NOT NULL;", (table, name))
+        table_exists, index_exists = cur.fetchone()
+        if not table_exists:
+            results.append({"table": table, "index": name, "status": "missing table", "seconds": 0.0})
+            continue
+
+        t = time.perf_counter()
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)});")
+        if table not in analyzed:
+            cur.execute(f"ANALYZE {table};")
+            analyzed.add(table)
+        results.append({
+            "table": table,
+            "index": name,
+            "status": "exists" if index_exists else "created",
+            "seconds": round(time.perf_counter() - t, 3),
+        })
+    return results
+
+
+def plan_scans(plan: dict):
+    """
+    Walks an EXPLAIN (FORMAT JSON) plan. Returns (index names used,
+    relations read by a sequential scan).
+    """
+    used, seq = set(), set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if "Index Name" in node:
+            used.add(node["Index Name"])
+        if node.get("Node Type") == "Seq Scan":
+            seq.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return used, seq
@@ -0,0 +1,64 @@
+# Inferred members for late-arriving dimension references.
+#
+# An order can reference a user, merchant, staff member, campaign or
+# product whose own file has not been loaded yet (the test files'
+# USER-001 is the usual case). Before the fact load, infer_members adds a
+# placeholder row for every such business key, in one anti-join INSERT per
+# dimension, so every fact row resolves to a real surrogate key:
+#
+# - dim_user / dim_merchant / dim_staff get a first version with NULL
+#   attributes and row_hash NULL, the same state as the cleaning step's
+#   members (f.common.scd2.insert_members_sql).
+# - dim_campaign and dim_product get a row holding only the business key.
+#
+# Keys come from each table's sequence. When the entity arrives, the DIM
+# step fills the placeholder in place (refresh_scd2 counts it as
+# "filled", refresh_dimension as "updated"), so the fact keeps its key and
+# is not rewritten. A NULL business key (an order with no campaign) is not
+# a late reference and still resolves to a NULL key.
+
+from f.common.scd2 import SCD2_TABLES, insert_members_sql
+
+# (dimension, business key, staging table, staging column) of every
+# reference FACT_ORDERS resolves, directly or through its line totals
+ORDER_REFERENCES = [
+    ("dim_user", "source_user_id", "stg_order_data", "user_id"),
+    ("dim_merchant", "source_merchant_id", "stg_order_with_merchant_data", "merchant_id"),
+    ("dim_staff", "source_staff_id", "stg_order_with_merchant_data", "staff_id"),
+    ("dim_campaign", "campaign_id", "stg_transactional_campaign_data", "campaign_id"),
+    ("dim_product", "product_id", "stg_line_item_data_products", "product_id"),
+]
+
+
+def _referenced_keys_sql(key: str, staging: str, column: str, order_filter: str) -> str:
+    return f"""
+        (SELECT DISTINCT r.{column} AS {key}, NULL::text AS name
+         FROM {staging} r
+         {order_filter}
+         WHERE r.{column} IS NOT NULL)
+    """
+
+
+def infer_members(cur, references=ORDER_REFERENCES, order_filter: str = "") -> dict:
+    """
+    Inserts a placeholder for each business key the staging `references`
+    use that its dimension has never seen. order_filter is an optional
+    join clause on `order_id` (e.g. "JOIN changed_orders ch USING
+    (order_id)") that restricts the staging rows. Returns the number of
+    placeholders added per dimension.
+    """
+    counts = {}
+    for table, key, staging, column in references:
+        source = _referenced_keys_sql(key, staging, column, order_filter)
+        if table in SCD2_TABLES:
+            cur.execute(insert_members_sql(table, source))
+        else:
+            cur.execute(f"""
+                INSERT INTO {table} ({key})
+                SELECT s.{key} FROM {source} s
+                WHERE NOT EXISTS (SELECT 1 FROM {table} d WHERE d.{key} = s.{key})
+                ORDER BY s.{key}
+                ON CONFLICT ({key}) DO NOTHING;
+            """)
+        counts[table] = cur.rowcount
+    return counts
@@ -0,0 +1,68 @@
+# The priced line-item set shared by FACT_ORDER_ITEMS (one row per line)
+# and FACT_ORDERS (order totals). Both build from the same SQL, so
+# fact_orders.total_amount always equals the sum of the order's
+# fact_order_items.total_price. Prices and totals are BIGINT cents
+# (f.common.money).
+
+# Staging tables a line item is built from
+LINE_ITEM_TABLES = ["stg_line_item_data_products", "stg_line_item_data_prices"]
+
+
+def assign_line_no(df, offset=None):
+    """
+    Adds `line_no`: each row's 1-based position within its order_id, in
+    file order. Prices and products are paired on (order_id, line_no), so
+    this must run before any row is dropped.
+
+    offset (a Series of existing max line_no per order_id) continues the
+    numbering for files appended to a staging table that already has lines.
+    """
+    df["line_no"] = df.groupby("order_id", sort=False, dropna=False).cumcount() + 1
+    if offset is not None:
+        df["line_no"] += df["order_id"].map(offset).fillna(0).astype("int64")
+    return df
+
+
+def max_line_no(cur, table: str, order_ids):
+    """Existing max line_no per order_id in `table`, for appends."""
+    cur.execute(
+        f"SELECT order_id, max(line_no) FROM {table} WHERE order_id = ANY(%s::uuid[]) GROUP BY order_id;",
+        (list(order_ids),),
+    )
+    return dict(cur.fetchall())
+
+
+def create_line_no_index(cur, table: str):
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_order_line_idx ON {table} (order_id, line_no);")
+
+
+def line_items_sql(order_filter: str = "") -> str:
+    """
+    SELECT producing order_id, product_key, quantity, unit_price, total_price.
+
+    Product and price rows are paired on (order_id, line_no), which the
+    ingestion scripts record from file order. order_filter is an optional
+    join clause on `order_id` (e.g. "JOIN changed_orders ch USING
+    (order_id)") that restricts the lines.
+    """
+    return f"""
+        SELECT
+            order_id,
+            dp.product_key,
+            pr.quantity,
+            pr.price as unit_price,
+            (pr.quantity * pr.price) as total_price
+        FROM stg_line_item_data_products p
+        JOIN stg_line_item_data_prices pr USING (order_id, line_no)
+        {order_filter}
+        JOIN dim_product dp ON p.product_id = dp.product_id
+    """
+
+
+def order_totals_sql(order_filter: str = "") -> str:
+    """SELECT producing order_id, order_total from the same line-item set."""
+    return f"""
+        SELECT order_id, SUM(total_price)::bigint AS order_total
+        FROM ({line_items_sql(order_filter)}) li
+        GROUP BY order_id
+    """
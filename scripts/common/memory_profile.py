@@ -0,0 +1,259 @@
+import os
+import sysconfig
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Opt-in memory profiling for the ingestion scripts.
+#
+# Enable it per run with the `profile_memory` argument of an ingestion
+# script's main(), or for every run on a worker with
+# SHOPZADA_PROFILE_MEMORY=1. When disabled, phase() is a no-op.
+#
+# tracemalloc slows allocation-heavy steps (to_csv, read_html) down by an
+# order of magnitude. SHOPZADA_PROFILE_MEMORY=rss keeps only the cheap RSS
+# sampling, which is enough to see which phase gets close to the 2 GiB
+# worker limit.
+
+ENV_FLAG = "SHOPZADA_PROFILE_MEMORY"
+
+# How many frames tracemalloc keeps per allocation. Enough to walk out of
+# pandas/numpy internals back to the line in our own script.
+TRACE_FRAMES = 12
+
+_LIBRARY_PATHS = tuple(
+    p for p in {sysconfig.get_paths().get("stdlib"), sysconfig.get_paths().get("purelib"),
+                sysconfig.get_paths().get("platlib")} if p
+)
+
+
+# iter_phase's end-of-iteration marker
+_EXHAUSTED = object()
+
+
+def _env_mode() -> str:
+    value = os.getenv(ENV_FLAG, "").strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return "full"
+    if value == "rss":
+        return "rss"
+    return ""
+
+
+def _current_rss_bytes() -> int:
+    """Current resident set size. Falls back to peak RSS off Linux."""
+    try:
+        with open("/proc/self/statm") as fh:
+            resident_pages = int(fh.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # ru_maxrss is KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _mb(n_bytes) -> float:
+    return round(n_bytes / (1024 * 1024), 2)
+
+
+class _RssSampler:
+    """Background thread that records the highest RSS seen while running."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.peak = _current_rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss_bytes())
+
+    def stop(self) -> int:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.peak = max(self.peak, _current_rss_bytes())
+        return self.peak
+
+
+class MemoryProfiler:
+    """
+    Collects a per-phase memory breakdown for one ingestion run.
+
+    Each phase records:
+    - python_peak_mb: tracemalloc peak (pandas/numpy buffers, python objects)
+    - rss_peak_mb:    sampled process RSS peak (also sees C parsers like lxml)
+    - rss_delta_mb:   RSS growth from phase start to phase peak
+    - top_allocations: largest allocation sites still alive at phase end
+
+    python_peak_mb and top_allocations are only filled when
+    trace_allocations is on.
+
+    Phases with the same name (e.g. "standardize" for every source slice)
+    are merged: peaks are the max, seconds are summed.
+    """
+
+    def __init__(self, enabled: bool = False, trace_allocations: bool = True, top_n: int = 5,
+                 sample_interval: float = 0.02):
+        self.enabled = enabled
+        self.trace_allocations = trace_allocations
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.phases = {}
+        self._started_tracing = False
+
+    @classmethod
+    def from_flag(cls, profile_memory: bool = False, **kwargs) -> "MemoryProfiler":
+        mode = "full" if profile_memory else _env_mode()
+        kwargs.setdefault("trace_allocations", mode == "full")
+        return cls(enabled=bool(mode), **kwargs)
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._started_tracing = True
+
+        tracing = self.trace_allocations and tracemalloc.is_tracing()
+        base_traced, before = 0, None
+        if tracing:
+            tracemalloc.reset_peak()
+            base_traced, _ = tracemalloc.get_traced_memory()
+            before = self._snapshot()
+
+        sampler = _RssSampler(self.sample_interval)
+        sampler.start()
+        rss_start = sampler.peak
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            rss_peak = sampler.stop()
+            traced_peak, top = base_traced, []
+            if tracing:
+                _, traced_peak = tracemalloc.get_traced_memory()
+                top = self._top_allocations(before, self._snapshot())
+            self._record(
+                name,
+                elapsed=elapsed,
+                python_peak=traced_peak - base_traced,
+                rss_peak=rss_peak,
+                rss_delta=rss_peak - rss_start,
+                top=top,
+            )
+
+    def iter_phase(self, name: str, iterable):
+        """
+        Yields the items of `iterable`, producing each one inside phase
+        `name`. The caller's work on an item is not part of the phase, so a
+        generator that computes batches (soft_dedup_batches) and the loop
+        that writes them are attributed separately.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                item = next(iterator, _EXHAUSTED)
+            if item is _EXHAUSTED:
+                return
+            yield item
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        )
+
+    def _top_allocations(self, before, after) -> list:
+        stats = after.compare_to(before, "traceback")
+        top = []
+        for stat in stats:
+            if stat.size_diff <= 0:
+                continue
+            # Frames run oldest -> most recent. The most recent one is
+            # usually inside pandas/numpy; the nearest frame outside the
+            # libraries is the script line (df.copy(), to_csv, read_html...)
+            # that asked for the memory.
+            frames = list(stat.traceback)
+            origin = next(
+                (f for f in reversed(frames) if not f.filename.startswith(_LIBRARY_PATHS)),
+                frames[-1],
+            )
+            top.append({
+                "size_mb": _mb(stat.size_diff),
+                "blocks": stat.count_diff,
+                "origin": f"{os.path.basename(origin.filename)}:{origin.lineno}",
+                "allocated_at": f"{frames[-1].filename}:{frames[-1].lineno}",
+            })
+            if len(top) >= self.top_n:
+                break
+        return top
+
+    def _record(self, name, elapsed, python_peak, rss_peak, rss_delta, top):
+        entry = self.phases.get(name)
+        if entry is None:
+            self.phases[name] = {
+                "calls": 1,
+                "seconds": round(elapsed, 3),
+                "python_peak_mb": _mb(python_peak),
+                "rss_peak_mb": _mb(rss_peak),
+                "rss_delta_mb": _mb(rss_delta),
+                "top_allocations": top,
+            }
+            return
+
+        entry["calls"] += 1
+        entry["seconds"] = round(entry["seconds"] + elapsed, 3)
+        entry["rss_peak_mb"] = max(entry["rss_peak_mb"], _mb(rss_peak))
+        entry["rss_delta_mb"] = max(entry["rss_delta_mb"], _mb(rss_delta))
+        if _mb(python_peak) > entry["python_peak_mb"]:
+            entry["python_peak_mb"] = _mb(python_peak)
+            entry["top_allocations"] = top
+
+    def report(self) -> dict:
+        """Per-phase breakdown plus which phase drove the peaks."""
+        if not self.enabled:
+            return {}
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        worst_python = max(self.phases, key=lambda p: self.phases[p]["python_peak_mb"], default=None)
+        worst_rss = max(self.phases, key=lambda p: self.phases[p]["rss_delta_mb"], default=None)
+        return {
+            "phases": self.phases,
+            "python_peak_phase": worst_python,
+            "rss_growth_phase": worst_rss,
+            "process_rss_peak_mb": max((p["rss_peak_mb"] for p in self.phases.values()), default=0.0),
+        }
+
+    def print_report(self) -> dict:
+        """Print the breakdown (shows up in the Windmill job log) and return it."""
+        summary = self.report()
+        if not summary:
+            return summary
+
+        print("🧠 Memory profile (per phase):")
+        for name, p in summary["phases"].items():
+            print(
+                f"  {name:<14} calls={p['calls']:<3} {p['seconds']:>8.2f}s "
+                f"python_peak={p['python_peak_mb']:>9.2f}MB rss_peak={p['rss_peak_mb']:>9.2f}MB "
+                f"rss_delta={p['rss_delta_mb']:>9.2f}MB"
+            )
+            for alloc in p["top_allocations"]:
+                print(f"      {alloc['size_mb']:>9.2f}MB  {alloc['origin']}  ({alloc['allocated_at']})")
+        return summary
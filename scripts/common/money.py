@@ -0,0 +1,82 @@
+# Money as integer minor units.
+#
+# Prices and amounts are stored as BIGINT cents from staging through the
+# facts and rollups: 12.81 -> 1281. Line totals (quantity * price) and
+# SUM/AVG then run on integers, which Postgres accumulates in 128-bit
+# integers instead of NUMERIC, and every total is exact.
+#
+# Each warehouse table with amounts has a report_<table> view that shows
+# them as NUMERIC(18, 2) units for Metabase (replaced only when the table's
+# columns change, f.common.views). Aggregates are cheaper on the table
+# itself, dividing once at the end:
+#
+#     SELECT sum(total_amount) / 100.0 FROM fact_orders;
+
+import numpy as np
+import pandas as pd
+
+from f.common.views import ensure_view
+
+CENTS_PER_UNIT = 100
+
+
+def to_cents(values: pd.Series) -> pd.Series:
+    """
+    Amounts in units (numbers or numeric text) as nullable Int64 cents,
+    rounded to the nearest cent. Non-numeric and infinite values become NA.
+    """
+    amounts = pd.to_numeric(values, errors="coerce").astype("float64")
+    amounts = amounts.where(np.isfinite(amounts))
+    return (amounts * CENTS_PER_UNIT).round().astype("Int64")
+
+
+def report_view(table: str) -> str:
+    return f"report_{table}"
+
+
+def migrate_money_columns(cur, table: str, columns) -> list:
+    """
+    Converts `columns` of a `table` created before amounts were kept in
+    cents (NUMERIC units) to BIGINT cents, in place. Returns the columns
+    that were converted.
+    """
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+          AND column_name = ANY(%s) AND data_type = 'numeric';
+        """,
+        (table, list(columns)),
+    )
+    converted = [r[0] for r in cur.fetchall()]
+    if converted:
+        # the report view depends on the columns; ensure_report_view rebuilds it
+        cur.execute(f"DROP VIEW IF EXISTS {report_view(table)};")
+        alters = ", ".join(
+            f"ALTER COLUMN {c} TYPE BIGINT USING round({c} * {CENTS_PER_UNIT})" for c in converted
+        )
+        cur.execute(f"ALTER TABLE {table} {alters};")
+    return converted
+
+
+def ensure_report_view(cur, table: str, columns) -> bool:
+    """
+    Creates report_<table>: every column of `table`, with the cents
+    `columns` shown as NUMERIC(18, 2) units under the same names. The view
+    is only replaced when that column list changed; commit right after
+    calling it. Returns True when the view was (re)created.
+    """
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position;
+        """,
+        (table,),
+    )
+    select = [
+        f"({c} / {CENTS_PER_UNIT}.0)::numeric(18, 2) AS {c}" if c in columns else c
+        for (c,) in cur.fetchall()
+    ]
+    view = report_view(table)
+    return ensure_view(cur, view, f"CREATE OR REPLACE VIEW {view} AS SELECT {', '.join(select)} FROM {table};")
@@ -0,0 +1,167 @@
+# Monthly range partitions on date_key for the fact tables.
+#
+# date_key is an integer YYYYMMDD, so month YYYYMM covers
+# [YYYYMM01, next month's YYYYMM01). Each partitioned fact gets one
+# partition per month that has data, named {table}_pYYYYMM, plus a
+# {table}_pdefault DEFAULT partition that only ever holds rows with a NULL
+# date_key (partitions are created before any load that needs them).
+#
+# An old month can be taken out of the fact without rewriting anything:
+#   ALTER TABLE fact_orders DETACH PARTITION fact_orders_p202001;
+#
+# A fact table left over from before partitioning is migrated in place:
+# it is renamed aside, the partitioned table is created under its name,
+# the rows are copied over (keys included) and the old table is dropped,
+# all in the caller's transaction. Callers convert its column types first
+# (f.common.ids, f.common.money) so the copy needs no casts. Views on the
+# old table other than its report view would be lost with it, so the
+# migration refuses to run until they are dropped by hand.
+
+from f.common.money import report_view
+
+# date_key of a staging order row, as FACT_ORDERS computes it
+STAGING_DATE_KEY = "CAST(TO_CHAR(transaction_date, 'YYYYMMDD') AS INTEGER)"
+
+
+def check_months(months) -> list:
+    """
+    `months` as sorted, distinct YYYYMM integers. Raises ValueError on
+    anything else (e.g. 202013), before any partition is created for it.
+    """
+    checked = set()
+    for month in months:
+        if isinstance(month, bool) or not str(month).isdigit() or len(str(month)) != 6:
+            raise ValueError(f"Invalid month {month!r}; expected a YYYYMM integer")
+        if not 1 <= int(month) % 100 <= 12:
+            raise ValueError(f"Invalid month {month!r}; the month must be between 01 and 12")
+        checked.add(int(month))
+    return sorted(checked)
+
+
+def month_bounds(month: int):
+    """(first date_key of the month, first date_key of the next month)."""
+    year, mon = divmod(int(month), 100)
+    if not 1 <= mon <= 12:
+        raise ValueError(f"Invalid month {month!r}; expected YYYYMM")
+    if mon == 12:
+        return year * 10000 + 1201, (year + 1) * 10000 + 101
+    return year * 10000 + mon * 100 + 1, year * 10000 + (mon + 1) * 100 + 1
+
+
+def partition_name(table: str, month: int) -> str:
+    return f"{table}_p{int(month)}"
+
+
+def months_predicate(months, column: str = "date_key") -> str:
+    """SQL predicate selecting `months`, written as ranges so partitions are pruned."""
+    ranges = [f"({column} >= {lo} AND {column} < {hi})" for lo, hi in map(month_bounds, sorted(set(months)))]
+    return "(" + " OR ".join(ranges) + ")" if ranges else "FALSE"
+
+
+def ensure_partitioned(cur, table: str, ddl: str) -> bool:
+    """
+    Creates `table` from `ddl` (a PARTITION BY statement). A table left over
+    from before partitioning is migrated into it with its rows. Returns True
+    when the table was created empty and needs a full load.
+    """
+    cur.execute("SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s);", (table,))
+    row = cur.fetchone()
+    if row and row[0] == "p":
+        return False
+    if row:
+        _migrate_to_partitioned(cur, table, ddl)
+        return False
+    cur.execute(ddl)
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {table}_pdefault PARTITION OF {table} DEFAULT;")
+    return True
+
+
+def _migrate_to_partitioned(cur, table: str, ddl: str):
+    """Replaces the unpartitioned `table` by the partitioned one from `ddl`, keeping its rows."""
+    old = f"{table}_unpartitioned"
+    cur.execute(
+        """
+        SELECT DISTINCT v.relname
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.refobjid = %s::regclass AND v.oid <> d.refobjid AND v.relname <> %s;
+        """,
+        (table, report_view(table)),
+    )
+    views = [r[0] for r in cur.fetchall()]
+    if views:
+        raise RuntimeError(
+            f"{table} has to be migrated to a partitioned table, but views {views} depend on it; "
+            f"drop them, run again and recreate them."
+        )
+
+    cur.execute(f"ALTER TABLE {table} RENAME TO {old};")
+    cur.execute(ddl)
+    cur.execute(f"CREATE TABLE {table}_pdefault PARTITION OF {table} DEFAULT;")
+    ensure_month_partitions(cur, table, fact_months(cur, old))
+
+    # Columns both layouts have; ones added since come out NULL (or default)
+    cur.execute(
+        """
+        SELECT n.column_name FROM information_schema.columns n
+        JOIN information_schema.columns o
+          ON o.table_schema = n.table_schema AND o.table_name = %s AND o.column_name = n.column_name
+        WHERE n.table_schema = current_schema() AND n.table_name = %s
+        ORDER BY n.ordinal_position;
+        """,
+        (old, table),
+    )
+    columns = ", ".join(r[0] for r in cur.fetchall())
+    cur.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {old};")
+
+    # Copied keys came from the old table's sequence; carry on after them
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_default LIKE 'nextval(%%';
+        """,
+        (table,),
+    )
+    for (column,) in cur.fetchall():
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, %s), coalesce(max({column}), 0) + 1, false) FROM {table};",
+            (table, column),
+        )
+
+    # CASCADE takes the old report view; the caller's ensure_report_view recreates it
+    cur.execute(f"DROP TABLE {old} CASCADE;")
+
+
+def ensure_month_partitions(cur, table: str, months):
+    """Creates the missing monthly partitions of `table` for `months`."""
+    for month in sorted(set(months)):
+        lo, hi = month_bounds(month)
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+            f"PARTITION OF {table} FOR VALUES FROM ({lo}) TO ({hi});"
+        )
+
+
+def truncate_months(cur, table: str, months):
+    """Empties the partitions of `months` that exist, leaving the rest of the table alone."""
+    for month in sorted(set(months)):
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (partition_name(table, month),))
+        if cur.fetchone()[0]:
+            cur.execute(f"TRUNCATE TABLE {partition_name(table, month)};")
+
+
+def staging_months(cur):
+    """Months that have at least one order in stg_order_data."""
+    cur.execute(f"""
+        SELECT DISTINCT {STAGING_DATE_KEY} / 100
+        FROM stg_order_data
+        WHERE transaction_date IS NOT NULL;
+    """)
+    return sorted(r[0] for r in cur.fetchall())
+
+
+def fact_months(cur, table: str = "fact_orders"):
+    """Months that have at least one row in a fact table."""
+    cur.execute(f"SELECT DISTINCT date_key / 100 FROM {table} WHERE date_key IS NOT NULL;")
+    return sorted(r[0] for r in cur.fetchall())
@@ -0,0 +1,28 @@
+# Bulk DataFrame writer through COPY.
+#
+# DataFrame.to_sql sends one parameterized INSERT per row through
+# SQLAlchemy (executemany). copy_dataframe uses the same to_csv +
+# copy_expert sequence the ingestion scripts use, a chunk at a time so
+# the CSV buffer stays bounded, on the caller's cursor and transaction.
+
+from io import StringIO
+
+# Rows per COPY; bounds the CSV buffer held in memory
+COPY_CHUNK_ROWS = 100_000
+
+
+def copy_dataframe(cur, df, table: str, chunk_rows: int = COPY_CHUNK_ROWS) -> int:
+    """
+    Appends `df` to `table` (columns matched by name). Missing values are
+    written as unquoted empty fields, which COPY's csv format reads as
+    NULL. Returns the number of rows written.
+    """
+    columns = ", ".join(f'"{c}"' for c in df.columns)
+    written = 0
+    for start in range(0, len(df), chunk_rows):
+        buffer = StringIO()
+        df.iloc[start:start + chunk_rows].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        written += cur.rowcount
+    return written
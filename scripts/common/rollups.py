@@ -0,0 +1,192 @@
+# Summary tables for the Metabase dashboards.
+#
+# Each rollup in ROLLUP_SPECS is kept at two grains:
+#   rollup_day_{name}    keyed by date_key
+#   rollup_month_{name}  keyed by year_month (date_key / 100)
+# plus its group columns, under a unique (period, groups) index so a
+# dashboard card is an index lookup instead of an aggregate over the facts.
+#
+# Rollups are refreshed a whole month at a time: the month's rows are
+# deleted and re-aggregated from the facts (partition-pruned on date_key).
+# Re-running a refresh for the same months gives the same rows, and month
+# rows can hold distinct counts because they are never summed from days.
+# Facts without a date_key are left out.
+#
+# Group attributes taken from dimensions (product_type, country, state) are
+# copied into the rollups; refresh them in full after the dimensions change.
+# Revenue is BIGINT cents; report_rollup_* views show it in units
+# (f.common.money).
+#
+# customer_count counts dim_user.source_user_id, the durable customer ID:
+# a user_key names one Type 2 version (f.common.scd2). Each measure
+# column's comment records the expression it was aggregated with, and a
+# rollup whose spec changed since is re-aggregated in full.
+
+from f.common.indexes import ensure_index
+from f.common.money import ensure_report_view, migrate_money_columns
+from f.common.partitions import months_predicate
+
+CUSTOMER_COUNT = ("COUNT(DISTINCT u.source_user_id)", "customer_count", "BIGINT")
+
+# Joined for customer_count and the customer's geography
+USER_JOIN = "LEFT JOIN dim_user u ON u.user_key = f.user_key"
+
+ROLLUP_SPECS = [
+    {
+        "name": "merchant",
+        "source": f"fact_orders f {USER_JOIN}",
+        "groups": [("f.merchant_key", "merchant_key", "BIGINT")],
+        "measures": [
+            ("COUNT(*)", "order_count", "BIGINT"),
+            CUSTOMER_COUNT,
+            ("SUM(f.total_amount)::bigint", "revenue", "BIGINT"),
+        ],
+    },
+    {
+        "name": "product",
+        "source": "fact_order_items f LEFT JOIN dim_product p ON p.product_key = f.product_key",
+        "groups": [
+            ("f.product_key", "product_key", "BIGINT"),
+            ("p.product_type", "product_type", "TEXT"),
+        ],
+        "measures": [
+            ("COUNT(DISTINCT f.order_id)", "order_count", "BIGINT"),
+            ("SUM(f.quantity)", "quantity", "BIGINT"),
+            ("SUM(f.total_price)::bigint", "revenue", "BIGINT"),
+        ],
+    },
+    {
+        "name": "geography",
+        "source": f"fact_orders f {USER_JOIN}",
+        "groups": [
+            ("u.country", "country", "TEXT"),
+            ("u.state", "state", "TEXT"),
+        ],
+        "measures": [
+            ("COUNT(*)", "order_count", "BIGINT"),
+            CUSTOMER_COUNT,
+            ("SUM(f.total_amount)::bigint", "revenue", "BIGINT"),
+        ],
+    },
+    {
+        "name": "campaign",
+        "source": f"fact_orders f {USER_JOIN}",
+        "groups": [("f.campaign_key", "campaign_key", "BIGINT")],
+        "measures": [
+            ("COUNT(*)", "order_count", "BIGINT"),
+            CUSTOMER_COUNT,
+            ("SUM(f.total_amount)::bigint", "revenue", "BIGINT"),
+        ],
+    },
+]
+
+# Measures held in cents
+MONEY_MEASURES = ["revenue"]
+
+# grain -> (period column, expression over the fact's date_key)
+GRAINS = {
+    "day": ("date_key", "f.date_key"),
+    "month": ("year_month", "f.date_key / 100"),
+}
+
+FRESHNESS_DDL = """
+    CREATE TABLE IF NOT EXISTS rollup_freshness (
+        rollup_name      TEXT PRIMARY KEY,
+        grain            TEXT NOT NULL,
+        refreshed_at     TIMESTAMP NOT NULL,
+        source_logged_at TIMESTAMP,
+        last_mode        TEXT NOT NULL,
+        months_refreshed INT,              -- NULL after a full refresh
+        row_count        BIGINT NOT NULL
+    );
+"""
+
+
+def rollup_table(spec: dict, grain: str) -> str:
+    return f"rollup_{grain}_{spec['name']}"
+
+
+def ensure_rollup(cur, spec: dict, grain: str) -> bool:
+    """
+    Creates a rollup table and its report view (commit right after, see
+    f.common.views). Returns True when its rows must be re-aggregated in
+    full: the table is new, or a measure was aggregated with another
+    expression than the spec's (record_measures notes them once they are).
+    """
+    table = rollup_table(spec, grain)
+    period = GRAINS[grain][0]
+    columns = [f"{period} INT NOT NULL"]
+    columns += [f"{name} {type_}" for _, name, type_ in spec["groups"] + spec["measures"]]
+    keys = ", ".join([period] + [name for _, name, _ in spec["groups"]])
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)});")
+    ensure_index(cur, f"{table}_key_idx", f"UNIQUE INDEX {table}_key_idx ON {table} ({keys}) NULLS NOT DISTINCT")
+    money = [name for _, name, _ in spec["measures"] if name in MONEY_MEASURES]
+    migrate_money_columns(cur, table, money)
+    ensure_report_view(cur, table, money)
+
+    cur.execute(
+        f"""
+        SELECT attname, col_description(attrelid, attnum) FROM pg_attribute
+        WHERE attrelid = '{table}'::regclass AND attnum > 0 AND NOT attisdropped;
+        """
+    )
+    comments = dict(cur.fetchall())
+    return any(comments.get(name) != expr for expr, name, _ in spec["measures"])
+
+
+def record_measures(cur, spec: dict, grain: str):
+    """Notes each measure's expression as its column comment, after a full refresh."""
+    table = rollup_table(spec, grain)
+    for expr, name, _ in spec["measures"]:
+        cur.execute(f"COMMENT ON COLUMN {table}.{name} IS %s;", (expr,))
+
+
+def refresh_rollup(cur, spec: dict, grain: str, months=None) -> int:
+    """
+    Re-aggregates `months` (YYYYMM integers) of one rollup, or all of it
+    when months is None. Returns the number of rows inserted.
+    """
+    table = rollup_table(spec, grain)
+    period, period_expr = GRAINS[grain]
+    if months is None:
+        cur.execute(f"TRUNCATE TABLE {table};")
+        fact_filter = "f.date_key IS NOT NULL"
+    else:
+        if not months:
+            return 0
+        if grain == "month":
+            cur.execute(f"DELETE FROM {table} WHERE {period} = ANY(%s);", (sorted(set(months)),))
+        else:
+            cur.execute(f"DELETE FROM {table} WHERE {months_predicate(months, period)};")
+        fact_filter = months_predicate(months, "f.date_key")
+
+    group_exprs = [expr for expr, _, _ in spec["groups"]]
+    select = [period_expr] + group_exprs + [expr for expr, _, _ in spec["measures"]]
+    columns = [period] + [name for _, name, _ in spec["groups"] + spec["measures"]]
+    cur.execute(f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        SELECT {', '.join(select)}
+        FROM {spec['source']}
+        WHERE {fact_filter}
+        GROUP BY {', '.join([period_expr] + group_exprs)};
+    """)
+    return cur.rowcount
+
+
+def record_freshness(cur, spec: dict, grain: str, mode: str, months_refreshed: int, source_logged_at):
+    table = rollup_table(spec, grain)
+    cur.execute(
+        f"""
+        INSERT INTO rollup_freshness
+            (rollup_name, grain, refreshed_at, source_logged_at, last_mode, months_refreshed, row_count)
+        SELECT %s, %s, now(), %s, %s, %s, count(*) FROM {table}
+        ON CONFLICT (rollup_name) DO UPDATE SET
+            grain = EXCLUDED.grain,
+            refreshed_at = EXCLUDED.refreshed_at,
+            source_logged_at = EXCLUDED.source_logged_at,
+            last_mode = EXCLUDED.last_mode,
+            months_refreshed = EXCLUDED.months_refreshed,
+            row_count = EXCLUDED.row_count;
+        """,
+        (table, grain, source_logged_at, mode, months_refreshed),
+    )
@@ -0,0 +1,276 @@
+# Type 2 history for dim_user, dim_merchant and dim_staff.
+#
+# Every version of a business key is its own row with its own surrogate
+# key, valid over [valid_from, valid_to). The first version of a key is
+# valid from SCD_START, so older facts resolve to it; the current version
+# runs to SCD_END and has is_current = true (one per key, enforced by a
+# partial unique index). row_hash is the hash of the tracked attributes
+# (f.common.dimensions.row_hash_sql); it is NULL on rows the cleaning step
+# created and that have not been enriched yet.
+#
+# Surrogate keys come from the table's own sequence (BIGSERIAL), for the
+# cleaning step's new members as well as for new versions, so no client
+# ever computes max + 1 and concurrent loads cannot collide. Business keys
+# are the encoded BIGINT IDs (f.common.ids).
+#
+# refresh_scd2 is set-based throughout: one UPDATE fills unenriched rows,
+# one UPDATE closes out changed current rows, one INSERT adds their new
+# versions, and one INSERT adds unseen business keys.
+
+from f.common.dimensions import row_hash_sql
+from f.common.ids import migrate_id_column
+from f.common.indexes import ensure_index
+
+SCD_START = "1900-01-01"
+SCD_END = "9999-12-31"
+
+# table -> (surrogate key, business key, DDL)
+SCD2_TABLES = {
+    "dim_user": ("user_key", "source_user_id", """
+        CREATE TABLE IF NOT EXISTS dim_user (
+            user_key BIGSERIAL PRIMARY KEY,
+            source_user_id BIGINT NOT NULL,
+            name TEXT,
+            birthdate DATE,
+            gender TEXT,
+            user_type TEXT,
+            city TEXT,
+            state TEXT,
+            country TEXT,
+            job_title TEXT,
+            job_level TEXT,
+            valid_from TIMESTAMP NOT NULL,
+            valid_to TIMESTAMP NOT NULL,
+            is_current BOOLEAN NOT NULL,
+            row_hash TEXT
+        );
+    """),
+    "dim_merchant": ("merchant_key", "source_merchant_id", """
+        CREATE TABLE IF NOT EXISTS dim_merchant (
+            merchant_key BIGSERIAL PRIMARY KEY,
+            source_merchant_id BIGINT NOT NULL,
+            name TEXT,
+            city TEXT,
+            state TEXT,
+            country TEXT,
+            valid_from TIMESTAMP NOT NULL,
+            valid_to TIMESTAMP NOT NULL,
+            is_current BOOLEAN NOT NULL,
+            row_hash TEXT
+        );
+    """),
+    "dim_staff": ("staff_key", "source_staff_id", """
+        CREATE TABLE IF NOT EXISTS dim_staff (
+            staff_key BIGSERIAL PRIMARY KEY,
+            source_staff_id BIGINT NOT NULL,
+            name TEXT,
+            job_level TEXT,
+            city TEXT,
+            country TEXT,
+            valid_from TIMESTAMP NOT NULL,
+            valid_to TIMESTAMP NOT NULL,
+            is_current BOOLEAN NOT NULL,
+            row_hash TEXT
+        );
+    """),
+}
+
+# table -> ID kind of its business key
+SCD2_ID_KINDS = {"dim_user": "user", "dim_merchant": "merchant", "dim_staff": "staff"}
+
+
+def _ensure_key_sequence(cur, table: str, sk: str):
+    """
+    Gives a versioned table created before its key was BIGSERIAL the same
+    owned sequence, started after the highest key in use.
+    """
+    cur.execute("SELECT pg_get_serial_sequence(%s, %s);", (table, sk))
+    if cur.fetchone()[0] is not None:
+        return
+    seq = f"{table}_{sk}_seq"
+    cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {seq} OWNED BY {table}.{sk};")
+    cur.execute(f"SELECT setval('{seq}', COALESCE(max({sk}), 0) + 1, false) FROM {table};")
+    cur.execute(f"ALTER TABLE {table} ALTER COLUMN {sk} SET DEFAULT nextval('{seq}');")
+
+
+def _convert_old_layout(cur, table: str):
+    """
+    Converts a table left over from the old drop-and-recreate layout (no
+    row_hash column) in place, so its surrogate keys and the facts'
+    foreign keys to them survive. Missing columns are added and the rest
+    take the versioned types. Each business key's lowest key becomes an
+    open-ended first version, not yet enriched; any other row of the key
+    gets an empty validity range, so no fact resolves to it again.
+    """
+    sk, bk, ddl = SCD2_TABLES[table]
+    # Column definitions of the versioned layout, from a scratch copy
+    cur.execute(ddl.replace(f"CREATE TABLE IF NOT EXISTS {table} (", "CREATE TEMP TABLE scd_layout (", 1))
+    cur.execute(
+        """
+        SELECT l.attname, format_type(l.atttypid, l.atttypmod), format_type(t.atttypid, t.atttypmod)
+        FROM pg_attribute l
+        LEFT JOIN pg_attribute t
+            ON t.attrelid = %s::regclass AND t.attname = l.attname AND t.attnum > 0 AND NOT t.attisdropped
+        WHERE l.attrelid = 'scd_layout'::regclass AND l.attnum > 0 AND NOT l.attisdropped
+        ORDER BY l.attnum;
+        """,
+        (table,),
+    )
+    layout = cur.fetchall()
+    cur.execute("DROP TABLE scd_layout;")
+    for column, type_, current in layout:
+        if current is None:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {type_};")
+        elif current != type_ and column != bk:  # a TEXT business key goes through migrate_id_column
+            cur.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {type_} USING {column}::{type_};")
+
+    cur.execute(f"""
+        UPDATE {table} d
+        SET valid_from = %(start)s,
+            valid_to = CASE WHEN f.first_key = d.{sk} THEN %(end)s::timestamp ELSE %(start)s::timestamp END,
+            is_current = f.first_key = d.{sk},
+            row_hash = NULL
+        FROM (SELECT {bk}, min({sk}) AS first_key FROM {table} GROUP BY {bk}) f
+        WHERE f.{bk} = d.{bk};
+    """, {"start": SCD_START, "end": SCD_END})
+    for column in ("valid_from", "valid_to", "is_current"):
+        cur.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL;")
+
+
+def ensure_scd2_table(cur, table: str) -> bool:
+    """
+    Creates `table` with its versioned layout and the indexes history
+    lookups use. A table left over from the old drop-and-recreate layout
+    (no row_hash column) is converted in place, keeping its keys, and a
+    TEXT business key is converted (needs f.common.ids.ensure_id_codec).
+    On an up-to-date table it only reads the catalog. Returns True when the
+    table was created.
+    """
+    sk, bk, ddl = SCD2_TABLES[table]
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (table,))
+    exists = cur.fetchone()[0]
+    if exists:
+        cur.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'row_hash'
+            );
+            """,
+            (table,),
+        )
+        if not cur.fetchone()[0]:
+            _convert_old_layout(cur, table)
+        _ensure_key_sequence(cur, table, sk)
+        migrate_id_column(cur, table, bk, SCD2_ID_KINDS[table])
+    else:
+        cur.execute(ddl)
+    ensure_index(cur, f"{table}_current_idx",
+                 f"UNIQUE INDEX {table}_current_idx ON {table} ({bk}) WHERE is_current")
+    ensure_index(cur, f"{table}_{bk}_valid_from_idx",
+                 f"INDEX {table}_{bk}_valid_from_idx ON {table} ({bk}, valid_from)")
+    return not exists
+
+
+def insert_members_sql(table: str, source: str) -> str:
+    """
+    INSERT of a first, not yet enriched version (row_hash NULL) for each
+    business key in `source` (columns: business key, name) that `table`
+    has never seen. Keys come from the table's sequence.
+    """
+    bk = SCD2_TABLES[table][1]
+    return f"""
+        INSERT INTO {table} ({bk}, name, valid_from, valid_to, is_current)
+        SELECT s.{bk}, s.name, '{SCD_START}', '{SCD_END}', true
+        FROM {source} s
+        WHERE NOT EXISTS (SELECT 1 FROM {table} d WHERE d.{bk} = s.{bk})
+        ORDER BY s.{bk}
+        ON CONFLICT ({bk}) WHERE is_current DO NOTHING;
+    """
+
+
+def as_of_join(alias: str, business_key_expr: str, date_expr: str, table: str) -> str:
+    """
+    LEFT JOIN of the `table` version that was valid at `date_expr`.
+    Rows without a date resolve to the current version.
+    """
+    bk = SCD2_TABLES[table][1]
+    at = f"COALESCE({date_expr}, now()::timestamp)"
+    return (
+        f"LEFT JOIN {table} {alias} ON {alias}.{bk} = {business_key_expr} "
+        f"AND {at} >= {alias}.valid_from AND {at} < {alias}.valid_to"
+    )
+
+
+def refresh_scd2(cur, spec: dict) -> dict:
+    """
+    Applies `spec["source"]` (one row per business key, with the tracked
+    `spec["attributes"]`) to the versioned `spec["table"]` as of now().
+    Returns counts of source rows and of filled, closed, versioned and
+    inserted rows.
+    """
+    table, attrs = spec["table"], spec["attributes"]
+    bk = SCD2_TABLES[table][1]
+    cols = ", ".join(attrs)
+    s_cols = ", ".join(f"s.{c}" for c in attrs)
+
+    cur.execute("DROP TABLE IF EXISTS scd_source, scd_changed;")
+    cur.execute(f"""
+        CREATE TEMP TABLE scd_source ON COMMIT DROP AS
+        SELECT s.*, {row_hash_sql('s', attrs)} AS row_hash
+        FROM ({spec['source']}) s;
+    """)
+    cur.execute("SELECT count(*) FROM scd_source;")
+    source_rows = cur.fetchone()[0]
+
+    # 1) Members created by the cleaning step get their attributes in place
+    cur.execute(f"""
+        UPDATE {table} d
+        SET {', '.join(f'{c} = s.{c}' for c in attrs)}, row_hash = s.row_hash
+        FROM scd_source s
+        WHERE d.{bk} = s.{bk} AND d.is_current AND d.row_hash IS NULL;
+    """)
+    filled = cur.rowcount
+
+    # 2) Current versions whose attributes changed
+    cur.execute(f"""
+        CREATE TEMP TABLE scd_changed ON COMMIT DROP AS
+        SELECT s.* FROM scd_source s
+        JOIN {table} d ON d.{bk} = s.{bk} AND d.is_current
+        WHERE d.row_hash IS DISTINCT FROM s.row_hash;
+    """)
+    cur.execute(f"""
+        UPDATE {table} d
+        SET valid_to = now()::timestamp, is_current = false
+        FROM scd_changed c
+        WHERE d.{bk} = c.{bk} AND d.is_current;
+    """)
+    closed = cur.rowcount
+
+    # 3) Their new versions, and business keys the dimension has never seen
+    #    (surrogate keys from the table's sequence)
+    cur.execute(f"""
+        INSERT INTO {table} ({bk}, {cols}, valid_from, valid_to, is_current, row_hash)
+        SELECT s.{bk}, {s_cols}, now()::timestamp, %s, true, s.row_hash
+        FROM scd_changed s
+        ORDER BY s.{bk};
+    """, (SCD_END,))
+    versioned = cur.rowcount
+
+    cur.execute(f"""
+        INSERT INTO {table} ({bk}, {cols}, valid_from, valid_to, is_current, row_hash)
+        SELECT s.{bk}, {s_cols}, %s, %s, true, s.row_hash
+        FROM scd_source s
+        WHERE NOT EXISTS (SELECT 1 FROM {table} d WHERE d.{bk} = s.{bk})
+        ORDER BY s.{bk}
+        ON CONFLICT ({bk}) WHERE is_current DO NOTHING;
+    """, (SCD_START, SCD_END))
+    inserted = cur.rowcount
+
+    return {
+        "source_rows": source_rows,
+        "filled": filled,
+        "closed": closed,
+        "versioned": versioned,
+        "inserted": inserted,
+    }
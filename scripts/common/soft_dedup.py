@@ -0,0 +1,161 @@
+# "Newest record wins" soft deduplication for the master-data ingestions.
+#
+# Rows are ordered by ID and the scripts' recency columns; the first row
+# of each ID is the master and every other row is flagged
+# possible_duplicate, with possible_duplicate_of set to the ID.
+#
+# soft_dedup_chunks takes the source as an iterable of DataFrames, so a
+# caller can parse it chunk by chunk (f.common.chunked_sources). Chunks are
+# held in memory while they fit a budget; once they do not, every chunk
+# (held ones first) is hash-partitioned by ID into temporary files on disk
+# as it arrives, and the partitions are flagged one at a time. All rows of
+# an ID land in the same partition and keep their relative order, so the
+# flags are identical to the in-memory sort (tests/test_soft_dedup.py);
+# only the row order of the output differs. A partition that is itself over
+# the budget is split again with another hash. Callers COPY each batch as
+# it comes, so the whole flagged frame is never rebuilt.
+#
+# The peak is then about one chunk plus one partition, whatever the size of
+# the source, as long as the source can be parsed in chunks. user_data.json
+# is column-oriented and cannot: its whole frame is parsed first.
+
+import os
+import pickle
+import tempfile
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# Frames larger than this (pandas deep memory usage) are spilled to disk.
+# Sorting needs roughly a second copy of the frame, and workers are capped
+# at 2 GiB.
+DEDUP_MEMORY_BUDGET_MB = 512
+
+# Partitions per spill, and how often a partition over the budget is split
+# again: 16 x 16 partitions cover a source of about 256 budgets. An ID
+# with more rows than the budget always stays in one partition.
+SPILL_PARTITIONS = 16
+MAX_SPILL_DEPTH = 1
+
+# Columns flag_soft_duplicates adds
+FLAG_COLUMNS = ['possible_duplicate', 'possible_duplicate_of']
+
+
+def flag_soft_duplicates(df: pd.DataFrame, id_col: str, order_by, ascending) -> pd.DataFrame:
+    """
+    Sorts by `id_col` then `order_by` (with `ascending`) and flags every
+    row after the first of its ID.
+    """
+    # A. Sort by ID and recency (newest first)
+    df = df.sort_values(by=[id_col] + list(order_by), ascending=[True] + list(ascending))
+
+    # B. Flag Duplicates
+    #    keep='first' preserves the newest record as the Master.
+    df['possible_duplicate'] = df.duplicated(subset=[id_col], keep='first')
+
+    # C. Link to Master ID
+    df['possible_duplicate_of'] = None
+    df.loc[df['possible_duplicate'], 'possible_duplicate_of'] = df[id_col]
+
+    return df
+
+
+def _size_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def _drain(frames: list):
+    # hands the held chunks over one by one, dropping the list's references
+    while frames:
+        yield frames.pop(0)
+
+
+def _read_pieces(path: str):
+    with open(path, "rb") as fh:
+        while True:
+            try:
+                yield pickle.load(fh)
+            except EOFError:
+                return
+
+
+def _partition_of(ids: pd.Series, depth: int) -> np.ndarray:
+    # the same ID hashes alike in every chunk; missing IDs all go to 0
+    hashed = pd.util.hash_pandas_object(ids.astype("string"), index=False,
+                                        hash_key=f"soft_dedup_{depth:05d}").to_numpy()
+    return np.where(ids.isna().to_numpy(), 0, hashed % SPILL_PARTITIONS).astype(np.int64)
+
+
+def _flag_spilled(chunks, id_col, order_by, ascending, memory_budget_mb, tmp, depth):
+    paths = [os.path.join(tmp, f"part_{depth}_{part}.pkl") for part in range(SPILL_PARTITIONS)]
+    sizes = [0.0] * SPILL_PARTITIONS
+    files = [open(path, "wb") for path in paths]
+    try:
+        for chunk in chunks:
+            part_of = _partition_of(chunk[id_col], depth)
+            # a stable sort keeps each partition's rows in input order
+            order = np.argsort(part_of, kind="stable")
+            bounds = np.searchsorted(part_of[order], np.arange(SPILL_PARTITIONS + 1))
+            for part in range(SPILL_PARTITIONS):
+                if bounds[part] == bounds[part + 1]:
+                    continue
+                piece = chunk.take(order[bounds[part]:bounds[part + 1]])
+                sizes[part] += _size_mb(piece)
+                pickle.dump(piece, files[part], protocol=pickle.HIGHEST_PROTOCOL)
+                del piece
+            del chunk
+    finally:
+        for fh in files:
+            fh.close()
+
+    for path, size_mb in zip(paths, sizes):
+        if size_mb > memory_budget_mb and depth < MAX_SPILL_DEPTH:
+            yield from _flag_spilled(_read_pieces(path), id_col, order_by, ascending,
+                                     memory_budget_mb, tmp, depth + 1)
+        elif size_mb:
+            rows = pd.concat(_read_pieces(path))
+            os.remove(path)
+            yield flag_soft_duplicates(rows, id_col, order_by, ascending)
+            del rows
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def soft_dedup_chunks(chunks, id_col: str, order_by, ascending,
+                      memory_budget_mb: float = DEDUP_MEMORY_BUDGET_MB, spill_dir: str = None):
+    """
+    Yields the rows of `chunks` (an iterable of DataFrames with the same
+    columns) flagged by flag_soft_duplicates: in one batch when they fit
+    in `memory_budget_mb`, and otherwise one batch per on-disk partition.
+    """
+    chunks = iter(chunks)
+    held, held_mb = [], 0.0
+    for chunk in chunks:
+        held.append(chunk)
+        held_mb += _size_mb(chunk)
+        del chunk
+        if held_mb > memory_budget_mb:
+            break
+    else:
+        if held:
+            df = held[0] if len(held) == 1 else pd.concat(_drain(held))
+            held.clear()
+            yield flag_soft_duplicates(df, id_col, order_by, ascending)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="soft_dedup_", dir=spill_dir) as tmp:
+        yield from _flag_spilled(chain(_drain(held), chunks), id_col, order_by, ascending,
+                                 memory_budget_mb, tmp, depth=0)
+
+
+def soft_dedup_batches(df: pd.DataFrame, id_col: str, order_by, ascending,
+                       memory_budget_mb: float = DEDUP_MEMORY_BUDGET_MB, spill_dir: str = None):
+    """
+    soft_dedup_chunks over a frame that is already parsed. The input is
+    only released once the caller drops its own reference:
+
+        batches = soft_dedup_batches(df, "user_id", ["creation_date"], [False])
+        del df
+    """
+    return soft_dedup_chunks([df], id_col, order_by, ascending, memory_budget_mb, spill_dir)
@@ -0,0 +1,28 @@
+# Views over warehouse tables, (re)created without blocking their readers.
+#
+# CREATE OR REPLACE VIEW takes an ACCESS EXCLUSIVE lock on the view until
+# the transaction ends, so replacing a view inside a load transaction
+# blocks every Metabase query on it for the whole load. ensure_view only
+# runs its DDL when the view is missing or the DDL changed since it was
+# applied (its md5 is kept as the view's comment). Callers commit right
+# after it, before the load starts, as with f.common.ids.ensure_id_codec.
+#
+# Views are replaced, never dropped, so views built on top of them keep
+# working. A change that CREATE OR REPLACE cannot apply (a column removed
+# or retyped) fails loudly instead; drop the view by hand in that case.
+
+import hashlib
+
+
+def ensure_view(cur, name: str, ddl: str) -> bool:
+    """
+    Runs `ddl` (CREATE OR REPLACE statements, `name` among the views it
+    creates) unless it was already applied. Returns True when it ran.
+    """
+    digest = hashlib.md5(ddl.encode("utf-8")).hexdigest()
+    cur.execute("SELECT obj_description(to_regclass(%s), 'pg_class');", (name,))
+    if cur.fetchone()[0] == digest:
+        return False
+    cur.execute(ddl)
+    cur.execute(f"COMMENT ON VIEW {name} IS %s;", (digest,))
+    return True
@@ -0,0 +1,108 @@
+# High-water marks for incremental transforms.
+#
+# Staging tables carry an `ingested_at TIMESTAMP DEFAULT now()` column, so
+# both full reloads and appends (late/test files) stamp their rows. A
+# transform keeps the newest ingested_at it has consumed in etl_watermark,
+# under its own consumer name, and only looks at rows stamped after it on
+# the next run.
+#
+# now() is the start time of the writing transaction, not its commit time.
+# A load that started before a transform run and commits after it would
+# stamp its rows below the watermark that run stores, and every later run
+# would skip them. So the position a run may consume up to is capped just
+# below the start of the oldest transaction still in flight in the
+# database (commit_horizon): anything stamped at or below the cap has
+# committed, and anything later is picked up by the next run. A
+# long-running transaction (even a read) holds the watermark back until it
+# ends; it never makes a run skip rows.
+
+WATERMARK_DDL = """
+    CREATE TABLE IF NOT EXISTS etl_watermark (
+        consumer          TEXT PRIMARY KEY,
+        last_ingested_at  TIMESTAMP,
+        updated_at        TIMESTAMP NOT NULL DEFAULT now()
+    );
+"""
+
+
+def ensure_watermark_table(cur):
+    cur.execute(WATERMARK_DDL)
+
+
+def ensure_ingested_at(cur, tables):
+    """
+    Adds ingested_at (and an index on it) to staging tables created before
+    the column existed. Existing rows get the time of the ALTER. Tables
+    that have both are not locked, so a run does not wait for loads in
+    flight (ALTER ... IF NOT EXISTS locks the table either way).
+    """
+    for table in tables:
+        cur.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'ingested_at'
+            ), to_regclass(%s) IS NOT NULL;
+            """,
+            (table, f"{table}_ingested_at_idx"),
+        )
+        has_column, has_index = cur.fetchone()
+        if not has_column:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP DEFAULT now();")
+        if not has_index:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_ingested_at_idx ON {table} (ingested_at);")
+
+
+def get_watermark(cur, consumer: str):
+    """Last ingested_at consumed by `consumer`, or None if it never ran."""
+    cur.execute("SELECT last_ingested_at FROM etl_watermark WHERE consumer = %s;", (consumer,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(cur, consumer: str, last_ingested_at):
+    cur.execute(
+        """
+        INSERT INTO etl_watermark (consumer, last_ingested_at, updated_at)
+        VALUES (%s, %s, now())
+        ON CONFLICT (consumer) DO UPDATE
+        SET last_ingested_at = EXCLUDED.last_ingested_at,
+            updated_at = EXCLUDED.updated_at;
+        """,
+        (consumer, last_ingested_at),
+    )
+
+
+def commit_horizon(cur):
+    """
+    Just below the start of the oldest other transaction in flight in this
+    database, or None when there is none. Every row stamped now() at or
+    below it is committed.
+    """
+    cur.execute(
+        """
+        SELECT min(xact_start)::timestamp - interval '1 microsecond'
+        FROM pg_stat_activity
+        WHERE datname = current_database() AND pid <> pg_backend_pid()
+          AND backend_type = 'client backend' AND xact_start IS NOT NULL;
+        """
+    )
+    return cur.fetchone()[0]
+
+
+def capped(newest, horizon):
+    """`newest` capped at the commit horizon (either may be None)."""
+    if newest is None or horizon is None:
+        return newest
+    return min(newest, horizon)
+
+
+def max_ingested_at(cur, tables):
+    """
+    Newest committed ingested_at across `tables` that a run may consume,
+    capped at commit_horizon (None when they are all empty).
+    """
+    horizon = commit_horizon(cur)
+    union = " UNION ALL ".join(f"SELECT max(ingested_at) AS m FROM {t}" for t in tables)
+    cur.execute(f"SELECT max(m) FROM ({union}) s;")
+    return capped(cur.fetchone()[0], horizon)
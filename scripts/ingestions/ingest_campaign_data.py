@@ -5,6 +5,8 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.memory_profile import MemoryProfiler
+
 # 🔗 RAW URL for Historical Data (The "Messy" Tab-Separated File)
 HISTORICAL_FILE_URL = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/"
@@ -77,19 +79,21 @@ def _standardize_campaign_df(df: pd.DataFrame, source_type: str = 'clean') -> pd
 
 # ---------- main ----------
 
-def main(new_campaign_file: bytes = None):
+def main(new_campaign_file: bytes = None, profile_memory: bool = False):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
     # ==========================================
     # PART 1: LOAD HISTORICAL DATA
     # ==========================================
     print("⏳ Loading historical campaign data...")
     
     # Download raw text
-    resp = _get(HISTORICAL_FILE_URL)
+    with profiler.phase("load"):
+        resp = _get(HISTORICAL_FILE_URL)
+        df_raw = pd.read_csv(io.StringIO(resp.text))
     # Parse as 'dirty_historical' because we know this specific URL is the messy one
-    df_historical = _standardize_campaign_df(
-        pd.read_csv(io.StringIO(resp.text)), 
-        source_type='dirty_historical'
-    )
+    with profiler.phase("standardize"):
+        df_historical = _standardize_campaign_df(df_raw, source_type='dirty_historical')
 
     # Connect to Postgres
     conn = psycopg2.connect(
@@ -112,28 +116,30 @@ def main(new_campaign_file: bytes = None):
             campaign_id          TEXT,
             campaign_name        TEXT,
             campaign_description TEXT,
-            discount             NUMERIC
+            discount             NUMERIC,
+            ingested_at          TIMESTAMP DEFAULT now()
         );
     """)
 
     # Bulk insert Historical Data
     print(f"📥 Inserting {len(df_historical)} historical rows...")
-    buffer = StringIO()
-    df_historical.to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        f"""
-        COPY {table_name} (
-            campaign_id, 
-            campaign_name, 
-            campaign_description, 
-            discount
+    with profiler.phase("copy_buffer"):
+        buffer = StringIO()
+        df_historical.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        cur.copy_expert(
+            f"""
+            COPY {table_name} (
+                campaign_id, 
+                campaign_name, 
+                campaign_description, 
+                discount
+            )
+            FROM STDIN WITH (FORMAT csv)
+            """,
+            buffer,
         )
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
     conn.commit()
 
     # ==========================================
@@ -167,23 +173,24 @@ def main(new_campaign_file: bytes = None):
 
     if not df_new_campaigns.empty:
         # 2) Bulk Insert (APPEND ONLY)
-        buffer = StringIO()
-        df_new_campaigns.to_csv(buffer, index=False, header=False)
-        buffer.seek(0)
-
         try:
-            cur.copy_expert(
-                f"""
-                COPY {table_name} (
-                    campaign_id, 
-                    campaign_name, 
-                    campaign_description, 
-                    discount
+            with profiler.phase("copy_buffer"):
+                buffer = StringIO()
+                df_new_campaigns.to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+
+                cur.copy_expert(
+                    f"""
+                    COPY {table_name} (
+                        campaign_id, 
+                        campaign_name, 
+                        campaign_description, 
+                        discount
+                    )
+                    FROM STDIN WITH (FORMAT csv)
+                    """,
+                    buffer,
                 )
-                FROM STDIN WITH (FORMAT csv)
-                """,
-                buffer,
-            )
             conn.commit()
             print(f"➕ Appended {len(df_new_campaigns)} new rows to {table_name}.")
             
@@ -195,12 +202,15 @@ def main(new_campaign_file: bytes = None):
     cur.close()
     conn.close()
 
-    return {
+    result = {
         "table": table_name,
         "historical_rows": len(df_historical),
         "test_rows_appended": len(df_new_campaigns),
         "total_rows": len(df_historical) + len(df_new_campaigns)
     }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
 
 
 if __name__ == "__main__":
@@ -7,6 +7,11 @@ import pyarrow  # Required for read_parquet
 from io import StringIO
 from io import BytesIO
 
+from f.common.line_items import assign_line_no, create_line_no_index
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+from f.common.money import to_cents
+
 # 🔑 Raw URLs for the three Operations Department files
 URL_PRICES_1 = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/"
@@ -23,6 +28,9 @@ URL_PRICES_3 = (
     "datasets/Operations%20Department/line_item_data_prices3.parquet"
 )
 
+# Stored as UUID (f.common.ids)
+ID_COLUMNS = {"order_id": "order"}
+
 
 def _load_csv_from_github(url: str) -> pd.DataFrame:
     resp = requests.get(url, timeout=60)
@@ -71,34 +79,44 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce")
 
     # 5. Clean Price
-    #    Ensure numeric (Float/Numeric)
-    df["price"] = pd.to_numeric(df["price"], errors="coerce")
+    #    Integer cents (f.common.money): 12.81 -> 1281
+    df["price"] = to_cents(df["price"])
 
     return df[required]
 
 
-def main():
+def main(profile_memory: bool = False):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
     # 1) Load all three datasets
     try:
-        # print("Loading DF1 (CSV)...")
-        df1 = _load_csv_from_github(URL_PRICES_1)
-        
-        # print("Loading DF2 (CSV)...")
-        df2 = _load_csv_from_github(URL_PRICES_2)
-        
-        # print("Loading DF3 (Parquet)...")
-        df3 = _load_parquet_from_github(URL_PRICES_3)
+        with profiler.phase("load"):
+            # print("Loading DF1 (CSV)...")
+            df1 = _load_csv_from_github(URL_PRICES_1)
+
+            # print("Loading DF2 (CSV)...")
+            df2 = _load_csv_from_github(URL_PRICES_2)
+
+            # print("Loading DF3 (Parquet)...")
+            df3 = _load_parquet_from_github(URL_PRICES_3)
     except Exception as e:
         raise RuntimeError(f"Failed to download files: {e}")
 
     # 2) Clean each dataframe
-    df1 = clean_dataframe(df1)
-    df2 = clean_dataframe(df2)
-    df3 = clean_dataframe(df3)
+    with profiler.phase("standardize"):
+        df1 = clean_dataframe(df1)
+        df2 = clean_dataframe(df2)
+        df3 = clean_dataframe(df3)
 
     # 3) Merge into ONE big DataFrame
     #    Union of all rows
-    df_all = pd.concat([df1, df2, df3], ignore_index=True, sort=False)
+    with profiler.phase("concat"):
+        df_all = pd.concat([df1, df2, df3], ignore_index=True, sort=False)
+    del df1, df2, df3
+
+    #    Position of each line within its order, in file order.
+    #    FACT_ORDER_ITEMS pairs prices with products on (order_id, line_no).
+    df_all = assign_line_no(df_all)
     
     #    (Optional) Deduplication:
     #    We avoid drop_duplicates() here just in case multiple line items 
@@ -116,38 +134,52 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     # 5) Drop & recreate staging table
     table_name = "stg_line_item_data_prices"
     cur.execute(f"DROP TABLE IF EXISTS {table_name};")
 
-    #    Note: price is NUMERIC, quantity is INTEGER
+    #    Note: price is BIGINT cents, quantity is INTEGER
     cur.execute(f"""
         CREATE TABLE {table_name} (
-            order_id  TEXT,
-            price     NUMERIC,
-            quantity  INTEGER
+            order_id  UUID,
+            line_no   INTEGER,
+            price     BIGINT,
+            quantity  INTEGER,
+            ingested_at  TIMESTAMP DEFAULT now()
         );
     """)
 
     # 6) Bulk insert using COPY
-    buffer = StringIO()
-    df_all.to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        f"""
-        COPY {table_name} (order_id, price, quantity)
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
+    with profiler.phase("encode_ids"):
+        save_aliases(cur, encode_ids(df_all, ID_COLUMNS))
+    with profiler.phase("copy_buffer"):
+        buffer = StringIO()
+        df_all.to_csv(buffer, index=False, header=False, columns=["order_id", "line_no", "price", "quantity"])
+        buffer.seek(0)
+
+        cur.copy_expert(
+            f"""
+            COPY {table_name} (order_id, line_no, price, quantity)
+            FROM STDIN WITH (FORMAT csv)
+            """,
+            buffer,
+        )
+
+    create_line_no_index(cur, table_name)
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
+    result = {
         "table": table_name,
         "rows_loaded": len(df_all),
         "sources": [URL_PRICES_1, URL_PRICES_2, URL_PRICES_3],
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
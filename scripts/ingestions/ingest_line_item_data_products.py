@@ -7,6 +7,10 @@ import pyarrow  # Required for read_parquet
 from io import StringIO
 from io import BytesIO
 
+from f.common.line_items import assign_line_no, create_line_no_index
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+
 # 🔗 Raw URLs for the three Operations Department *products* files
 URL_PROD_1 = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/"
@@ -23,6 +27,9 @@ URL_PROD_3 = (
     "datasets/Operations%20Department/line_item_data_products3.parquet"
 )
 
+# Stored as UUID / BIGINT (f.common.ids)
+ID_COLUMNS = {"order_id": "order", "product_id": "product"}
+
 def _load_csv_from_github(url: str) -> pd.DataFrame:
     resp = requests.get(url, timeout=60)
     resp.raise_for_status()
@@ -39,6 +46,7 @@ def _load_parquet_from_github(url: str) -> pd.DataFrame:
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """
     Standardizes column names and removes junk columns.
+    Rows are kept in file order; see drop_missing_ids.
     """
     # 1. Drop junk columns (Unnamed: 0, Unnamed__0, etc)
     df = df.loc[:, ~df.columns.str.contains('^Unnamed', case=False)]
@@ -63,39 +71,56 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     if missing:
         raise ValueError(f"DataFrame missing expected columns: {missing}")
 
-    # 4. Filter out rows with missing critical IDs
+    return df[required]
+
+
+def drop_missing_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Filters out rows with missing critical IDs. Runs after line_no is
+    assigned so the remaining lines still pair with their price rows.
+    """
     missing_id_mask = df["order_id"].isna() | (df["order_id"] == "") | df["product_id"].isna() | (df["product_id"] == "")
     if missing_id_mask.any():
         dropped_count = missing_id_mask.sum()
         print(f"Warning: Dropping {dropped_count} rows with missing 'order_id' or 'product_id'.")
         df = df[~missing_id_mask]
 
-    return df[required]
+    return df
 
 
-def main():
+def main(profile_memory: bool = False):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
     # 1) Load all three datasets
     try:
-        # print("Loading DF1 (CSV)...")
-        df1 = _load_csv_from_github(URL_PROD_1)
-        
-        # print("Loading DF2 (CSV)...")
-        df2 = _load_csv_from_github(URL_PROD_2)
-        
-        # print("Loading DF3 (Parquet)...")
-        df3 = _load_parquet_from_github(URL_PROD_3)
+        with profiler.phase("load"):
+            # print("Loading DF1 (CSV)...")
+            df1 = _load_csv_from_github(URL_PROD_1)
+
+            # print("Loading DF2 (CSV)...")
+            df2 = _load_csv_from_github(URL_PROD_2)
+
+            # print("Loading DF3 (Parquet)...")
+            df3 = _load_parquet_from_github(URL_PROD_3)
     except Exception as e:
         raise RuntimeError(f"Failed to download files: {e}")
 
     # 2) Clean each dataframe
-    df1 = clean_dataframe(df1)
-    df2 = clean_dataframe(df2)
-    df3 = clean_dataframe(df3)
+    with profiler.phase("standardize"):
+        df1 = clean_dataframe(df1)
+        df2 = clean_dataframe(df2)
+        df3 = clean_dataframe(df3)
 
     # 3) Merge into ONE big DataFrame
     #    Note: We do NOT drop duplicates here because multiple rows 
     #    with same order_id+product_id likely imply Quantity > 1.
-    df_all = pd.concat([df1, df2, df3], ignore_index=True, sort=False)
+    with profiler.phase("concat"):
+        df_all = pd.concat([df1, df2, df3], ignore_index=True, sort=False)
+    del df1, df2, df3
+
+    #    Position of each line within its order, in file order.
+    #    FACT_ORDER_ITEMS pairs products with prices on (order_id, line_no).
+    df_all = drop_missing_ids(assign_line_no(df_all))
 
     # 4) Connect to Postgres
     conn = psycopg2.connect(
@@ -107,37 +132,51 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     # 5) Drop & recreate staging table
     table_name = "stg_line_item_data_products"
     cur.execute(f"DROP TABLE IF EXISTS {table_name};")
 
     cur.execute(f"""
         CREATE TABLE {table_name} (
-            order_id      TEXT,
+            order_id      UUID,
+            line_no       INTEGER,
             product_name  TEXT,
-            product_id    TEXT
+            product_id    BIGINT,
+            ingested_at   TIMESTAMP DEFAULT now()
         );
     """)
 
     # 6) Bulk insert using COPY
-    buffer = StringIO()
-    df_all.to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        f"""
-        COPY {table_name} (order_id, product_name, product_id)
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
+    with profiler.phase("encode_ids"):
+        save_aliases(cur, encode_ids(df_all, ID_COLUMNS))
+    with profiler.phase("copy_buffer"):
+        buffer = StringIO()
+        df_all.to_csv(buffer, index=False, header=False, columns=["order_id", "line_no", "product_name", "product_id"])
+        buffer.seek(0)
+
+        cur.copy_expert(
+            f"""
+            COPY {table_name} (order_id, line_no, product_name, product_id)
+            FROM STDIN WITH (FORMAT csv)
+            """,
+            buffer,
+        )
+
+    create_line_no_index(cur, table_name)
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
+    result = {
         "table": table_name,
         "rows_loaded": len(df_all),
         "sources": [URL_PROD_1, URL_PROD_2, URL_PROD_3],
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
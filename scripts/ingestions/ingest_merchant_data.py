@@ -1,29 +1,33 @@
 import io
 import re
-import requests
 import pandas as pd
 import psycopg2
 from io import StringIO
 import lxml 
 
+from f.common.chunked_sources import download, read_html_chunks
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+from f.common.soft_dedup import (
+    DEDUP_MEMORY_BUDGET_MB,
+    FLAG_COLUMNS,
+    flag_soft_duplicates,
+    soft_dedup_chunks,
+)
+
 # 🔑 Replace with the EXACT Raw URL for merchant_data.html from GitHub
 FILE_URL = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Enterprise%20Department/merchant_data.html"
 )
 
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"merchant_id": "merchant", "possible_duplicate_of": "merchant"}
 
-def main():
-    # 1) Download HTML from GitHub
-    resp = requests.get(FILE_URL, timeout=30)
-    resp.raise_for_status()
-
-    # 2) Parse HTML Table
-    tables = pd.read_html(resp.text)
-    if not tables:
-        raise ValueError("No tables found in merchant_data HTML")
-    
-    df = tables[0]
 
+def _clean_merchant_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans the raw merchant table (before soft deduplication).
+    """
     # ==========================================
     # 🧹 DATA CLEANING STEPS
     # ==========================================
@@ -45,22 +49,30 @@ def main():
     # 5. Trim Whitespace
     df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
 
-    # ------------------------------------------
-    # 🚀 SOFT DEDUPLICATION LOGIC
-    # ------------------------------------------
-    
-    # A. Sort by Merchant ID and Creation Date (Newest first)
-    df = df.sort_values(by=['merchant_id', 'creation_date'], ascending=[True, False])
+    return df
 
-    # B. Flag Duplicates
-    #    keep='first' preserves the newest record as the Master.
-    df['possible_duplicate'] = df.duplicated(subset=['merchant_id'], keep='first')
 
-    # C. Link to Master ID
-    df['possible_duplicate_of'] = None
-    df.loc[df['possible_duplicate'], 'possible_duplicate_of'] = df['merchant_id']
+def _standardize_merchant_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans the raw merchant table and flags soft duplicates
+    (newest creation_date per merchant_id is the master).
+    """
+    return flag_soft_duplicates(_clean_merchant_df(df), 'merchant_id', ['creation_date'], [False])
+
+
+def _cleaned_chunks(url: str, required_cols: list):
+    """The source at `url`, downloaded, then parsed and cleaned chunk by chunk."""
+    with download(url) as path:
+        for chunk in read_html_chunks(path):
+            chunk = _clean_merchant_df(chunk)
+            missing = [c for c in required_cols if c not in chunk.columns and c not in FLAG_COLUMNS]
+            if missing:
+                raise ValueError(f"Missing expected columns in HTML: {missing}")
+            yield chunk
 
-    # ==========================================
+
+def main(profile_memory: bool = False, dedup_memory_mb: float = DEDUP_MEMORY_BUDGET_MB):
+    profiler = MemoryProfiler.from_flag(profile_memory)
 
     # Expected columns verification
     required_cols = [
@@ -68,9 +80,14 @@ def main():
         "city", "country", "contact_number", 
         "possible_duplicate", "possible_duplicate_of"
     ]
-    missing = [c for c in required_cols if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing expected columns in HTML: {missing}")
+
+    # 1) Download HTML from GitHub to a temporary file
+    # 2) Parse and clean it in chunks as soft deduplication reads them.
+    #    Above the memory budget each chunk is hash-partitioned to disk as
+    #    it arrives, so the whole table is never in memory
+    batches = soft_dedup_chunks(
+        _cleaned_chunks(FILE_URL, required_cols), 'merchant_id', ['creation_date'], [False], dedup_memory_mb
+    )
 
     # 3) Connect directly to Postgres
     conn = psycopg2.connect(
@@ -82,12 +99,16 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     # 4) Drop & Recreate Staging Table (FIXED)
     cur.execute("DROP TABLE IF EXISTS stg_merchant_data;")
 
     cur.execute("""
         CREATE TABLE stg_merchant_data (
-            merchant_id           TEXT,
+            merchant_id           BIGINT,
             creation_date         TIMESTAMP,
             name                  TEXT,
             street                TEXT,
@@ -96,32 +117,44 @@ def main():
             country               TEXT,
             contact_number        TEXT,
             possible_duplicate    BOOLEAN,
-            possible_duplicate_of TEXT
+            possible_duplicate_of BIGINT,
+            ingested_at           TIMESTAMP DEFAULT now()
         );
     """)
 
     # 5) Bulk insert using COPY
-    buffer = StringIO()
-    df[required_cols].to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        """
-        COPY stg_merchant_data (
-            merchant_id, creation_date, name, street, state, city, country, contact_number,
-            possible_duplicate, possible_duplicate_of
-        )
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
+    rows_loaded = duplicates_flagged = 0
+    for batch in profiler.iter_phase("dedup", batches):
+        with profiler.phase("encode_ids"):
+            save_aliases(cur, encode_ids(batch, ID_COLUMNS))
+        with profiler.phase("copy_buffer"):
+            buffer = StringIO()
+            batch[required_cols].to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+
+            cur.copy_expert(
+                """
+                COPY stg_merchant_data (
+                    merchant_id, creation_date, name, street, state, city, country, contact_number,
+                    possible_duplicate, possible_duplicate_of
+                )
+                FROM STDIN WITH (FORMAT csv)
+                """,
+                buffer,
+            )
+            rows_loaded += len(batch)
+            duplicates_flagged += int(batch['possible_duplicate'].sum())
+            del batch, buffer
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
-        "rows_loaded": len(df),
-        "duplicates_flagged": int(df['possible_duplicate'].sum()),
+    result = {
+        "rows_loaded": rows_loaded,
+        "duplicates_flagged": duplicates_flagged,
         "source_url": FILE_URL,
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
@@ -8,6 +8,9 @@ import pyarrow      # for parquet
 import lxml         # for read_html
 import openpyxl     # for read_excel
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+
 
 # 🔗 RAW URLs for each file
 URL_2020_H1 = (
@@ -39,6 +42,10 @@ URL_2023_H2 = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/"
     "datasets/Operations%20Department/order_data_20230601-20240101.html"
 )
+
+# Stored as UUID / BIGINT (f.common.ids)
+ID_COLUMNS = {"order_id": "order", "user_id": "user"}
+
 # ---------- helpers to download + load ----------
 
 def _get(url: str) -> requests.Response:
@@ -74,7 +81,7 @@ def _load_json(url: str) -> pd.DataFrame:
 
 def _load_html(url: str) -> pd.DataFrame:
     resp = _get(url)
-    tables = pd.read_html(resp.text)
+    tables = pd.read_html(StringIO(resp.text))
     if not tables:
         raise ValueError(f"No tables found in HTML from {url}")
     return tables[0]
@@ -210,22 +217,32 @@ def _copy_df(cur, table_name: str, df: pd.DataFrame):
 
 # ---------- main ----------
 
-def main():
+def main(profile_memory: bool = False):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
     print("⏳ Loading historical data slices...")
 
-    df_2020_h1 = _standardize_order_df(_load_parquet(URL_2020_H1))
-    df_2020_h2 = _standardize_order_df(_load_pickle(URL_2020_H2))
-    df_2021    = _standardize_order_df(_load_csv(URL_2021))
-    df_2022    = _standardize_order_df(_load_xlsx(URL_2022))
-    df_2023_h1 = _standardize_order_df(_load_json(URL_2023_H1))
-    df_2023_h2 = _standardize_order_df(_load_html(URL_2023_H2))
+    slices = [
+        (_load_parquet, URL_2020_H1),
+        (_load_pickle, URL_2020_H2),
+        (_load_csv, URL_2021),
+        (_load_xlsx, URL_2022),
+        (_load_json, URL_2023_H1),
+        (_load_html, URL_2023_H2),
+    ]
+
+    frames = []
+    for loader, url in slices:
+        with profiler.phase("load"):
+            raw = loader(url)
+        with profiler.phase("standardize"):
+            frames.append(_standardize_order_df(raw))
+        del raw
 
     print("🔗 Combining and deduplicating...")
-    df_all = pd.concat(
-        [df_2020_h1, df_2020_h2, df_2021, df_2022, df_2023_h1, df_2023_h2],
-        ignore_index=True,
-        sort=False,
-    ).drop_duplicates()
+    with profiler.phase("concat"):
+        df_all = pd.concat(frames, ignore_index=True, sort=False).drop_duplicates()
+    del frames
 
     table_name = "stg_order_data"
 
@@ -233,20 +250,28 @@ def main():
     conn = _connect()
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     cur.execute(f"DROP TABLE IF EXISTS {table_name};")
     cur.execute(
         f"""
         CREATE TABLE {table_name} (
-            order_id           TEXT UNIQUE,
-            user_id            TEXT,
+            order_id           UUID UNIQUE,
+            user_id            BIGINT,
             estimated_arrival  INTEGER,
-            transaction_date   TIMESTAMP
+            transaction_date   TIMESTAMP,
+            ingested_at        TIMESTAMP DEFAULT now()
         );
         """
     )
 
     if not df_all.empty:
-        _copy_df(cur, table_name, df_all)
+        with profiler.phase("encode_ids"):
+            save_aliases(cur, encode_ids(df_all, ID_COLUMNS))
+        with profiler.phase("copy_buffer"):
+            _copy_df(cur, table_name, df_all)
 
     conn.commit()
     cur.close()
@@ -254,14 +279,14 @@ def main():
 
     print(f"✅ Loaded {len(df_all)} rows into {table_name}.")
 
-    return {
+    result = {
         "table": table_name,
         "rows_loaded": int(len(df_all)),
-        "sources": [
-            URL_2020_H1, URL_2020_H2, URL_2021,
-            URL_2022, URL_2023_H1, URL_2023_H2,
-        ],
+        "sources": [url for _, url in slices],
     }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
 
 
 if __name__ == "__main__":
@@ -4,6 +4,9 @@ import psycopg2
 from io import StringIO
 import lxml  # ensure lxml is available for read_html
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+
 
 # 🔗 Raw URL for order_delays.html
 FILE_URL = (
@@ -11,20 +14,14 @@ FILE_URL = (
     "datasets/Operations%20Department/order_delays.html"
 )
 
+# Stored as UUID (f.common.ids)
+ID_COLUMNS = {"order_id": "order"}
 
-def main():
-    # 1) Download HTML from GitHub
-    resp = requests.get(FILE_URL, timeout=60)
-    resp.raise_for_status()
-    html_str = resp.text
-
-    # 2) Parse first table from HTML
-    tables = pd.read_html(html_str)
-    if not tables:
-        raise ValueError("No tables found in order_delays HTML")
-
-    df = tables[0]
 
+def _standardize_delays_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ensures output columns: order_id, delay_in_days (nullable integer)
+    """
     # Drop junk index column if present
     if "Unnamed: 0" in df.columns:
         df = df.drop(columns=["Unnamed: 0"])
@@ -50,6 +47,31 @@ def main():
     # 4) Cast delay_in_days to integer-like
     df["delay_in_days"] = pd.to_numeric(df["delay_in_days"], errors="coerce").astype("Int64")
 
+    return df[required_cols]
+
+
+def main(profile_memory: bool = False):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
+    # 1) Download HTML from GitHub
+    # 2) Parse first table from HTML
+    with profiler.phase("load"):
+        resp = requests.get(FILE_URL, timeout=60)
+        resp.raise_for_status()
+        html_str = resp.text
+
+        tables = pd.read_html(StringIO(html_str))
+        if not tables:
+            raise ValueError("No tables found in order_delays HTML")
+
+        df = tables[0]
+        del resp, html_str, tables
+
+    with profiler.phase("standardize"):
+        df = _standardize_delays_df(df)
+
+    required_cols = ["order_id", "delay_in_days"]
+
     # 5) Connect to Postgres
     conn = psycopg2.connect(
         host="db",
@@ -60,39 +82,50 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     table_name = "stg_order_delays"
 
     # 6) Drop & recreate staging table
     cur.execute(f"DROP TABLE IF EXISTS {table_name};")
     cur.execute(f"""
         CREATE TABLE {table_name} (
-            order_id       TEXT,
-            delay_in_days  INTEGER
+            order_id       UUID,
+            delay_in_days  INTEGER,
+            ingested_at    TIMESTAMP DEFAULT now()
         );
     """)
 
     # 7) Bulk insert using COPY
-    buffer = StringIO()
-    df[required_cols].to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        f"""
-        COPY {table_name} (
-            order_id,
-            delay_in_days
+    with profiler.phase("encode_ids"):
+        save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    with profiler.phase("copy_buffer"):
+        buffer = StringIO()
+        df[required_cols].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        cur.copy_expert(
+            f"""
+            COPY {table_name} (
+                order_id,
+                delay_in_days
+            )
+            FROM STDIN WITH (FORMAT csv)
+            """,
+            buffer,
         )
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
+    result = {
         "table": table_name,
         "rows_loaded": len(df),
         "source_url": FILE_URL,
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
@@ -7,6 +7,9 @@ import pandas as pd
 import psycopg2
 import pyarrow  # needed so pandas can read parquet via pyarrow
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+
 
 # 🔑 Raw URLs from GitHub
 URL_ORDER_MERCHANT_1 = (
@@ -24,6 +27,9 @@ URL_ORDER_MERCHANT_3 = (
     "datasets/Enterprise%20Department/order_with_merchant_data3.csv"
 )
 
+# Stored as UUID / BIGINT (f.common.ids); every other column is TEXT
+ID_COLUMNS = {"order_id": "order", "merchant_id": "merchant", "staff_id": "staff"}
+
 
 def _sanitize_column(name: str) -> str:
     """
@@ -53,24 +59,30 @@ def _load_csv_from_github(url: str) -> pd.DataFrame:
     return pd.read_csv(io.StringIO(resp.text))
 
 
-def main():
+def main(profile_memory: bool = False):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
     # 1) Load all three datasets from GitHub
-    df1 = _load_parquet_from_github(URL_ORDER_MERCHANT_1)
-    df2 = _load_parquet_from_github(URL_ORDER_MERCHANT_2)
-    df3 = _load_csv_from_github(URL_ORDER_MERCHANT_3)
+    with profiler.phase("load"):
+        df1 = _load_parquet_from_github(URL_ORDER_MERCHANT_1)
+        df2 = _load_parquet_from_github(URL_ORDER_MERCHANT_2)
+        df3 = _load_csv_from_github(URL_ORDER_MERCHANT_3)
 
     # 2) Combine into ONE big DataFrame (union of columns)
-    df_all = pd.concat([df1, df2, df3], ignore_index=True, sort=False)
+    with profiler.phase("concat"):
+        df_all = pd.concat([df1, df2, df3], ignore_index=True, sort=False)
+    del df1, df2, df3
 
-    # 3) Drop any junk "Unnamed: 0" style columns
-    junk_cols = [c for c in df_all.columns if str(c).lower().startswith("unnamed")]
-    if junk_cols:
-        df_all = df_all.drop(columns=junk_cols)
+    with profiler.phase("standardize"):
+        # 3) Drop any junk "Unnamed: 0" style columns
+        junk_cols = [c for c in df_all.columns if str(c).lower().startswith("unnamed")]
+        if junk_cols:
+            df_all = df_all.drop(columns=junk_cols)
 
-    # 4) Sanitize column names once for the combined DataFrame
-    original_cols = list(df_all.columns)
-    safe_cols = [_sanitize_column(c) for c in original_cols]
-    df_all.columns = safe_cols
+        # 4) Sanitize column names once for the combined DataFrame
+        original_cols = list(df_all.columns)
+        safe_cols = [_sanitize_column(c) for c in original_cols]
+        df_all.columns = safe_cols
 
     # 5) Connect once to Postgres
     conn = psycopg2.connect(
@@ -82,12 +94,19 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     table_name = "stg_order_with_merchant_data"
 
-    # 6) Drop & recreate ONE staging table with all TEXT columns
+    # 6) Drop & recreate ONE staging table with TEXT columns except the IDs (+ ingested_at)
     cur.execute(f"DROP TABLE IF EXISTS {table_name};")
 
-    cols_sql = ",\n".join(f"{col} TEXT" for col in safe_cols)
+    id_types = {col: "UUID" if kind == "order" else "BIGINT" for col, kind in ID_COLUMNS.items()}
+    cols_sql = ",\n".join(
+        [f"{col} {id_types.get(col, 'TEXT')}" for col in safe_cols] + ["ingested_at TIMESTAMP DEFAULT now()"]
+    )
     create_sql = f"""
         CREATE TABLE {table_name} (
             {cols_sql}
@@ -96,24 +115,30 @@ def main():
     cur.execute(create_sql)
 
     # 7) Bulk insert everything using COPY
-    buffer = StringIO()
-    df_all.to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    copy_sql = f"""
-        COPY {table_name} ({", ".join(safe_cols)})
-        FROM STDIN WITH (FORMAT csv)
-    """
-    cur.copy_expert(copy_sql, buffer)
+    with profiler.phase("encode_ids"):
+        save_aliases(cur, encode_ids(df_all, {c: k for c, k in ID_COLUMNS.items() if c in df_all.columns}))
+    with profiler.phase("copy_buffer"):
+        buffer = StringIO()
+        df_all.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        copy_sql = f"""
+            COPY {table_name} ({", ".join(safe_cols)})
+            FROM STDIN WITH (FORMAT csv)
+        """
+        cur.copy_expert(copy_sql, buffer)
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
+    result = {
         "table": table_name,
         "rows_loaded": len(df_all),
         "columns": safe_cols,
         "sources": [URL_ORDER_MERCHANT_1, URL_ORDER_MERCHANT_2, URL_ORDER_MERCHANT_3],
         "dropped_unnamed_columns": junk_cols,
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
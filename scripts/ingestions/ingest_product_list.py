@@ -4,26 +4,22 @@ import psycopg2
 from io import BytesIO, StringIO
 import openpyxl  # Required for pandas to read Excel files
 
+from f.common.ids import encode_ids, ensure_id_codec, migrate_id_column, save_aliases
+from f.common.memory_profile import MemoryProfiler
+from f.common.money import migrate_money_columns, to_cents
+
 # 🔑 Replace with the EXACT Raw URL for product_list.xlsx from GitHub
 FILE_URL = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Business%20Department/product_list.xlsx"
 )
 
-def main():
-    # 1) Download file from GitHub
-    resp = requests.get(FILE_URL, timeout=30)
-    resp.raise_for_status()
-    file_bytes = resp.content
-
-    # 2) Try reading as Excel, fall back to CSV if needed
-    try:
-        df = pd.read_excel(BytesIO(file_bytes), engine="openpyxl")
-    except Exception:
-        try:
-            df = pd.read_csv(BytesIO(file_bytes))
-        except Exception as e2:
-            raise ValueError(f"Failed to read file as Excel or CSV: {e2}")
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"product_id": "product"}
 
+def _standardize_product_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalizes product headers, type/name casing and price.
+    """
     # ==========================================
     # 🧹 DATA CLEANING STEPS
     # ==========================================
@@ -65,11 +61,39 @@ def main():
             print(f"Warning: Dropping {invalid_price_rows.sum()} rows with invalid or missing 'price'.")
             df = df[~invalid_price_rows]
 
+        # Integer cents (f.common.money): 12.81 -> 1281
+        df["price"] = to_cents(df["price"])
+
     # 6. Safety Deduplication
     df = df.drop_duplicates()
 
     # ==========================================
 
+    return df
+
+
+def main(profile_memory: bool = False):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
+    # 1) Download file from GitHub
+    # 2) Try reading as Excel, fall back to CSV if needed
+    with profiler.phase("load"):
+        resp = requests.get(FILE_URL, timeout=30)
+        resp.raise_for_status()
+        file_bytes = resp.content
+
+        try:
+            df = pd.read_excel(BytesIO(file_bytes), engine="openpyxl")
+        except Exception:
+            try:
+                df = pd.read_csv(BytesIO(file_bytes))
+            except Exception as e2:
+                raise ValueError(f"Failed to read file as Excel or CSV: {e2}")
+        del resp, file_bytes
+
+    with profiler.phase("standardize"):
+        df = _standardize_product_df(df)
+
     # Verify Columns
     required_cols = ["product_id", "product_name", "product_type", "price"]
     missing = [c for c in required_cols if c not in df.columns]
@@ -96,36 +120,50 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     # 4) Create / Reset Staging Table
     cur.execute("""
         CREATE TABLE IF NOT EXISTS stg_product_list (
-            product_id    TEXT,
+            product_id    BIGINT,
             product_name  TEXT,
             product_type  TEXT,
-            price         NUMERIC
+            price         BIGINT,
+            ingested_at   TIMESTAMP DEFAULT now()
         );
         TRUNCATE TABLE stg_product_list;
     """)
+    migrate_id_column(cur, "stg_product_list", "product_id", "product")
+    migrate_money_columns(cur, "stg_product_list", ["price"])
 
     # 5) Bulk insert using COPY
-    buffer = StringIO()
-    df[required_cols].to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        """
-        COPY stg_product_list (product_id, product_name, product_type, price)
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
+    with profiler.phase("encode_ids"):
+        rows = df[required_cols].copy()
+        save_aliases(cur, encode_ids(rows, ID_COLUMNS))
+    with profiler.phase("copy_buffer"):
+        buffer = StringIO()
+        rows.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        cur.copy_expert(
+            """
+            COPY stg_product_list (product_id, product_name, product_type, price)
+            FROM STDIN WITH (FORMAT csv)
+            """,
+            buffer,
+        )
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
+    result = {
         "rows_loaded": len(df),
         "source_url": FILE_URL,
         "columns_found": list(df.columns)
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
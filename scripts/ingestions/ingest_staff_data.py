@@ -1,26 +1,32 @@
 import io
-import requests
 import pandas as pd
 import psycopg2
 from io import StringIO
 import lxml 
 import re 
 
+from f.common.chunked_sources import download, read_html_chunks
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+from f.common.soft_dedup import (
+    DEDUP_MEMORY_BUDGET_MB,
+    FLAG_COLUMNS,
+    flag_soft_duplicates,
+    soft_dedup_chunks,
+)
+
 # 🔑 Replace with the EXACT Raw URL of staff_data.html from GitHub
 FILE_URL = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Enterprise%20Department/staff_data.html"
 )
 
-def main():
-    # 1. Download & Parse
-    resp = requests.get(FILE_URL, timeout=30)
-    resp.raise_for_status()
-    
-    tables = pd.read_html(resp.text)
-    if not tables:
-        raise ValueError("No tables found")
-    df = tables[0]
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"staff_id": "staff", "possible_duplicate_of": "staff"}
 
+def _clean_staff_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans the raw staff table (before soft deduplication).
+    """
     # ==========================================
     # 🧹 DATA CLEANING STEPS
     # ==========================================
@@ -42,32 +48,45 @@ def main():
     if "contact_number" in df.columns:
         df["contact_number"] = df["contact_number"].astype(str).str.replace(r'\D', '', regex=True)
 
-    # ------------------------------------------
-    # 🚀 SOFT DEDUPLICATION LOGIC
-    # ------------------------------------------
-    
-    # A. Sort by Staff ID and Creation Date (Newest first)
-    df = df.sort_values(by=['staff_id', 'creation_date'], ascending=[True, False])
+    return df
 
-    # B. Flag Duplicates
-    #    keep='first' preserves the newest record as False (Not duplicate)
-    df['possible_duplicate'] = df.duplicated(subset=['staff_id'], keep='first')
 
-    # C. Link to Master ID
-    df['possible_duplicate_of'] = None
-    df.loc[df['possible_duplicate'], 'possible_duplicate_of'] = df['staff_id']
+def _standardize_staff_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans the raw staff table and flags soft duplicates
+    (newest creation_date per staff_id is the master).
+    """
+    return flag_soft_duplicates(_clean_staff_df(df), 'staff_id', ['creation_date'], [False])
 
-    # ==========================================
 
-    # Verify Columns
+def _cleaned_chunks(url: str, required_cols: list):
+    """The source at `url`, downloaded, then parsed and cleaned chunk by chunk."""
+    with download(url) as path:
+        for chunk in read_html_chunks(path):
+            chunk = _clean_staff_df(chunk)
+            missing = [c for c in required_cols if c not in chunk.columns and c not in FLAG_COLUMNS]
+            if missing:
+                raise ValueError(f"Missing expected columns: {missing}")
+            yield chunk
+
+
+def main(profile_memory: bool = False, dedup_memory_mb: float = DEDUP_MEMORY_BUDGET_MB):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
+    # Expected columns verification
     required_cols = [
         "staff_id", "name", "job_level", "street", "state", "city", 
         "country", "contact_number", "creation_date", 
         "possible_duplicate", "possible_duplicate_of"
     ]
-    missing = [c for c in required_cols if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing expected columns: {missing}")
+
+    # 1. Download to a temporary file, then parse and clean it in chunks as
+    #    soft deduplication reads them. Above the memory budget each chunk
+    #    is hash-partitioned to disk as it arrives, so the whole table is
+    #    never in memory
+    batches = soft_dedup_chunks(
+        _cleaned_chunks(FILE_URL, required_cols), 'staff_id', ['creation_date'], [False], dedup_memory_mb
+    )
 
     # Connect & Load
     conn = psycopg2.connect(
@@ -79,12 +98,16 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     # DROP TABLE fix
     cur.execute("DROP TABLE IF EXISTS stg_staff_data;")
 
     cur.execute("""
         CREATE TABLE stg_staff_data (
-            staff_id              TEXT,
+            staff_id              BIGINT,
             name                  TEXT,
             job_level             TEXT,
             street                TEXT,
@@ -94,32 +117,44 @@ def main():
             contact_number        TEXT,
             creation_date         TIMESTAMP,
             possible_duplicate    BOOLEAN,
-            possible_duplicate_of TEXT
+            possible_duplicate_of BIGINT,
+            ingested_at           TIMESTAMP DEFAULT now()
         );
     """)
 
-    buffer = StringIO()
-    df[required_cols].to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        """
-        COPY stg_staff_data (
-            staff_id, name, job_level, street, state, city, 
-            country, contact_number, creation_date,
-            possible_duplicate, possible_duplicate_of
-        )
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
+    rows_loaded = duplicates_flagged = 0
+    for batch in profiler.iter_phase("dedup", batches):
+        with profiler.phase("encode_ids"):
+            save_aliases(cur, encode_ids(batch, ID_COLUMNS))
+        with profiler.phase("copy_buffer"):
+            buffer = StringIO()
+            batch[required_cols].to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+
+            cur.copy_expert(
+                """
+                COPY stg_staff_data (
+                    staff_id, name, job_level, street, state, city, 
+                    country, contact_number, creation_date,
+                    possible_duplicate, possible_duplicate_of
+                )
+                FROM STDIN WITH (FORMAT csv)
+                """,
+                buffer,
+            )
+            rows_loaded += len(batch)
+            duplicates_flagged += int(batch['possible_duplicate'].sum())
+            del batch, buffer
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
-        "rows_loaded": len(df),
-        "duplicates_flagged": int(df['possible_duplicate'].sum()),
+    result = {
+        "rows_loaded": rows_loaded,
+        "duplicates_flagged": duplicates_flagged,
         "source_url": FILE_URL
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
@@ -5,12 +5,18 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+
 # 🔗 RAW URL for Historical Data
 HISTORICAL_FILE_URL = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/"
     "datasets/Marketing%20Department/transactional_campaign_data.csv"
 )
 
+# Stored as UUID (f.common.ids)
+ID_COLUMNS = {"order_id": "order"}
+
 
 # ---------- helpers ----------
 
@@ -80,15 +86,21 @@ def _standardize_links_df(df: pd.DataFrame) -> pd.DataFrame:
 
 # ---------- main ----------
 
-def main(new_links_file: bytes = None):
+def main(new_links_file: bytes = None, profile_memory: bool = False):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
     # ==========================================
     # PART 1: LOAD HISTORICAL DATA
     # ==========================================
     print("⏳ Loading historical transactional campaign data...")
     
     # Download and Standardize
-    resp = _get(HISTORICAL_FILE_URL)
-    df_historical = _standardize_links_df(pd.read_csv(io.StringIO(resp.text)))
+    with profiler.phase("load"):
+        resp = _get(HISTORICAL_FILE_URL)
+        df_raw = pd.read_csv(io.StringIO(resp.text))
+    with profiler.phase("standardize"):
+        df_historical = _standardize_links_df(df_raw)
+    del df_raw
 
     # Connect to Postgres
     conn = psycopg2.connect(
@@ -100,6 +112,10 @@ def main(new_links_file: bytes = None):
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     table_name = "stg_transactional_campaign_data"
 
     # Drop & Recreate Staging Table (Full Refresh for Historical)
@@ -111,31 +127,35 @@ def main(new_links_file: bytes = None):
         CREATE TABLE {table_name} (
             transaction_date   TIMESTAMP,
             campaign_id        TEXT,
-            order_id           TEXT,
+            order_id           UUID,
             estimated_arrival  INTEGER,
-            availed            INTEGER
+            availed            INTEGER,
+            ingested_at        TIMESTAMP DEFAULT now()
         );
     """)
 
     # Bulk insert Historical Data
     print(f"📥 Inserting {len(df_historical)} historical rows...")
-    buffer = StringIO()
-    df_historical.to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        f"""
-        COPY {table_name} (
-            transaction_date, 
-            campaign_id, 
-            order_id, 
-            estimated_arrival, 
-            availed
+    with profiler.phase("encode_ids"):
+        save_aliases(cur, encode_ids(df_historical, ID_COLUMNS))
+    with profiler.phase("copy_buffer"):
+        buffer = StringIO()
+        df_historical.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        cur.copy_expert(
+            f"""
+            COPY {table_name} (
+                transaction_date, 
+                campaign_id, 
+                order_id, 
+                estimated_arrival, 
+                availed
+            )
+            FROM STDIN WITH (FORMAT csv)
+            """,
+            buffer,
         )
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
     conn.commit()
 
     # ==========================================
@@ -167,24 +187,27 @@ def main(new_links_file: bytes = None):
 
     if not df_new_links.empty:
         # 2) Bulk Insert (APPEND ONLY)
-        buffer = StringIO()
-        df_new_links.to_csv(buffer, index=False, header=False)
-        buffer.seek(0)
-
         try:
-            cur.copy_expert(
-                f"""
-                COPY {table_name} (
-                    transaction_date, 
-                    campaign_id, 
-                    order_id, 
-                    estimated_arrival, 
-                    availed
+            with profiler.phase("encode_ids"):
+                save_aliases(cur, encode_ids(df_new_links, ID_COLUMNS))
+            with profiler.phase("copy_buffer"):
+                buffer = StringIO()
+                df_new_links.to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+
+                cur.copy_expert(
+                    f"""
+                    COPY {table_name} (
+                        transaction_date, 
+                        campaign_id, 
+                        order_id, 
+                        estimated_arrival, 
+                        availed
+                    )
+                    FROM STDIN WITH (FORMAT csv)
+                    """,
+                    buffer,
                 )
-                FROM STDIN WITH (FORMAT csv)
-                """,
-                buffer,
-            )
             conn.commit()
             print(f"➕ Appended {len(df_new_links)} new rows to {table_name}.")
             
@@ -196,12 +219,15 @@ def main(new_links_file: bytes = None):
     cur.close()
     conn.close()
 
-    return {
+    result = {
         "table": table_name,
         "historical_rows": len(df_historical),
         "test_rows_appended": len(df_new_links),
         "total_rows": len(df_historical) + len(df_new_links)
     }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
 
 
 if __name__ == "__main__":
@@ -3,19 +3,29 @@ import pandas as pd
 import psycopg2
 from io import BytesIO, StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, migrate_id_column, save_aliases
+from f.common.memory_profile import MemoryProfiler
+
 # 🔑 Replace with the EXACT Raw URL for user_credit_card.pickle from GitHub
 FILE_URL = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Customer%20Management%20Department/user_credit_card.pickle"
 )
 
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"user_id": "user"}
 
-def main():
-    # 1) Download pickle from GitHub
-    resp = requests.get(FILE_URL, timeout=30)
-    resp.raise_for_status()  # raise if 404/500
 
+def main(profile_memory: bool = False):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
+    # 1) Download pickle from GitHub
     # 2) Load pickled DataFrame from bytes
-    df = pd.read_pickle(BytesIO(resp.content))
+    with profiler.phase("load"):
+        resp = requests.get(FILE_URL, timeout=30)
+        resp.raise_for_status()  # raise if 404/500
+
+        df = pd.read_pickle(BytesIO(resp.content))
+        del resp
 
     # Expected columns based on the pickle:
     # user_id, name, credit_card_number, issuing_bank
@@ -25,7 +35,8 @@ def main():
         raise ValueError(f"Missing expected columns in pickle: {missing}")
 
     # Optional: ensure credit card number is a string (safer than int)
-    df["credit_card_number"] = df["credit_card_number"].astype(str)
+    with profiler.phase("standardize"):
+        df["credit_card_number"] = df["credit_card_number"].astype(str)
 
     # 3) Connect directly to Postgres container "db"
     conn = psycopg2.connect(
@@ -37,40 +48,51 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     # 4) Create / reset staging table
     cur.execute("""
         CREATE TABLE IF NOT EXISTS stg_user_credit_card (
-            user_id             TEXT,
+            user_id             BIGINT,
             name                TEXT,
             credit_card_number  TEXT,
             issuing_bank        TEXT
         );
         TRUNCATE TABLE stg_user_credit_card;
     """)
+    migrate_id_column(cur, "stg_user_credit_card", "user_id", "user")
 
     # 5) Bulk insert using COPY
-    buffer = StringIO()
-    df[required_cols].to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        """
-        COPY stg_user_credit_card (
-            user_id,
-            name,
-            credit_card_number,
-            issuing_bank
+    with profiler.phase("encode_ids"):
+        save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    with profiler.phase("copy_buffer"):
+        buffer = StringIO()
+        df[required_cols].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        cur.copy_expert(
+            """
+            COPY stg_user_credit_card (
+                user_id,
+                name,
+                credit_card_number,
+                issuing_bank
+            )
+            FROM STDIN WITH (FORMAT csv)
+            """,
+            buffer,
         )
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
+    result = {
         "rows_loaded": len(df),
         "source_url": FILE_URL,
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
@@ -4,22 +4,28 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+from f.common.soft_dedup import (
+    DEDUP_MEMORY_BUDGET_MB,
+    FLAG_COLUMNS,
+    flag_soft_duplicates,
+    soft_dedup_batches,
+)
+
 # 🔑 Replace this with the EXACT Raw URL for user_data.json from GitHub
 FILE_URL = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Customer%20Management%20Department/user_data.json"
 )
 
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"user_id": "user", "possible_duplicate_of": "user"}
 
-def main():
-    # 1) Download JSON from GitHub
-    resp = requests.get(FILE_URL, timeout=30)
-    resp.raise_for_status()
-
-    # 2) Parse JSON
-    raw = json.loads(resp.text)
-    cols = {col: pd.Series(mapping) for col, mapping in raw.items()}
-    df = pd.DataFrame(cols)
 
+def _clean_user_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans the raw user table (before soft deduplication).
+    """
     # ==========================================
     # 🧹 DATA CLEANING STEPS
     # ==========================================
@@ -39,22 +45,33 @@ def main():
     # 4. Trim Whitespace
     df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
 
-    # ------------------------------------------
-    # 🚀 SOFT DEDUPLICATION LOGIC
-    # ------------------------------------------
-    
-    # A. Sort by User ID and Creation Date (Newest first)
-    df = df.sort_values(by=['user_id', 'creation_date'], ascending=[True, False])
+    return df
 
-    # B. Flag Duplicates
-    #    keep='first' preserves the newest record as the Master.
-    df['possible_duplicate'] = df.duplicated(subset=['user_id'], keep='first')
 
-    # C. Link to Master ID
-    df['possible_duplicate_of'] = None
-    df.loc[df['possible_duplicate'], 'possible_duplicate_of'] = df['user_id']
+def _standardize_user_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans the raw user table and flags soft duplicates
+    (newest creation_date per user_id is the master).
+    """
+    return flag_soft_duplicates(_clean_user_df(df), 'user_id', ['creation_date'], [False])
 
-    # ==========================================
+
+def main(profile_memory: bool = False, dedup_memory_mb: float = DEDUP_MEMORY_BUDGET_MB):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
+    # 1) Download JSON from GitHub
+    # 2) Parse JSON
+    with profiler.phase("load"):
+        resp = requests.get(FILE_URL, timeout=30)
+        resp.raise_for_status()
+
+        raw = json.loads(resp.text)
+        cols = {col: pd.Series(mapping) for col, mapping in raw.items()}
+        df = pd.DataFrame(cols)
+        del resp, raw, cols
+
+    with profiler.phase("standardize"):
+        df = _clean_user_df(df)
 
     # Verify Columns
     required_cols = [
@@ -62,10 +79,15 @@ def main():
         "city", "country", "birthdate", "gender", "device_address", "user_type",
         "possible_duplicate", "possible_duplicate_of"
     ]
-    missing = [c for c in required_cols if c not in df.columns]
+    missing = [c for c in required_cols if c not in df.columns and c not in FLAG_COLUMNS]
     if missing:
         raise ValueError(f"Missing expected columns in JSON: {missing}")
 
+    # Soft deduplication runs batch by batch while loading; above the memory
+    # budget the rows are hash-partitioned to disk first
+    batches = soft_dedup_batches(df, 'user_id', ['creation_date'], [False], dedup_memory_mb)
+    del df
+
     # 3) Connect directly to Postgres
     conn = psycopg2.connect(
         host="db",
@@ -76,12 +98,16 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     # 4) Drop & Recreate Staging Table (FIXED)
     cur.execute("DROP TABLE IF EXISTS stg_user_data;")
 
     cur.execute("""
         CREATE TABLE stg_user_data (
-            user_id               TEXT,
+            user_id               BIGINT,
             creation_date         TIMESTAMP,
             name                  TEXT,
             street                TEXT,
@@ -93,33 +119,45 @@ def main():
             device_address        TEXT,
             user_type             TEXT,
             possible_duplicate    BOOLEAN,
-            possible_duplicate_of TEXT
+            possible_duplicate_of BIGINT,
+            ingested_at           TIMESTAMP DEFAULT now()
         );
     """)
 
     # 5) Bulk insert using COPY
-    buffer = StringIO()
-    df[required_cols].to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        """
-        COPY stg_user_data (
-            user_id, creation_date, name, street, state, city, country, 
-            birthdate, gender, device_address, user_type,
-            possible_duplicate, possible_duplicate_of
-        )
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
+    rows_loaded = duplicates_flagged = 0
+    for batch in profiler.iter_phase("dedup", batches):
+        with profiler.phase("encode_ids"):
+            save_aliases(cur, encode_ids(batch, ID_COLUMNS))
+        with profiler.phase("copy_buffer"):
+            buffer = StringIO()
+            batch[required_cols].to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+
+            cur.copy_expert(
+                """
+                COPY stg_user_data (
+                    user_id, creation_date, name, street, state, city, country, 
+                    birthdate, gender, device_address, user_type,
+                    possible_duplicate, possible_duplicate_of
+                )
+                FROM STDIN WITH (FORMAT csv)
+                """,
+                buffer,
+            )
+            rows_loaded += len(batch)
+            duplicates_flagged += int(batch['possible_duplicate'].sum())
+            del batch, buffer
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
-        "rows_loaded": len(df),
-        "duplicates_flagged": int(df['possible_duplicate'].sum()),
+    result = {
+        "rows_loaded": rows_loaded,
+        "duplicates_flagged": duplicates_flagged,
         "source_url": FILE_URL,
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
@@ -1,26 +1,30 @@
-import io
 from urllib.parse import quote
-import requests
 import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.chunked_sources import download, read_csv_chunks
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.memory_profile import MemoryProfiler
+from f.common.soft_dedup import (
+    DEDUP_MEMORY_BUDGET_MB,
+    FLAG_COLUMNS,
+    flag_soft_duplicates,
+    soft_dedup_chunks,
+)
+
 # ✅ CORRECT raw base
 GITHUB_DATA_BASE = "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets"
 
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"user_id": "user", "possible_duplicate_of": "user"}
 
-def main():
-    # 1) Build raw URL for user_job.csv
-    relative_path = "Customer Management Department/user_job.csv"
-    url = f"{GITHUB_DATA_BASE}/{quote(relative_path)}"
-
-    # 2) Download CSV from GitHub
-    resp = requests.get(url, timeout=30)
-    resp.raise_for_status()
-
-    # 3) Read CSV into pandas
-    df = pd.read_csv(io.StringIO(resp.text))
 
+def _clean_user_job_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans the raw user_job table (before soft deduplication). The file
+    position is kept in an `index` column.
+    """
     # ==========================================
     # 🧹 DATA CLEANING STEPS
     # ==========================================
@@ -37,36 +41,50 @@ def main():
     # 4. Handle Missing Values
     df['job_level'] = df['job_level'].fillna('N/A')
 
-    # ------------------------------------------
-    # 🚀 SOFT DEDUPLICATION LOGIC
-    # ------------------------------------------
-    # Since there is no date, we assume the LAST row in the file is the "Latest".
-    
-    # A. Create a temp index to track file order
+    # 5. Track file order
+    #    There is no date, so the LAST row in the file is the "Latest".
     df = df.reset_index()
 
-    # B. Sort by User ID and Index (Descending) -> Newest file entry comes first
-    df = df.sort_values(by=['user_id', 'index'], ascending=[True, False])
+    return df
 
-    # C. Flag Duplicates
-    #    keep='first' means the top row (the latest one) is NOT a duplicate.
-    #    All others are marked True.
-    df['possible_duplicate'] = df.duplicated(subset=['user_id'], keep='first')
 
-    # D. Link to Master ID
-    df['possible_duplicate_of'] = None
-    # If it is a duplicate, point it to the user_id (the master's ID)
-    df.loc[df['possible_duplicate'], 'possible_duplicate_of'] = df['user_id']
+def _standardize_user_job_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans the raw user_job table and flags soft duplicates
+    (last row in file order per user_id is the master).
+    """
+    df = flag_soft_duplicates(_clean_user_job_df(df), 'user_id', ['index'], [False])
+    return df.drop(columns=['index'])
+
+
+def _cleaned_chunks(url: str, required_cols: list):
+    """The source at `url`, downloaded, then parsed and cleaned chunk by chunk."""
+    with download(url) as path:
+        for chunk in read_csv_chunks(path):
+            chunk = _clean_user_job_df(chunk)
+            missing = [c for c in required_cols if c not in chunk.columns and c not in FLAG_COLUMNS]
+            if missing:
+                raise ValueError(f"Missing expected columns in CSV: {missing}")
+            yield chunk
 
-    # E. Clean up temp columns
-    df = df.drop(columns=['index'])
-    # ==========================================
+
+def main(profile_memory: bool = False, dedup_memory_mb: float = DEDUP_MEMORY_BUDGET_MB):
+    profiler = MemoryProfiler.from_flag(profile_memory)
+
+    # 1) Build raw URL for user_job.csv
+    relative_path = "Customer Management Department/user_job.csv"
+    url = f"{GITHUB_DATA_BASE}/{quote(relative_path)}"
 
     # Expected columns verification
     required_cols = ["user_id", "name", "job_title", "job_level", "possible_duplicate", "possible_duplicate_of"]
-    missing = [c for c in required_cols if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing expected columns in CSV: {missing}")
+
+    # 2) Download CSV from GitHub to a temporary file
+    # 3) Read and clean it in chunks as soft deduplication reads them.
+    #    Above the memory budget each chunk is hash-partitioned to disk as
+    #    it arrives, so the whole table is never in memory
+    batches = soft_dedup_chunks(
+        _cleaned_chunks(url, required_cols), 'user_id', ['index'], [False], dedup_memory_mb
+    )
 
     # 4) Connect to Postgres
     conn = psycopg2.connect(
@@ -78,42 +96,58 @@ def main():
     )
     cur = conn.cursor()
 
+    # The ID codec is committed on its own; parallel steps wait on it
+    ensure_id_codec(cur)
+    conn.commit()
+
     # 5) Drop & Recreate staging table (FIXED)
     cur.execute("DROP TABLE IF EXISTS stg_user_job;")
     
     cur.execute("""
         CREATE TABLE stg_user_job (
-            user_id               TEXT,
+            user_id               BIGINT,
             name                  TEXT,
             job_title             TEXT,
             job_level             TEXT,
             possible_duplicate    BOOLEAN,
-            possible_duplicate_of TEXT
+            possible_duplicate_of BIGINT,
+            ingested_at           TIMESTAMP DEFAULT now()
         );
     """)
 
     # 6) Bulk insert using COPY
-    buffer = StringIO()
-    df[required_cols].to_csv(buffer, index=False, header=False)
-    buffer.seek(0)
-
-    cur.copy_expert(
-        """
-        COPY stg_user_job (
-            user_id, name, job_title, job_level, 
-            possible_duplicate, possible_duplicate_of
-        )
-        FROM STDIN WITH (FORMAT csv)
-        """,
-        buffer,
-    )
+    rows_loaded = duplicates_flagged = 0
+    for batch in profiler.iter_phase("dedup", batches):
+        with profiler.phase("encode_ids"):
+            save_aliases(cur, encode_ids(batch, ID_COLUMNS))
+        with profiler.phase("copy_buffer"):
+            buffer = StringIO()
+            batch[required_cols].to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+
+            cur.copy_expert(
+                """
+                COPY stg_user_job (
+                    user_id, name, job_title, job_level, 
+                    possible_duplicate, possible_duplicate_of
+                )
+                FROM STDIN WITH (FORMAT csv)
+                """,
+                buffer,
+            )
+            rows_loaded += len(batch)
+            duplicates_flagged += int(batch['possible_duplicate'].sum())
+            del batch, buffer
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {
-        "rows_loaded": len(df),
-        "duplicates_flagged": int(df['possible_duplicate'].sum()),
+    result = {
+        "rows_loaded": rows_loaded,
+        "duplicates_flagged": duplicates_flagged,
         "source_url": url,
-    }
\ No newline at end of file
+    }
+    if profiler.enabled:
+        result["memory_profile"] = profiler.print_report()
+    return result
\ No newline at end of file
@@ -4,8 +4,13 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+
 URL_TEST_FILE = "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Test%20Files/order_with_merchant_data.csv"
 
+# Stored as UUID / BIGINT (f.common.ids)
+ID_COLUMNS = {"order_id": "order", "merchant_id": "merchant", "staff_id": "staff"}
+
 def main(file_bytes: bytes = None):
     print("Starting Test Data Injection: Merchant Data")
 
@@ -26,6 +31,11 @@ def main(file_bytes: bytes = None):
     conn = psycopg2.connect(host="db", port=5432, user="postgres", password="shopzada", dbname="shopzada")
     cur = conn.cursor()
 
+    # IDs are stored as UUID / BIGINT (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    conn.commit()
+
     buffer = StringIO()
     df[required_cols].to_csv(buffer, index=False, header=False)
     buffer.seek(0)
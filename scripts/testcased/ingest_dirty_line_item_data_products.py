@@ -5,9 +5,14 @@ import psycopg2
 from psycopg2 import sql
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+
 # Placeholder URL - Replace with actual URL in production
 DIRTY_LINE_ITEMS_URL = "https://raw.githubusercontent.com/Quiosh/Datawarehouse-finals/main/datasets/Test%20Files/dirty_line_item_data_products.csv"
 
+# Stored as UUID / BIGINT (f.common.ids)
+ID_COLUMNS = {"Order_id": "order", "Product_id": "product"}
+
 def get_db_connection():
     return psycopg2.connect(
         host="db",
@@ -41,6 +46,11 @@ def main():
 
     conn = get_db_connection()
     cur = conn.cursor()
+
+    # IDs are stored as UUID / BIGINT (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    conn.commit()
     
     table_name = "stg_line_item_data_products"
     
@@ -49,12 +59,14 @@ def main():
     
     for index, row in df.iterrows():
         try:
+            # line_no continues after the order's lines already staged
             insert_query = sql.SQL("""
-                INSERT INTO {} (order_id, product_name, product_id)
-                VALUES (%s, %s, %s)
-            """).format(sql.Identifier(table_name))
+                INSERT INTO {} (order_id, line_no, product_name, product_id)
+                VALUES (%s, (SELECT COALESCE(max(line_no), 0) + 1 FROM {} WHERE order_id = %s), %s, %s)
+            """).format(sql.Identifier(table_name), sql.Identifier(table_name))
             
             cur.execute(insert_query, (
+                row['Order_id'], 
                 row['Order_id'], 
                 row['Product_name'], 
                 row['Product_id']
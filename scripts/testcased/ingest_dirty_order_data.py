@@ -5,9 +5,14 @@ import psycopg2
 from psycopg2 import sql
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+
 # Placeholder URL - Replace with actual URL in production
 DIRTY_ORDER_DATA_URL = "https://raw.githubusercontent.com/Quiosh/Datawarehouse-finals/main/datasets/Test%20Files/dirty_order_data.csv"
 
+# Stored as UUID / BIGINT (f.common.ids)
+ID_COLUMNS = {"Order_id": "order", "User_id": "user"}
+
 def get_db_connection():
     return psycopg2.connect(
         host="db",
@@ -85,6 +90,11 @@ def main():
 
     conn = get_db_connection()
     cur = conn.cursor()
+
+    # IDs are stored as UUID / BIGINT (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    conn.commit()
     
     table_name = "stg_order_data"
     
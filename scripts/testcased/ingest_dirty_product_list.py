@@ -5,9 +5,15 @@ import psycopg2
 from psycopg2 import sql
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.money import to_cents
+
 # Placeholder URL - Replace with actual URL in production
 DIRTY_PRODUCT_LIST_URL = "https://raw.githubusercontent.com/Quiosh/Datawarehouse-finals/main/datasets/Test%20Files/dirty_product_list.csv"
 
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"Product_id": "product"}
+
 def get_db_connection():
     return psycopg2.connect(
         host="db",
@@ -54,8 +60,16 @@ def main():
         print(f"Warning: Dropping {dropped_count} rows with missing 'Product_id'.")
         df = df[~missing_id_mask]
 
+    # 3. Price as integer cents (f.common.money)
+    df["Price"] = to_cents(df["Price"])
+
     conn = get_db_connection()
     cur = conn.cursor()
+
+    # IDs are stored as BIGINT (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    conn.commit()
     
     table_name = "stg_product_list"
     
@@ -4,11 +4,16 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+
 # 🔗 PLACEHOLDER URL (Fallback if no file is uploaded)
 URL_LATE_LINKS_FILE = (
     "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/"
     "datasets/Test%20Files/late_transactional_campaign.csv"
 )
+
+# Stored as UUID (f.common.ids)
+ID_COLUMNS = {"order_id": "order"}
 # ---------- helpers ----------
 
 
@@ -136,6 +141,11 @@ def main(new_links_file: bytes = None):
     )
     cur = conn.cursor()
 
+    # IDs are stored as UUID (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df_new_links, ID_COLUMNS))
+    conn.commit()
+
     table_name = "stg_transactional_campaign_data"
 
     # 3) Bulk Insert (APPEND ONLY)
@@ -9,6 +9,8 @@ import pyarrow  # for parquet
 import lxml  # for read_html
 import openpyxl  # for read_excel
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+
 # SELECT COUNT(*) FROM fact_orders WHERE date_key = 20240102; to read after state
 
 # Local test file (used as default if no upload is provided)
@@ -17,6 +19,9 @@ URL_TEST_FILE = (
     "datasets/Test%20Files/new_orders.csv"
 )
 
+# Stored as UUID / BIGINT (f.common.ids)
+ID_COLUMNS = {"order_id": "order", "user_id": "user"}
+
 
 # ---------- helpers to download + load ----------
 
@@ -54,7 +59,7 @@ def _load_json(url: str) -> pd.DataFrame:
 
 def _load_html(url: str) -> pd.DataFrame:
     resp = _get(url)
-    tables = pd.read_html(resp.text)
+    tables = pd.read_html(StringIO(resp.text))
     if not tables:
         raise ValueError(f"No tables found in HTML from {url}")
     return tables[0]
@@ -166,6 +171,11 @@ def main(new_orders_file: bytes = None):
     )
     cur = conn.cursor()
 
+    # IDs are stored as UUID / BIGINT (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df_new_orders, ID_COLUMNS))
+    conn.commit()
+
     table_name = "stg_order_data"
 
     # 3) Bulk insert (APPEND) using COPY
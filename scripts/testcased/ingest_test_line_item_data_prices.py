@@ -4,8 +4,15 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.line_items import assign_line_no, max_line_no
+from f.common.money import to_cents
+
 URL_TEST_FILE = "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Test%20Files/line_item_data_prices.csv"
 
+# Stored as UUID (f.common.ids)
+ID_COLUMNS = {"order_id": "order"}
+
 def main(file_bytes: bytes = None):
     print("Starting Test Data Injection: Line Item Prices")
 
@@ -22,10 +29,22 @@ def main(file_bytes: bytes = None):
     required_cols = ["order_id", "price", "quantity"]
     for c in required_cols:
         if c not in df.columns: df[c] = None
+    # Stored as integer cents (f.common.money)
+    df["price"] = to_cents(df["price"])
 
     conn = psycopg2.connect(host="db", port=5432, user="postgres", password="shopzada", dbname="shopzada")
     cur = conn.cursor()
 
+    # IDs are stored as UUID (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    conn.commit()
+
+    # Continue each order's line numbering after the lines already staged
+    offset = max_line_no(cur, "stg_line_item_data_prices", df["order_id"].dropna().unique())
+    df = assign_line_no(df, offset)
+    required_cols = required_cols + ["line_no"]
+
     buffer = StringIO()
     df[required_cols].to_csv(buffer, index=False, header=False)
     buffer.seek(0)
@@ -4,8 +4,14 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.line_items import assign_line_no, max_line_no
+
 URL_TEST_FILE = "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Test%20Files/line_item_data_products.csv"
 
+# Stored as UUID / BIGINT (f.common.ids)
+ID_COLUMNS = {"order_id": "order", "product_id": "product"}
+
 def main(file_bytes: bytes = None):
     print("Starting Test Data Injection: Line Item Products")
 
@@ -26,6 +32,16 @@ def main(file_bytes: bytes = None):
     conn = psycopg2.connect(host="db", port=5432, user="postgres", password="shopzada", dbname="shopzada")
     cur = conn.cursor()
 
+    # IDs are stored as UUID / BIGINT (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    conn.commit()
+
+    # Continue each order's line numbering after the lines already staged
+    offset = max_line_no(cur, "stg_line_item_data_products", df["order_id"].dropna().unique())
+    df = assign_line_no(df, offset)
+    required_cols = required_cols + ["line_no"]
+
     buffer = StringIO()
     df[required_cols].to_csv(buffer, index=False, header=False)
     buffer.seek(0)
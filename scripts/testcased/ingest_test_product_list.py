@@ -4,8 +4,14 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+from f.common.money import to_cents
+
 URL_TEST_FILE = "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Test%20Files/product_list.csv"
 
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"product_id": "product"}
+
 def main(file_bytes: bytes = None):
     print("Starting Test Data Injection: Product List")
 
@@ -22,10 +28,17 @@ def main(file_bytes: bytes = None):
     required_cols = ["product_id", "product_name", "product_type", "price"]
     for c in required_cols:
         if c not in df.columns: df[c] = None
+    # Stored as integer cents (f.common.money)
+    df["price"] = to_cents(df["price"])
 
     conn = psycopg2.connect(host="db", port=5432, user="postgres", password="shopzada", dbname="shopzada")
     cur = conn.cursor()
 
+    # IDs are stored as BIGINT (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    conn.commit()
+
     buffer = StringIO()
     df[required_cols].to_csv(buffer, index=False, header=False)
     buffer.seek(0)
@@ -4,9 +4,14 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+
 # 🔗 GitHub URL for the TEST file
 URL_TEST_FILE = "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Test%20Files/user_data.csv"
 
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"user_id": "user"}
+
 def main(file_bytes: bytes = None):
     print(" Starting Test Data Injection: User Data")
     
@@ -48,6 +53,11 @@ def main(file_bytes: bytes = None):
     # 3. Append to DB
     conn = psycopg2.connect(host="db", port=5432, user="postgres", password="shopzada", dbname="shopzada")
     cur = conn.cursor()
+
+    # IDs are stored as BIGINT (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    conn.commit()
     
     # We define the column order explicitly for COPY
     final_cols = required_cols + ["possible_duplicate", "possible_duplicate_of"]
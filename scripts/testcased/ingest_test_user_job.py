@@ -4,8 +4,13 @@ import pandas as pd
 import psycopg2
 from io import StringIO
 
+from f.common.ids import encode_ids, ensure_id_codec, save_aliases
+
 URL_TEST_FILE = "https://raw.githubusercontent.com/Quiosh/dwh_finalproject_3cse_group_4/main/datasets/Test%20Files/user_job.csv"
 
+# Stored as BIGINT (f.common.ids)
+ID_COLUMNS = {"user_id": "user"}
+
 def main(file_bytes: bytes = None):
     print("Starting Test Data Injection: User Job")
 
@@ -30,6 +35,11 @@ def main(file_bytes: bytes = None):
     conn = psycopg2.connect(host="db", port=5432, user="postgres", password="shopzada", dbname="shopzada")
     cur = conn.cursor()
 
+    # IDs are stored as BIGINT (f.common.ids)
+    ensure_id_codec(cur)
+    save_aliases(cur, encode_ids(df, ID_COLUMNS))
+    conn.commit()
+
     final_cols = required_cols + ["possible_duplicate", "possible_duplicate_of"]
 
     buffer = StringIO()
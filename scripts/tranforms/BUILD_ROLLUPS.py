@@ -0,0 +1,118 @@
+import psycopg2
+import logging
+
+from f.common.change_log import ensure_change_log, has_full_rebuild, logged_months, max_logged_at
+from f.common.partitions import check_months
+from f.common.rollups import (
+    FRESHNESS_DDL,
+    GRAINS,
+    ROLLUP_SPECS,
+    ensure_rollup,
+    record_freshness,
+    record_measures,
+    refresh_rollup,
+    rollup_table,
+)
+from f.common.watermark import ensure_watermark_table, get_watermark, set_watermark
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+WATERMARK_CONSUMER = "rollups"
+
+
+def main(mode: str = "incremental", months: list = None):
+    """
+    mode="incremental": re-aggregate only the months FACT_ORDERS logged
+                        since the last run, plus any `months` (YYYYMM)
+                        passed in (the late-arrival flow passes the months
+                        FACT_ORDER_ITEMS reloaded). Falls back to a full
+                        refresh on the first run, after a full FACT_ORDERS
+                        rebuild, or when a rollup table is new or one of
+                        its measures was redefined.
+    mode="full":        truncate and re-aggregate every rollup (e.g. after
+                        the dimensions were rebuilt).
+    """
+    if mode not in ("full", "incremental"):
+        raise ValueError(f"Unknown mode {mode!r}; expected 'full' or 'incremental'")
+    months = check_months(months or [])
+
+    # 1) Connect to Postgres
+    conn = psycopg2.connect(
+        host="db",
+        port=5432,
+        user="postgres",
+        password="shopzada",
+        dbname="shopzada",
+    )
+    cur = conn.cursor()
+
+    try:
+        logging.info(f"Starting BUILD_ROLLUPS processing ({mode})...")
+
+        # 2) Create Tables
+        stale = False
+        for spec in ROLLUP_SPECS:
+            for grain in GRAINS:
+                stale = ensure_rollup(cur, spec, grain) or stale
+        cur.execute(FRESHNESS_DDL)
+        # Tables and report views in their own short transaction
+        conn.commit()
+
+        # 3) Change tracking
+        ensure_watermark_table(cur)
+        ensure_change_log(cur)
+        since = get_watermark(cur, WATERMARK_CONSUMER)
+        until = max_logged_at(cur)
+
+        if mode == "incremental" and since is None:
+            logging.info("No watermark yet; running a full refresh instead.")
+            mode = "full"
+        elif mode == "incremental" and stale:
+            logging.info("New or redefined rollup tables; running a full refresh instead.")
+            mode = "full"
+        elif mode == "incremental" and until is not None and until > since and has_full_rebuild(cur, since, until):
+            logging.info("fact_orders was rebuilt since the last run; running a full refresh instead.")
+            mode = "full"
+
+        # 4) Refresh Rollups
+        if mode == "full":
+            refresh_months = None
+        else:
+            refresh_months = set(months)
+            if until is not None and until > since:
+                refresh_months.update(logged_months(cur, since, until))
+            refresh_months = sorted(refresh_months)
+            logging.info(f"Re-aggregating months {refresh_months}...")
+
+        rows = {}
+        for spec in ROLLUP_SPECS:
+            for grain in GRAINS:
+                table = rollup_table(spec, grain)
+                rows[table] = refresh_rollup(cur, spec, grain, refresh_months)
+                if refresh_months is None:
+                    record_measures(cur, spec, grain)
+                months_refreshed = None if refresh_months is None else len(refresh_months)
+                record_freshness(cur, spec, grain, mode, months_refreshed, until)
+                logging.info(f"{table}: {rows[table]} rows written")
+
+        if until is not None:
+            set_watermark(cur, WATERMARK_CONSUMER, until)
+
+        conn.commit()
+        logging.info(f" BUILD_ROLLUPS {mode} refresh wrote {sum(rows.values())} rows.")
+        return {"mode": mode, "months": refresh_months, "rows_written": rows, "watermark": str(until)}
+
+    except Exception as e:
+        conn.rollback()
+        logging.error(f" BUILD_ROLLUPS failed: {e}")
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,32 @@
 import psycopg2
 import logging
 
+from f.common.dimensions import refresh_dimension
+from f.common.watermark import ensure_ingested_at
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# One row per campaign_id; when a campaign was staged more than once (e.g.
+# by the late campaign file) the most recently ingested row wins.
+CAMPAIGN_SPEC = {
+    "table": "dim_campaign",
+    "key": "campaign_id",
+    "attributes": ["campaign_name", "description", "discount"],
+    "insert_new": True,
+    "source": """
+        SELECT DISTINCT ON (campaign_id)
+            campaign_id,
+            campaign_name,
+            campaign_description AS description,
+            discount
+        FROM stg_campaign_data
+        WHERE campaign_id IS NOT NULL
+        ORDER BY campaign_id, ingested_at DESC NULLS LAST, campaign_name, campaign_description, discount
+    """,
+}
+
 
 def main():
     conn = psycopg2.connect(
@@ -28,27 +50,14 @@ def main():
                 discount NUMERIC
             );
         """)
+        ensure_ingested_at(cur, ["stg_campaign_data"])
 
-        # --- REFRESH STEP: Clear the table first ---
-        logging.info("Truncating DIM_CAMPAIGN table...")
-        cur.execute("TRUNCATE TABLE dim_campaign CASCADE;")
-        # -------------------------------------------
-
-        logging.info("Loading campaigns...")
-        # Since table is empty, we don't need 'WHERE NOT EXISTS' anymore
-        cur.execute("""
-            INSERT INTO dim_campaign (campaign_id, campaign_name, description, discount)
-            SELECT DISTINCT
-                campaign_id,
-                campaign_name,
-                campaign_description,
-                discount
-            FROM stg_campaign_data;
-        """)
+        logging.info("Loading new and changed campaigns...")
+        counts = refresh_dimension(cur, CAMPAIGN_SPEC)
 
-        inserted_count = cur.rowcount
         conn.commit()
-        logging.info(f"✅ DIM_CAMPAIGN refreshed. Loaded {inserted_count} rows.")
+        logging.info(f"✅ DIM_CAMPAIGN refreshed: {counts}")
+        return counts
 
     except Exception as e:
         conn.rollback()
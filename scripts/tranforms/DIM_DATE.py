@@ -1,13 +1,43 @@
 import psycopg2
 import logging
-from datetime import date, timedelta
+from datetime import date
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# Calendar always covered, even before any order is staged
+DEFAULT_START = date(2020, 1, 1)
+DEFAULT_END = date(2030, 12, 31)
+
+# Staging columns whose dates become fact date_keys
+STAGING_DATE_COLUMNS = [
+    ("stg_order_data", "transaction_date"),
+    ("stg_transactional_campaign_data", "transaction_date"),
+]
+
+
+def _staging_date_range(cur):
+    """(min, max) date found in the staging date columns, or (None, None)."""
+    lo = hi = None
+    for table, column in STAGING_DATE_COLUMNS:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (table,))
+        if not cur.fetchone()[0]:
+            continue
+        cur.execute(f"SELECT min({column})::date, max({column})::date FROM {table};")
+        t_lo, t_hi = cur.fetchone()
+        if t_lo is not None:
+            lo = t_lo if lo is None else min(lo, t_lo)
+            hi = t_hi if hi is None else max(hi, t_hi)
+    return lo, hi
+
 
 def main():
+    """
+    Upserts one row per day from DEFAULT_START to DEFAULT_END, widened to
+    cover every transaction_date in staging. Existing rows are never
+    deleted, so the facts referencing them are left alone.
+    """
     conn = psycopg2.connect(
         host="db",
         port=5432,
@@ -34,46 +64,48 @@ def main():
             );
         """)
 
-        # --- REFRESH STEP: Clear the table first ---
-        logging.info("Truncating DIM_DATE table...")
-        cur.execute("TRUNCATE TABLE dim_date CASCADE;")
-        # -------------------------------------------
-
-        start_date = date(2020, 1, 1)
-        end_date = date(2030, 12, 31)
-        delta = end_date - start_date
+        staged_lo, staged_hi = _staging_date_range(cur)
+        start_date = min(DEFAULT_START, staged_lo or DEFAULT_START)
+        end_date = max(DEFAULT_END, staged_hi or DEFAULT_END)
+        logging.info(f"Generating date records {start_date}..{end_date}...")
 
-        logging.info("Generating date records...")
-
-        insert_query = """
+        cur.execute(
+            """
             INSERT INTO dim_date (date_key, full_date, year, quarter, month, day, day_name, month_name, is_weekend)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
-        """
-
-        batch_data = []
-        for i in range(delta.days + 1):
-            curr = start_date + timedelta(days=i)
-            date_key = int(curr.strftime("%Y%m%d"))
-            is_weekend = curr.weekday() >= 5  # 5=Sat, 6=Sun
-
-            record = (
-                date_key,
-                curr,
-                curr.year,
-                (curr.month - 1) // 3 + 1,
-                curr.month,
-                curr.day,
-                curr.strftime("%A"),
-                curr.strftime("%B"),
-                is_weekend,
-            )
-            batch_data.append(record)
-
-        if batch_data:
-            cur.executemany(insert_query, batch_data)
-            logging.info(f"✅ DIM_DATE refreshed. Inserted {len(batch_data)} rows.")
+            SELECT
+                to_char(d, 'YYYYMMDD')::int,
+                d,
+                extract(year FROM d)::int,
+                extract(quarter FROM d)::int,
+                extract(month FROM d)::int,
+                extract(day FROM d)::int,
+                to_char(d, 'FMDay'),
+                to_char(d, 'FMMonth'),
+                extract(isodow FROM d) >= 6
+            FROM generate_series(%s::date, %s::date, interval '1 day') AS g(ts),
+                 LATERAL (SELECT g.ts::date AS d) x
+            ON CONFLICT (date_key) DO UPDATE SET
+                full_date = EXCLUDED.full_date,
+                year = EXCLUDED.year,
+                quarter = EXCLUDED.quarter,
+                month = EXCLUDED.month,
+                day = EXCLUDED.day,
+                day_name = EXCLUDED.day_name,
+                month_name = EXCLUDED.month_name,
+                is_weekend = EXCLUDED.is_weekend
+            WHERE (dim_date.full_date, dim_date.year, dim_date.quarter, dim_date.month, dim_date.day,
+                   dim_date.day_name, dim_date.month_name, dim_date.is_weekend)
+                IS DISTINCT FROM
+                  (EXCLUDED.full_date, EXCLUDED.year, EXCLUDED.quarter, EXCLUDED.month, EXCLUDED.day,
+                   EXCLUDED.day_name, EXCLUDED.month_name, EXCLUDED.is_weekend);
+            """,
+            (start_date, end_date),
+        )
+        written = cur.rowcount
 
         conn.commit()
+        logging.info(f"✅ DIM_DATE covers {start_date}..{end_date}; {written} rows inserted or updated.")
+        return {"start_date": str(start_date), "end_date": str(end_date), "rows_written": written}
 
     except Exception as e:
         conn.rollback()
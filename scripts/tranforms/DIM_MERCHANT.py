@@ -1,10 +1,31 @@
 import psycopg2
 import logging
 
+from f.common.ids import ensure_id_codec
+from f.common.scd2 import ensure_scd2_table, refresh_scd2
+from f.common.watermark import ensure_ingested_at
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# One stg_merchant_data row per merchant (unflagged, then newest)
+MERCHANT_SPEC = {
+    "table": "dim_merchant",
+    "attributes": ["name", "city", "state", "country"],
+    "source": """
+        SELECT DISTINCT ON (merchant_id)
+            merchant_id AS source_merchant_id,
+            name,
+            city,
+            state,
+            country
+        FROM stg_merchant_data
+        WHERE merchant_id IS NOT NULL
+        ORDER BY merchant_id, possible_duplicate IS TRUE, ingested_at DESC NULLS LAST, creation_date DESC NULLS LAST
+    """,
+}
+
 
 def main():
     conn = psycopg2.connect(
@@ -19,35 +40,21 @@ def main():
     try:
         logging.info("Starting DIM_MERCHANT enrichment...")
 
-        drop_cols_query = """
-            ALTER TABLE dim_merchant 
-            DROP COLUMN IF EXISTS valid_from,
-            DROP COLUMN IF EXISTS valid_to,
-            DROP COLUMN IF EXISTS is_current;
-        """
-        cur.execute(drop_cols_query)
-
-        columns_to_add = [
-            "city TEXT",
-            "state TEXT",
-            "country TEXT",
-        ]
-        for col in columns_to_add:
-            cur.execute(f"ALTER TABLE dim_merchant ADD COLUMN IF NOT EXISTS {col};")
-
-        logging.info("Updating Merchant Locations...")
-        cur.execute("""
-            UPDATE dim_merchant d
-            SET 
-                city = s.city,
-                state = s.state,
-                country = s.country
-            FROM stg_merchant_data s
-            WHERE d.source_merchant_id = s.merchant_id;
-        """)
+        # ID codec first, in its own transaction (parallel steps wait on it)
+        ensure_id_codec(cur)
+        conn.commit()
+
+        ensure_scd2_table(cur, "dim_merchant")
+        ensure_ingested_at(cur, ["stg_merchant_data"])
+        # Layout changes commit on their own; the refresh below only writes rows
+        conn.commit()
+
+        logging.info("Applying merchant names and locations...")
+        counts = refresh_scd2(cur, MERCHANT_SPEC)
 
         conn.commit()
-        logging.info(" DIM_MERCHANT enrichment complete.")
+        logging.info(f" DIM_MERCHANT enrichment complete: {counts}")
+        return counts
 
     except Exception as e:
         conn.rollback()
@@ -1,10 +1,37 @@
 import psycopg2
 import logging
 
+from f.common.dimensions import ensure_unique_key, refresh_dimension
+from f.common.ids import ensure_id_codec, migrate_id_column
+from f.common.money import ensure_report_view, migrate_money_columns
+from f.common.watermark import ensure_ingested_at
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# One row per product_id; when a product was staged more than once the
+# most recently ingested row wins.
+PRODUCT_SPEC = {
+    "table": "dim_product",
+    "key": "product_id",
+    "attributes": ["product_name", "product_type", "base_price"],
+    "insert_new": True,
+    "source": """
+        SELECT DISTINCT ON (product_id)
+            product_id,
+            product_name,
+            product_type,
+            price AS base_price
+        FROM stg_product_list
+        WHERE product_id IS NOT NULL
+        ORDER BY product_id, ingested_at DESC NULLS LAST, product_name, product_type, price
+    """,
+}
+
+# Amounts in cents (f.common.money)
+MONEY_COLUMNS = ["base_price"]
+
 
 def main():
     conn = psycopg2.connect(
@@ -19,35 +46,44 @@ def main():
     try:
         logging.info("Starting DIM_PRODUCT processing...")
 
+        # ID codec first, in its own transaction (parallel steps wait on it)
+        ensure_id_codec(cur)
+        conn.commit()
+
         cur.execute("""
             CREATE TABLE IF NOT EXISTS dim_product (
                 product_key BIGSERIAL PRIMARY KEY,
-                product_id TEXT NOT NULL,
+                product_id BIGINT UNIQUE NOT NULL,
                 product_name TEXT,
                 product_type TEXT,
-                base_price NUMERIC
+                base_price BIGINT
             );
         """)
+        migrate_id_column(cur, "dim_product", "product_id", "product")
+        migrate_money_columns(cur, "dim_product", MONEY_COLUMNS)
+        # Report view in its own short transaction (f.common.views)
+        ensure_report_view(cur, "dim_product", MONEY_COLUMNS)
+        conn.commit()
 
-        # --- REFRESH STEP: Clear the table first ---
-        logging.info("Truncating DIM_PRODUCT table...")
-        cur.execute("TRUNCATE TABLE dim_product CASCADE;")
-        # -------------------------------------------
+        # One row (one key) per product_id
+        merged = ensure_unique_key(
+            cur, "dim_product", "product_key", "product_id", [("fact_order_items", "product_key")]
+        )
+        if merged:
+            logging.warning(
+                f"Merged {merged} duplicate dim_product rows into the lowest key per product_id. "
+                "Run FACT_ORDERS, FACT_ORDER_ITEMS and BUILD_ROLLUPS in full once."
+            )
+        # Superseded by the unique index (BUILD_INDEXES used to add it)
+        cur.execute("DROP INDEX IF EXISTS dim_product_product_id_idx;")
+        ensure_ingested_at(cur, ["stg_product_list"])
 
-        logging.info("Loading products...")
-        cur.execute("""
-            INSERT INTO dim_product (product_id, product_name, product_type, base_price)
-            SELECT DISTINCT
-                product_id,
-                product_name,
-                product_type,
-                price
-            FROM stg_product_list;
-        """)
+        logging.info("Loading new and changed products...")
+        counts = refresh_dimension(cur, PRODUCT_SPEC)
 
-        count = cur.rowcount
         conn.commit()
-        logging.info(f"✅ DIM_PRODUCT refreshed. Loaded {count} rows.")
+        logging.info(f"✅ DIM_PRODUCT refreshed: {counts}")
+        return counts
 
     except Exception as e:
         conn.rollback()
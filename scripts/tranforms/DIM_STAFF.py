@@ -1,10 +1,31 @@
 import psycopg2
 import logging
 
+from f.common.ids import ensure_id_codec
+from f.common.scd2 import ensure_scd2_table, refresh_scd2
+from f.common.watermark import ensure_ingested_at
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# One stg_staff_data row per staff member (unflagged, then newest)
+STAFF_SPEC = {
+    "table": "dim_staff",
+    "attributes": ["name", "job_level", "city", "country"],
+    "source": """
+        SELECT DISTINCT ON (staff_id)
+            staff_id AS source_staff_id,
+            name,
+            job_level,
+            city,
+            country
+        FROM stg_staff_data
+        WHERE staff_id IS NOT NULL
+        ORDER BY staff_id, possible_duplicate IS TRUE, ingested_at DESC NULLS LAST, creation_date DESC NULLS LAST
+    """,
+}
+
 
 def main():
     # 1) Connect to Postgres
@@ -20,38 +41,23 @@ def main():
     try:
         logging.info("Starting DIM_STAFF enrichment...")
 
-        # 2) Remove history columns (Convert to SCD Type 1)
-        drop_cols_query = """
-            ALTER TABLE dim_staff 
-            DROP COLUMN IF EXISTS is_current,
-            DROP COLUMN IF EXISTS valid_from,
-            DROP COLUMN IF EXISTS valid_to;
-        """
-        cur.execute(drop_cols_query)
-
-        # 3) Add Missing Columns
-        columns_to_add = [
-            "job_level TEXT",
-            "city TEXT",
-            "country TEXT",
-        ]
-        for col in columns_to_add:
-            cur.execute(f"ALTER TABLE dim_staff ADD COLUMN IF NOT EXISTS {col};")
-
-        # 4) Update Details (From stg_staff_data)
-        logging.info("Updating Staff Details...")
-        cur.execute("""
-            UPDATE dim_staff d
-            SET 
-                job_level = s.job_level,
-                city = s.city,
-                country = s.country
-            FROM stg_staff_data s
-            WHERE d.source_staff_id = s.staff_id;
-        """)
+        # ID codec first, in its own transaction (parallel steps wait on it)
+        ensure_id_codec(cur)
+        conn.commit()
+
+        # 2) Versioned table (SCD Type 2)
+        ensure_scd2_table(cur, "dim_staff")
+        ensure_ingested_at(cur, ["stg_staff_data"])
+        # Layout changes commit on their own; the refresh below only writes rows
+        conn.commit()
+
+        # 3) Apply staff details as Type 2 history
+        logging.info("Applying staff details...")
+        counts = refresh_scd2(cur, STAFF_SPEC)
 
         conn.commit()
-        logging.info(" DIM_STAFF enrichment complete.")
+        logging.info(f" DIM_STAFF enrichment complete: {counts}")
+        return counts
 
     except Exception as e:
         conn.rollback()
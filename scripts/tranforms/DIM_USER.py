@@ -1,10 +1,48 @@
 import psycopg2
 import logging
 
+from f.common.ids import ensure_id_codec
+from f.common.scd2 import ensure_scd2_table, refresh_scd2
+from f.common.watermark import ensure_ingested_at
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# One row per user_id from stg_user_data and stg_user_job: flagged
+# duplicates last, then the newest row (the same "newest record wins" rule
+# the ingestion soft-dedup uses).
+USER_SPEC = {
+    "table": "dim_user",
+    "attributes": [
+        "name", "birthdate", "gender", "user_type", "city", "state", "country", "job_title", "job_level",
+    ],
+    "source": """
+        SELECT
+            s.user_id AS source_user_id,
+            s.name,
+            s.birthdate,
+            s.gender,
+            s.user_type,
+            s.city,
+            s.state,
+            s.country,
+            j.job_title,
+            j.job_level
+        FROM (
+            SELECT DISTINCT ON (user_id) *
+            FROM stg_user_data
+            WHERE user_id IS NOT NULL
+            ORDER BY user_id, possible_duplicate IS TRUE, ingested_at DESC NULLS LAST, creation_date DESC NULLS LAST
+        ) s
+        LEFT JOIN (
+            SELECT DISTINCT ON (user_id) *
+            FROM stg_user_job
+            ORDER BY user_id, possible_duplicate IS TRUE, ingested_at DESC NULLS LAST
+        ) j ON j.user_id = s.user_id
+    """,
+}
+
 
 def main():
     # 1) Connect to Postgres
@@ -20,58 +58,22 @@ def main():
     try:
         logging.info("Starting DIM_USER enrichment...")
 
-        # Remove columns not present in schema
-        drop_cols_query = """
-            ALTER TABLE dim_user 
-            DROP COLUMN IF EXISTS creation_date,
-            DROP COLUMN IF EXISTS valid_from,
-            DROP COLUMN IF EXISTS valid_to,
-            DROP COLUMN IF EXISTS is_current;
-        """
-        cur.execute(drop_cols_query)
-
-        # 2) Add Missing Columns
-        columns_to_add = [
-            "birthdate DATE",
-            "gender TEXT",
-            "user_type TEXT",
-            "city TEXT",
-            "state TEXT",
-            "country TEXT",
-            "job_title TEXT",
-            "job_level TEXT",
-        ]
-        for col in columns_to_add:
-            cur.execute(f"ALTER TABLE dim_user ADD COLUMN IF NOT EXISTS {col};")
+        # ID codec first, in its own transaction (parallel steps wait on it)
+        ensure_id_codec(cur)
+        conn.commit()
 
-        # 3) Update Demographics (From stg_user_data)
-        logging.info("Updating User Demographics...")
-        cur.execute("""
-            UPDATE dim_user d
-            SET 
-                birthdate = s.birthdate,
-                gender = s.gender,
-                user_type = s.user_type,
-                city = s.city,
-                state = s.state,
-                country = s.country
-            FROM stg_user_data s
-            WHERE d.source_user_id = s.user_id;
-        """)
+        ensure_scd2_table(cur, "dim_user")
+        ensure_ingested_at(cur, ["stg_user_data", "stg_user_job"])
+        # Layout changes commit on their own; the refresh below only writes rows
+        conn.commit()
 
-        # 4) Update Jobs (From stg_user_job)
-        logging.info("Updating User Jobs...")
-        cur.execute("""
-            UPDATE dim_user d
-            SET 
-                job_title = j.job_title,
-                job_level = j.job_level
-            FROM stg_user_job j
-            WHERE d.source_user_id = j.user_id;
-        """)
+        # 2) Apply user and job staging as Type 2 history
+        logging.info("Applying user demographics and jobs...")
+        counts = refresh_scd2(cur, USER_SPEC)
 
         conn.commit()
-        logging.info(" DIM_USER enrichment complete.")
+        logging.info(f" DIM_USER enrichment complete: {counts}")
+        return counts
 
     except Exception as e:
         conn.rollback()
@@ -1,12 +1,299 @@
 import psycopg2
 import logging
 
+from f.common.change_log import ensure_change_log, has_full_rebuild, max_logged_at
+from f.common.hll import ensure_hll_functions, hll_sketch_agg
+from f.common.indexes import ensure_index
+from f.common.money import ensure_report_view, migrate_money_columns
+from f.common.views import ensure_view
+from f.common.watermark import ensure_watermark_table, get_watermark, set_watermark
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
 
-def main():
+WATERMARK_CONSUMER = "fact_campaign_performance"
+
+# Customers are counted by their durable ID. user_key names one Type 2
+# version (f.common.scd2), so a customer whose orders straddle a change
+# would count twice.
+CUSTOMER_SKETCH_SQL = hll_sketch_agg("u.source_user_id")
+
+# Aggregates per (campaign_key, date_key) group of the fact_orders rows in
+# {source}. Amounts are cents; the average is rounded to the cent.
+AGGREGATE_SQL = f"""
+    SELECT
+        f.campaign_key,
+        f.date_key,
+        COUNT(f.order_key) as total_orders,
+        SUM(f.total_amount)::bigint as total_revenue,
+        round(AVG(f.total_amount))::bigint as average_order_value,
+        COUNT(DISTINCT u.source_user_id) as unique_customers,
+        {CUSTOMER_SKETCH_SQL} as customer_sketch
+    FROM {{source}} f
+    LEFT JOIN dim_user u ON u.user_key = f.user_key
+    WHERE f.campaign_key IS NOT NULL
+    GROUP BY f.campaign_key, f.date_key
+"""
+
+# fact_orders rows of the affected groups. Equality on both keys lets each
+# group be read through fact_orders_campaign_date_idx in its own partition;
+# groups without a date are matched separately.
+AFFECTED_ORDERS_SQL = """(
+    SELECT f.* FROM fact_orders f
+    JOIN affected_groups g ON g.campaign_key = f.campaign_key AND g.date_key = f.date_key
+    UNION ALL
+    SELECT f.* FROM fact_orders f
+    JOIN affected_groups g ON g.campaign_key = f.campaign_key AND g.date_key IS NULL AND f.date_key IS NULL
+)"""
+
+# Amounts in cents (f.common.money)
+MONEY_COLUMNS = ["total_revenue", "average_order_value"]
+
+PERF_COLUMNS = (
+    "campaign_key, date_key, total_orders, total_revenue, average_order_value, "
+    "unique_customers, customer_sketch"
+)
+
+# Week, month and lifetime sketches per campaign, kept next to the daily
+# rows. Merging a year or more of daily sketches at query time reads 2048
+# registers per sketch and takes seconds (benchmarks/bench_hll.py).
+# period_start is the week's Monday or the month's first day; NULL for the
+# lifetime rows and for the month of orders without a date.
+SKETCH_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS campaign_customer_sketches (
+        campaign_key BIGINT NOT NULL,
+        grain TEXT NOT NULL,
+        period_start DATE,
+        first_date_key INT,
+        last_date_key INT,
+        customer_sketch BYTEA NOT NULL,
+        approx_unique_customers BIGINT NOT NULL
+    );
+"""
+
+# grain -> (period_start of a row joined to dim_date d, period length).
+# Weeks leave orders without a date out.
+PERIODS = {
+    "week": ("date_trunc('week', d.full_date)::date", "interval '1 week'"),
+    "month": ("date_trunc('month', d.full_date)::date", "interval '1 month'"),
+}
+
+# Sketches per (campaign, period) of the fact_orders rows in {source}
+PERIOD_SKETCH_SQL = f"""
+    INSERT INTO campaign_customer_sketches
+        (campaign_key, grain, period_start, first_date_key, last_date_key, customer_sketch, approx_unique_customers)
+    SELECT campaign_key, '{{grain}}', period_start, first_date_key, last_date_key,
+           sketch, round(hll_cardinality(sketch))::bigint
+    FROM (
+        SELECT
+            f.campaign_key,
+            {{period}} AS period_start,
+            min(f.date_key) AS first_date_key,
+            max(f.date_key) AS last_date_key,
+            {CUSTOMER_SKETCH_SQL} AS sketch
+        FROM {{source}} f
+        LEFT JOIN dim_date d ON d.date_key = f.date_key
+        LEFT JOIN dim_user u ON u.user_key = f.user_key
+        WHERE f.campaign_key IS NOT NULL {{where}}
+        GROUP BY f.campaign_key, {{period}}
+    ) s
+"""
+
+# Lifetime sketches, merged from the campaigns' month sketches
+LIFETIME_SKETCH_SQL = """
+    INSERT INTO campaign_customer_sketches
+        (campaign_key, grain, period_start, first_date_key, last_date_key, customer_sketch, approx_unique_customers)
+    SELECT campaign_key, 'lifetime', NULL, first_date_key, last_date_key,
+           sketch, round(hll_cardinality(sketch))::bigint
+    FROM (
+        SELECT
+            campaign_key,
+            min(first_date_key) AS first_date_key,
+            max(last_date_key) AS last_date_key,
+            hll_union_all(array_agg(customer_sketch)) AS sketch
+        FROM campaign_customer_sketches
+        WHERE grain = 'month' {where}
+        GROUP BY campaign_key
+    ) s
+"""
+
+# Approximate distinct customers over date ranges, without touching
+# fact_orders. A range merges the month sketches of the whole months it
+# covers and the daily customer_sketch of its other days. Applied through
+# f.common.views, marked on SKETCH_VIEWS_MARKER.
+SKETCH_VIEWS_MARKER = "campaign_customers_lifetime"
+CUSTOMER_SKETCH_VIEWS_DDL = """
+    CREATE OR REPLACE FUNCTION campaign_unique_customers(from_date_key INT, to_date_key INT)
+    RETURNS TABLE (campaign_key BIGINT, approx_unique_customers BIGINT)
+    LANGUAGE sql STABLE AS $$
+        WITH whole_months AS (
+            SELECT m::date AS period_start, to_char(m, 'YYYYMM')::int AS year_month
+            FROM generate_series(
+                date_trunc('month', to_date(from_date_key::text, 'YYYYMMDD')),
+                to_date(to_date_key::text, 'YYYYMMDD'),
+                interval '1 month'
+            ) m
+            WHERE to_char(m, 'YYYYMMDD')::int >= from_date_key
+              AND to_char(m + interval '1 month' - interval '1 day', 'YYYYMMDD')::int <= to_date_key
+        )
+        SELECT s.campaign_key, round(hll_cardinality(hll_union_all(array_agg(s.customer_sketch))))::bigint
+        FROM (
+            SELECT c.campaign_key, c.customer_sketch
+            FROM campaign_customer_sketches c
+            JOIN whole_months w ON w.period_start = c.period_start
+            WHERE c.grain = 'month'
+            UNION ALL
+            SELECT p.campaign_key, p.customer_sketch
+            FROM fact_campaign_performance p
+            WHERE p.date_key BETWEEN from_date_key AND to_date_key
+              AND p.date_key / 100 NOT IN (SELECT year_month FROM whole_months)
+        ) s
+        GROUP BY s.campaign_key;
+    $$;
+
+    CREATE OR REPLACE VIEW campaign_customers_weekly AS
+    SELECT campaign_key, period_start AS week_start, approx_unique_customers
+    FROM campaign_customer_sketches
+    WHERE grain = 'week';
+
+    CREATE OR REPLACE VIEW campaign_customers_monthly AS
+    SELECT campaign_key, to_char(period_start, 'YYYYMM')::int AS year_month, approx_unique_customers
+    FROM campaign_customer_sketches
+    WHERE grain = 'month';
+
+    CREATE OR REPLACE VIEW campaign_customers_lifetime AS
+    SELECT campaign_key, first_date_key, last_date_key, approx_unique_customers
+    FROM campaign_customer_sketches
+    WHERE grain = 'lifetime';
+"""
+
+
+def _full_refresh(cur) -> int:
+    cur.execute("TRUNCATE TABLE fact_campaign_performance;")
+    logging.info("Aggregating campaign metrics...")
+    cur.execute(f"INSERT INTO fact_campaign_performance ({PERF_COLUMNS}) {AGGREGATE_SQL.format(source='fact_orders')};")
+    count = cur.rowcount
+
+    cur.execute("TRUNCATE TABLE campaign_customer_sketches;")
+    for grain, (period, _) in PERIODS.items():
+        where = "AND f.date_key IS NOT NULL" if grain == "week" else ""
+        cur.execute(PERIOD_SKETCH_SQL.format(grain=grain, period=period, source="fact_orders", where=where))
+    cur.execute(LIFETIME_SKETCH_SQL.format(where=""))
+    return count
+
+
+def _refresh_period_sketches(cur):
+    """
+    Rebuilds the week and month sketches of the campaigns and periods
+    covering affected_groups, then the lifetime sketches of those campaigns.
+    """
+    unions = " UNION ALL ".join(
+        f"SELECT '{grain}' AS grain, {period} AS period_start, {length} AS length"
+        for grain, (period, length) in PERIODS.items()
+    )
+    cur.execute(f"""
+        CREATE TEMP TABLE affected_periods ON COMMIT DROP AS
+        SELECT DISTINCT
+            g.campaign_key, p.grain, p.period_start,
+            to_char(p.period_start, 'YYYYMMDD')::int AS first_date_key,
+            to_char(p.period_start + p.length - interval '1 day', 'YYYYMMDD')::int AS last_date_key
+        FROM affected_groups g
+        LEFT JOIN dim_date d ON d.date_key = g.date_key
+        CROSS JOIN LATERAL ({unions}) p
+        WHERE p.period_start IS NOT NULL OR p.grain = 'month';
+    """)
+    cur.execute("""
+        DELETE FROM campaign_customer_sketches s
+        USING affected_periods a
+        WHERE s.grain = a.grain
+          AND s.period_start IS NOT DISTINCT FROM a.period_start
+          AND s.campaign_key = a.campaign_key;
+    """)
+    for grain, (period, _) in PERIODS.items():
+        # The affected periods' rows, read by date range through
+        # fact_orders_campaign_date_idx; the undated month separately.
+        source = f"""(
+            SELECT f.* FROM fact_orders f
+            JOIN affected_periods a ON a.grain = '{grain}' AND a.campaign_key = f.campaign_key
+                AND f.date_key BETWEEN a.first_date_key AND a.last_date_key
+            UNION ALL
+            SELECT f.* FROM fact_orders f
+            JOIN affected_periods a ON a.grain = '{grain}' AND a.campaign_key = f.campaign_key
+                AND a.period_start IS NULL AND f.date_key IS NULL
+        )"""
+        cur.execute(PERIOD_SKETCH_SQL.format(grain=grain, period=period, source=source, where=""))
+
+    cur.execute("""
+        DELETE FROM campaign_customer_sketches
+        WHERE grain = 'lifetime' AND campaign_key IN (SELECT campaign_key FROM affected_groups);
+    """)
+    cur.execute(LIFETIME_SKETCH_SQL.format(
+        where="AND campaign_key IN (SELECT campaign_key FROM affected_groups)"
+    ))
+
+
+def _delta_refresh(cur, since, until) -> int:
+    """
+    Re-aggregates only the groups fact_orders logged in (since, until],
+    upserts them, and deletes groups that no longer have any order.
+    """
+    cur.execute(
+        """
+        CREATE TEMP TABLE affected_groups ON COMMIT DROP AS
+        SELECT DISTINCT campaign_key, date_key FROM fact_orders_change_log
+        WHERE NOT full_rebuild AND campaign_key IS NOT NULL
+          AND logged_at > %s AND logged_at <= %s;
+        """,
+        (since, until),
+    )
+    cur.execute("ANALYZE affected_groups;")
+    cur.execute("SELECT count(*) FROM affected_groups;")
+    logging.info(f"Re-aggregating {cur.fetchone()[0]} campaign/date groups...")
+
+    cur.execute(f"CREATE TEMP TABLE group_aggregates ON COMMIT DROP AS {AGGREGATE_SQL.format(source=AFFECTED_ORDERS_SQL)};")
+    cur.execute(f"""
+        INSERT INTO fact_campaign_performance ({PERF_COLUMNS})
+        SELECT {PERF_COLUMNS} FROM group_aggregates
+        ON CONFLICT (campaign_key, date_key) DO UPDATE SET
+            total_orders = EXCLUDED.total_orders,
+            total_revenue = EXCLUDED.total_revenue,
+            average_order_value = EXCLUDED.average_order_value,
+            unique_customers = EXCLUDED.unique_customers,
+            customer_sketch = EXCLUDED.customer_sketch;
+    """)
+    count = cur.rowcount
+
+    # Groups whose last order moved away
+    cur.execute("""
+        DELETE FROM fact_campaign_performance p
+        USING affected_groups g
+        WHERE p.campaign_key = g.campaign_key
+          AND p.date_key IS NOT DISTINCT FROM g.date_key
+          AND NOT EXISTS (
+              SELECT 1 FROM group_aggregates a
+              WHERE a.campaign_key = g.campaign_key AND a.date_key IS NOT DISTINCT FROM g.date_key
+          );
+    """)
+    count += cur.rowcount
+
+    _refresh_period_sketches(cur)
+    return count
+
+
+def main(mode: str = "incremental"):
+    """
+    mode="incremental": re-aggregate only the (campaign_key, date_key) groups
+                        FACT_ORDERS logged since the last run. Falls back to
+                        a full refresh on the first run or after a full
+                        FACT_ORDERS rebuild.
+    mode="full":        truncate and re-aggregate all of fact_orders
+                        (e.g. for reconciliation).
+    """
+    if mode not in ("full", "incremental"):
+        raise ValueError(f"Unknown mode {mode!r}; expected 'full' or 'incremental'")
+
     # 1) Connect to Postgres
     conn = psycopg2.connect(
         host="db",
@@ -18,7 +305,7 @@ def main():
     cur = conn.cursor()
 
     try:
-        logging.info("Starting FACT_CAMPAIGN_PERFORMANCE processing...")
+        logging.info(f"Starting FACT_CAMPAIGN_PERFORMANCE processing ({mode})...")
 
         # 2) Create Table
         cur.execute("""
@@ -27,40 +314,86 @@ def main():
                 campaign_key BIGINT,
                 date_key INT,
                 total_orders INT,
-                total_revenue NUMERIC,
-                average_order_value NUMERIC,
+                total_revenue BIGINT,
+                average_order_value BIGINT,
                 unique_customers INT,
+                customer_sketch BYTEA,
                 FOREIGN KEY (campaign_key) REFERENCES dim_campaign(campaign_key),
                 FOREIGN KEY (date_key) REFERENCES dim_date(date_key)
             );
         """)
+        # Indexes only when missing (f.common.indexes.ensure_index)
+        ensure_index(cur, "fact_campaign_performance_group_idx", """
+            UNIQUE INDEX fact_campaign_performance_group_idx
+            ON fact_campaign_performance (campaign_key, date_key) NULLS NOT DISTINCT
+        """)
+        ensure_index(cur, "fact_campaign_performance_date_idx", """
+            INDEX fact_campaign_performance_date_idx
+            ON fact_campaign_performance (date_key)
+        """)
+
+        # Tables from before the sketches; ALTER TABLE locks ACCESS EXCLUSIVE
+        # even when the column is there, so the catalog is checked first
+        cur.execute("SELECT 1 FROM pg_attribute WHERE attrelid = 'fact_campaign_performance'::regclass "
+                    "AND attname = 'customer_sketch' AND NOT attisdropped;")
+        if cur.fetchone() is None:
+            cur.execute("ALTER TABLE fact_campaign_performance ADD COLUMN customer_sketch BYTEA;")
+        migrate_money_columns(cur, "fact_campaign_performance", MONEY_COLUMNS)
+        ensure_hll_functions(cur)
+        cur.execute(SKETCH_TABLE_DDL)
+        ensure_index(cur, "campaign_customer_sketches_period_idx", """
+            UNIQUE INDEX campaign_customer_sketches_period_idx
+            ON campaign_customer_sketches (grain, period_start, campaign_key) NULLS NOT DISTINCT
+        """)
+        # Views in their own short transaction (f.common.views)
+        ensure_report_view(cur, "fact_campaign_performance", MONEY_COLUMNS)
+        ensure_view(cur, SKETCH_VIEWS_MARKER, CUSTOMER_SKETCH_VIEWS_DDL)
+        conn.commit()
 
-        # 3) Clear Table
-        cur.execute("TRUNCATE TABLE fact_campaign_performance CASCADE;")
+        # The column comments record what the sketches were built from. Rows
+        # from before a column existed, or sketched by user_key, need every
+        # group re-aggregated (the comments commit with them).
+        sketch_stale = False
+        for table in ("fact_campaign_performance", "campaign_customer_sketches"):
+            cur.execute("SELECT col_description(attrelid, attnum) FROM pg_attribute "
+                        "WHERE attrelid = %s::regclass AND attname = 'customer_sketch';", (table,))
+            if cur.fetchone()[0] != CUSTOMER_SKETCH_SQL:
+                sketch_stale = True
+                cur.execute(f"COMMENT ON COLUMN {table}.customer_sketch IS %s;", (CUSTOMER_SKETCH_SQL,))
+
+        # 3) Change tracking
+        ensure_watermark_table(cur)
+        ensure_change_log(cur)
+        since = get_watermark(cur, WATERMARK_CONSUMER)
+        until = max_logged_at(cur)
+
+        if mode == "incremental" and since is None:
+            logging.info("No watermark yet; running a full refresh instead.")
+            mode = "full"
+        elif mode == "incremental" and sketch_stale:
+            logging.info("Rebuilding customer counts and sketches; running a full refresh instead.")
+            mode = "full"
+        elif mode == "incremental" and until is not None and until > since and has_full_rebuild(cur, since, until):
+            logging.info("fact_orders was rebuilt since the last run; running a full refresh instead.")
+            mode = "full"
 
         # 4) Load Aggregates
-        logging.info("Aggregating campaign metrics...")
-        cur.execute("""
-            INSERT INTO fact_campaign_performance (
-                campaign_key, date_key, total_orders, total_revenue, average_order_value, unique_customers
-            )
-            SELECT 
-                campaign_key,
-                date_key,
-                COUNT(order_key) as total_orders,
-                SUM(total_amount) as total_revenue,
-                AVG(total_amount) as average_order_value,
-                COUNT(DISTINCT user_key) as unique_customers
-            FROM fact_orders
-            WHERE campaign_key IS NOT NULL
-            GROUP BY campaign_key, date_key;
-        """)
+        if mode == "full":
+            count = _full_refresh(cur)
+        elif until is None or until <= since:
+            logging.info("No fact_orders changes since the last run.")
+            count = 0
+        else:
+            count = _delta_refresh(cur, since, until)
+
+        if until is not None:
+            set_watermark(cur, WATERMARK_CONSUMER, until)
 
-        count = cur.rowcount
         conn.commit()
         logging.info(
-            f" FACT_CAMPAIGN_PERFORMANCE loaded with {count} aggregated rows."
+            f" FACT_CAMPAIGN_PERFORMANCE {mode} load wrote {count} aggregated rows."
         )
+        return {"mode": mode, "rows_written": count, "watermark": str(until)}
 
     except Exception as e:
         conn.rollback()
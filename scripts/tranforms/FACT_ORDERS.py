@@ -1,12 +1,230 @@
 import psycopg2
 import logging
 
+from f.common.change_log import ensure_change_log, log_full_rebuild, log_groups
+from f.common.ids import ensure_id_codec, migrate_id_column
+from f.common.indexes import ensure_index
+from f.common.inferred import infer_members
+from f.common.line_items import LINE_ITEM_TABLES, order_totals_sql
+from f.common.money import ensure_report_view, migrate_money_columns
+from f.common.partitions import (
+    STAGING_DATE_KEY,
+    check_months,
+    ensure_month_partitions,
+    ensure_partitioned,
+    months_predicate,
+    staging_months,
+    truncate_months,
+)
+from f.common.scd2 import as_of_join
+from f.common.watermark import (
+    ensure_ingested_at,
+    ensure_watermark_table,
+    get_watermark,
+    max_ingested_at,
+    set_watermark,
+)
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+WATERMARK_CONSUMER = "fact_orders"
+
+# Staging tables that feed a fact_orders row
+SOURCE_TABLES = [
+    "stg_order_data",
+    "stg_order_with_merchant_data",
+    "stg_transactional_campaign_data",
+    "stg_order_delays",
+] + LINE_ITEM_TABLES
+
+FACT_COLUMNS = """
+    order_id, user_key, merchant_key, staff_key, campaign_key, date_key, delay_in_days, total_amount, source_hash
+"""
+
+# Amounts in cents (f.common.money)
+MONEY_COLUMNS = ["total_amount"]
+
+
+def source_select(only_changed: bool) -> str:
+    """
+    One row per order with its resolved dimension keys and its total.
+
+    An order can have more than one row in a linked staging table (e.g. a
+    late file re-sends its campaign link). The most recently ingested row
+    wins. User, merchant and staff resolve to the dimension version that
+    was valid at the transaction date. References that have not arrived
+    yet resolve to the placeholders _infer_members adds first.
+    total_amount comes from the line totals pre-aggregated per order,
+    from the same line-item set FACT_ORDER_ITEMS loads. source_hash
+    covers every column the row is built from, so an upsert can skip
+    orders whose inputs did not change.
+    """
+    changed_join = "JOIN changed_orders ch ON ch.order_id = o.order_id" if only_changed else ""
+    line_filter = "JOIN changed_orders ch USING (order_id)" if only_changed else ""
+    return f"""
+        SELECT
+            src.order_id, user_key, merchant_key, staff_key, campaign_key, date_key, delay_in_days,
+            COALESCE(lt.order_total, 0) AS total_amount,
+            md5(ROW(user_key, merchant_key, staff_key, campaign_key, date_key, delay_in_days,
+                    COALESCE(lt.order_total, 0))::text) AS source_hash
+        FROM (
+            SELECT DISTINCT ON (o.order_id)
+                o.order_id,
+                u.user_key,
+                m.merchant_key,
+                s.staff_key,
+                c.campaign_key,
+                CAST(TO_CHAR(o.transaction_date, 'YYYYMMDD') AS INTEGER) as date_key,
+                d.delay_in_days
+            FROM stg_order_data o
+            {changed_join}
+            LEFT JOIN stg_order_with_merchant_data om ON o.order_id = om.order_id
+            LEFT JOIN stg_transactional_campaign_data tc ON o.order_id = tc.order_id
+            LEFT JOIN stg_order_delays d ON o.order_id = d.order_id
+
+            {as_of_join("u", "o.user_id", "o.transaction_date", "dim_user")}
+            {as_of_join("m", "om.merchant_id", "o.transaction_date", "dim_merchant")}
+            {as_of_join("s", "om.staff_id", "o.transaction_date", "dim_staff")}
+            LEFT JOIN dim_campaign c ON tc.campaign_id = c.campaign_id
+            ORDER BY o.order_id, o.ingested_at DESC,
+                     om.ingested_at DESC NULLS LAST, tc.ingested_at DESC NULLS LAST, d.ingested_at DESC NULLS LAST
+        ) src
+        LEFT JOIN ({order_totals_sql(line_filter)}) lt ON lt.order_id = src.order_id
+    """
+
+
+def _infer_members(cur, order_filter: str = ""):
+    """Placeholder dimension rows for references that have not arrived yet."""
+    counts = infer_members(cur, order_filter=order_filter)
+    if any(counts.values()):
+        logging.info(f"Inferred dimension members for late-arriving references: {counts}")
+
+
+def _full_rebuild(cur) -> int:
+    ensure_month_partitions(cur, "fact_orders", staging_months(cur))
+    _infer_members(cur)
+    cur.execute("TRUNCATE TABLE fact_orders;")
+    logging.info("Inserting data into fact_orders...")
+    cur.execute(f"INSERT INTO fact_orders ({FACT_COLUMNS}) {source_select(only_changed=False)};")
+    count = cur.rowcount
+    log_full_rebuild(cur)
+    return count
+
+
+def _reload_months(cur, months) -> int:
+    """
+    Rebuilds only the monthly partitions in `months`, from the staging
+    orders dated in those months. The other partitions are not touched.
+    """
+    month_groups = f"SELECT campaign_key, date_key FROM fact_orders WHERE {months_predicate(months)}"
+    ensure_month_partitions(cur, "fact_orders", months)
+    log_groups(cur, month_groups)
+    truncate_months(cur, "fact_orders", months)
+    cur.execute(f"""
+        CREATE TEMP TABLE changed_orders ON COMMIT DROP AS
+        SELECT DISTINCT order_id FROM stg_order_data
+        WHERE {months_predicate(months, STAGING_DATE_KEY)};
+    """)
+    cur.execute("ANALYZE changed_orders;")
+    _infer_members(cur, "JOIN changed_orders ch USING (order_id)")
+    logging.info(f"Reloading fact_orders partitions for months {sorted(months)}...")
+    cur.execute(f"""
+        INSERT INTO fact_orders ({FACT_COLUMNS})
+        SELECT {FACT_COLUMNS} FROM ({source_select(only_changed=True)}) src
+        WHERE {months_predicate(months)};
+    """)
+    count = cur.rowcount
+    log_groups(cur, month_groups)
+    return count
+
+
+def _incremental_upsert(cur, since, until):
+    """
+    Upserts the orders that have a staging row stamped in (since, until].
+    Orders whose source_hash is unchanged are left alone, so they are not
+    rewritten.
+
+    Returns (rows written, date_keys touched). The date_keys cover both the
+    new and the previous date of every changed order, so downstream facts
+    can recompute just those slices.
+    """
+    stamped = " UNION ".join(
+        f"SELECT order_id FROM {t} WHERE ingested_at > %(since)s AND ingested_at <= %(until)s"
+        for t in SOURCE_TABLES
+    )
+    cur.execute(f"CREATE TEMP TABLE changed_orders ON COMMIT DROP AS {stamped};", {"since": since, "until": until})
+    cur.execute("ANALYZE changed_orders;")
+    cur.execute("SELECT count(*) FROM changed_orders;")
+    logging.info(f"{cur.fetchone()[0]} order_ids have new staging rows since {since}.")
+    _infer_members(cur, "JOIN changed_orders ch USING (order_id)")
+
+    cur.execute(f"CREATE TEMP TABLE incoming ON COMMIT DROP AS {source_select(only_changed=True)};")
+    cur.execute("""
+        SELECT date_key FROM incoming WHERE date_key IS NOT NULL
+        UNION
+        SELECT f.date_key FROM fact_orders f JOIN incoming i USING (order_id) WHERE f.date_key IS NOT NULL;
+    """)
+    date_keys = sorted(r[0] for r in cur.fetchall())
+    ensure_month_partitions(cur, "fact_orders", {d // 100 for d in date_keys})
+
+    # Campaign/date groups the changed orders leave and enter
+    log_groups(cur, """
+        SELECT f.campaign_key, f.date_key
+        FROM fact_orders f JOIN incoming i USING (order_id)
+        WHERE f.source_hash IS DISTINCT FROM i.source_hash
+        UNION
+        SELECT i.campaign_key, i.date_key
+        FROM incoming i LEFT JOIN fact_orders f USING (order_id)
+        WHERE f.source_hash IS DISTINCT FROM i.source_hash
+    """)
+
+    # An order whose date_key moved lives in another partition now
+    cur.execute("""
+        DELETE FROM fact_orders f
+        USING incoming i
+        WHERE f.order_id = i.order_id AND f.date_key IS DISTINCT FROM i.date_key;
+    """)
+
+    cur.execute(f"""
+        INSERT INTO fact_orders ({FACT_COLUMNS})
+        SELECT {FACT_COLUMNS} FROM incoming
+        ON CONFLICT (order_id, date_key) DO UPDATE SET
+            user_key = EXCLUDED.user_key,
+            merchant_key = EXCLUDED.merchant_key,
+            staff_key = EXCLUDED.staff_key,
+            campaign_key = EXCLUDED.campaign_key,
+            delay_in_days = EXCLUDED.delay_in_days,
+            total_amount = EXCLUDED.total_amount,
+            source_hash = EXCLUDED.source_hash
+        WHERE fact_orders.source_hash IS DISTINCT FROM EXCLUDED.source_hash;
+    """)
+    return cur.rowcount, date_keys
+
+
+def main(mode: str = "full", months: list = None):
+    """
+    mode="full":        truncate fact_orders and rebuild it.
+    mode="incremental": upsert only orders with staging rows newer than the last run.
+                        Falls back to a full rebuild on the first run.
+                        The result lists the date_keys and months it touched
+                        (the late-arrival flow passes them on to the other facts).
+    mode="partitions":  rebuild only the monthly partitions listed in `months`
+                        (YYYYMM integers) from the staging orders dated in them.
+
+    Incremental runs assume the dimension keys of untouched orders did not
+    change since the last run. Dimension keys are never reassigned, and new
+    versions start at the time of the change, so this holds across
+    dimension refreshes.
+    """
+    if mode not in ("full", "incremental", "partitions"):
+        raise ValueError(f"Unknown mode {mode!r}; expected 'full', 'incremental' or 'partitions'")
+    if mode == "partitions" and not months:
+        raise ValueError("mode='partitions' needs a list of YYYYMM months")
+    if mode == "partitions":
+        months = check_months(months)
 
-def main():
     # 1) Connect to Postgres
     conn = psycopg2.connect(
         host="db",
@@ -18,62 +236,87 @@ def main():
     cur = conn.cursor()
 
     try:
-        logging.info("Starting FACT_ORDERS processing...")
+        logging.info(f"Starting FACT_ORDERS processing ({mode})...")
 
-        # 2) Create Table
-        cur.execute("""
+        # ID codec first, in its own transaction
+        ensure_id_codec(cur)
+        conn.commit()
+
+        # 2) Create Table (range-partitioned by month of date_key). Column
+        # types of a table from an older run are converted first, so an
+        # unpartitioned one is copied into the partitions as is.
+        migrate_id_column(cur, "fact_orders", "order_id", "order")
+        migrate_money_columns(cur, "fact_orders", MONEY_COLUMNS)
+        created = ensure_partitioned(cur, "fact_orders", """
             CREATE TABLE IF NOT EXISTS fact_orders (
-                order_key BIGSERIAL PRIMARY KEY,
-                order_id TEXT UNIQUE NOT NULL,
+                order_key BIGSERIAL NOT NULL,
+                order_id UUID NOT NULL,
                 user_key BIGINT,
                 merchant_key BIGINT,
                 staff_key BIGINT,
                 campaign_key BIGINT,
                 date_key INT,
                 delay_in_days INT,
-                total_amount NUMERIC,
+                total_amount BIGINT,
+                source_hash TEXT,
+                UNIQUE NULLS NOT DISTINCT (order_id, date_key),
                 FOREIGN KEY (user_key) REFERENCES dim_user(user_key),
                 FOREIGN KEY (merchant_key) REFERENCES dim_merchant(merchant_key),
                 FOREIGN KEY (staff_key) REFERENCES dim_staff(staff_key),
                 FOREIGN KEY (campaign_key) REFERENCES dim_campaign(campaign_key),
                 FOREIGN KEY (date_key) REFERENCES dim_date(date_key)
-            );
+            ) PARTITION BY RANGE (date_key);
         """)
+        ensure_index(cur, "fact_orders_campaign_date_idx",
+                     "INDEX fact_orders_campaign_date_idx ON fact_orders (campaign_key, date_key)")
+        ensure_change_log(cur)
+        # Report view in its own short transaction (f.common.views)
+        ensure_report_view(cur, "fact_orders", MONEY_COLUMNS)
+        conn.commit()
+
+        # 3) Change tracking
+        ensure_watermark_table(cur)
+        ensure_ingested_at(cur, SOURCE_TABLES)
+        since = get_watermark(cur, WATERMARK_CONSUMER)
+        until = max_ingested_at(cur, SOURCE_TABLES)
 
-        # 3) Clear Table
-        cur.execute("TRUNCATE TABLE fact_orders CASCADE;")
+        if mode == "incremental" and since is None:
+            logging.info("No watermark yet; running a full rebuild instead.")
+            mode = "full"
+        elif mode != "full" and created:
+            logging.info("fact_orders was just created; running a full rebuild instead.")
+            mode = "full"
 
         # 4) Load Data
-        logging.info("Inserting data into fact_orders...")
-
-        # UPDATED QUERY: Removed 'AND is_current = TRUE' for User, Merchant, and Staff
-        cur.execute("""
-            INSERT INTO fact_orders (
-                order_id, user_key, merchant_key, staff_key, campaign_key, date_key, delay_in_days, total_amount
-            )
-            SELECT 
-                o.order_id,
-                u.user_key,
-                m.merchant_key,
-                s.staff_key,
-                c.campaign_key,
-                CAST(TO_CHAR(o.transaction_date, 'YYYYMMDD') AS INTEGER) as date_key,
-                d.delay_in_days,
-                0 -- Placeholder, will be updated by order_items script
-            FROM stg_order_data o
-            LEFT JOIN stg_order_with_merchant_data om ON o.order_id = om.order_id
-            LEFT JOIN stg_transactional_campaign_data tc ON o.order_id = tc.order_id
-            LEFT JOIN stg_order_delays d ON o.order_id = d.order_id
-            
-            LEFT JOIN dim_user u ON o.user_id = u.source_user_id
-            LEFT JOIN dim_merchant m ON om.merchant_id = m.source_merchant_id
-            LEFT JOIN dim_staff s ON om.staff_id = s.source_staff_id
-            LEFT JOIN dim_campaign c ON tc.campaign_id = c.campaign_id;
-        """)
+        # date_keys=None means every date may have changed
+        date_keys = None
+        if mode == "full":
+            count = _full_rebuild(cur)
+        elif mode == "partitions":
+            count = _reload_months(cur, months)
+        elif until is None or until <= since:
+            logging.info("No new staging rows since the last run.")
+            count, date_keys = 0, []
+        else:
+            count, date_keys = _incremental_upsert(cur, since, until)
+
+        if date_keys is not None:
+            months = sorted({d // 100 for d in date_keys})
+
+        # A partition reload does not consume every staged row, so the
+        # watermark only moves on full and incremental runs.
+        if until is not None and mode != "partitions":
+            set_watermark(cur, WATERMARK_CONSUMER, until)
 
-        count = cur.rowcount
         conn.commit()
-        logging.info(f" FACT_ORDERS loaded with {count} rows.")
+        logging.info(f" FACT_ORDERS {mode} load wrote {count} rows.")
+        return {
+            "mode": mode,
+            "rows_written": count,
+            "watermark": str(until),
+            "months": months,
+            "date_keys": date_keys,
+        }
 
     except Exception as e:
         conn.rollback()
@@ -1,12 +1,37 @@
 import psycopg2
 import logging
 
+from f.common.ids import ensure_id_codec, migrate_id_column
+from f.common.indexes import ensure_index
+from f.common.line_items import line_items_sql
+from f.common.money import ensure_report_view, migrate_money_columns
+from f.common.partitions import (
+    check_months,
+    ensure_month_partitions,
+    ensure_partitioned,
+    fact_months,
+    months_predicate,
+    truncate_months,
+)
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# Amounts in cents (f.common.money)
+MONEY_COLUMNS = ["unit_price", "total_price"]
+
+
+def main(months: list = None):
+    """
+    Rebuilds fact_order_items from fact_orders and the staged line items.
+    With `months` (YYYYMM integers), only those monthly partitions are
+    rebuilt and the rest of the table is left alone; an empty list means
+    nothing changed. months=None rebuilds everything.
+    """
+    if months is not None:
+        months = check_months(months)
 
-def main():
     # 1) Connect to Postgres
     conn = psycopg2.connect(
         host="db",
@@ -20,84 +45,83 @@ def main():
     try:
         logging.info("Starting FACT_ORDER_ITEMS processing...")
 
-        # 2) Create Table
-        cur.execute("""
+        # ID codec first, in its own transaction
+        ensure_id_codec(cur)
+        conn.commit()
+
+        # 2) Create Table (range-partitioned by month of date_key). Column
+        # types of a table from an older run are converted first, so an
+        # unpartitioned one is copied into the partitions as is.
+        migrate_id_column(cur, "fact_order_items", "order_id", "order")
+        migrate_money_columns(cur, "fact_order_items", MONEY_COLUMNS)
+        created = ensure_partitioned(cur, "fact_order_items", """
             CREATE TABLE IF NOT EXISTS fact_order_items (
-                order_item_key BIGSERIAL PRIMARY KEY,
-                order_id TEXT,
+                order_item_key BIGSERIAL NOT NULL,
+                order_id UUID,
                 product_key BIGINT,
                 user_key BIGINT,
                 merchant_key BIGINT,
                 campaign_key BIGINT,
                 date_key INT,
                 quantity INT,
-                unit_price NUMERIC,
-                total_price NUMERIC,
+                unit_price BIGINT,
+                total_price BIGINT,
                 FOREIGN KEY (product_key) REFERENCES dim_product(product_key),
                 FOREIGN KEY (user_key) REFERENCES dim_user(user_key),
                 FOREIGN KEY (merchant_key) REFERENCES dim_merchant(merchant_key),
                 FOREIGN KEY (campaign_key) REFERENCES dim_campaign(campaign_key),
                 FOREIGN KEY (date_key) REFERENCES dim_date(date_key)
-            );
+            ) PARTITION BY RANGE (date_key);
         """)
+        ensure_index(cur, "fact_order_items_order_id_idx",
+                     "INDEX fact_order_items_order_id_idx ON fact_order_items (order_id)")
+        # Report view in its own short transaction (f.common.views)
+        ensure_report_view(cur, "fact_order_items", MONEY_COLUMNS)
+        conn.commit()
+
+        if months is not None and created:
+            logging.info("fact_order_items was just created; loading every month instead.")
+            months = None
 
-        # 3) Clear Table
-        cur.execute("TRUNCATE TABLE fact_order_items CASCADE;")
+        # 3) Clear the months being rebuilt
+        if months is not None:
+            ensure_month_partitions(cur, "fact_order_items", months)
+            truncate_months(cur, "fact_order_items", months)
+            order_scope = f"WHERE {months_predicate(months, 'fo.date_key')}"
+            line_filter = f"JOIN (SELECT order_id FROM fact_orders WHERE {months_predicate(months)}) mo USING (order_id)"
+        else:
+            ensure_month_partitions(cur, "fact_order_items", fact_months(cur, "fact_orders"))
+            cur.execute("TRUNCATE TABLE fact_order_items;")
+            order_scope = line_filter = ""
 
         # 4) Load Data
         logging.info("Inserting data into fact_order_items...")
-        cur.execute("""
+        cur.execute(f"""
             INSERT INTO fact_order_items (
                 order_id, product_key, user_key, merchant_key, campaign_key, date_key, quantity, unit_price, total_price
             )
-            WITH ordered_products AS (
-                SELECT 
-                    order_id, 
-                    product_id,
-                    ROW_NUMBER() OVER (PARTITION BY order_id) as rn
-                FROM stg_line_item_data_products
-            ),
-            ordered_prices AS (
-                SELECT 
-                    order_id,
-                    price,
-                    quantity,
-                    ROW_NUMBER() OVER (PARTITION BY order_id) as rn
-                FROM stg_line_item_data_prices
-            )
-            SELECT 
-                op.order_id,
-                dp.product_key,
+            SELECT
+                li.order_id,
+                li.product_key,
                 fo.user_key,
                 fo.merchant_key,
                 fo.campaign_key,
                 fo.date_key,
-                opr.quantity,
-                opr.price as unit_price,
-                (opr.quantity * opr.price) as total_price
-            FROM ordered_products op
-            JOIN ordered_prices opr ON op.order_id = opr.order_id AND op.rn = opr.rn
-            JOIN dim_product dp ON op.product_id = dp.product_id
-            JOIN fact_orders fo ON op.order_id = fo.order_id;
+                li.quantity,
+                li.unit_price,
+                li.total_price
+            FROM ({line_items_sql(line_filter)}) li
+            JOIN fact_orders fo ON li.order_id = fo.order_id
+            {order_scope};
         """)
 
         logging.info(f"Inserted {cur.rowcount} line items.")
 
-        # 5) Update Header Totals
-        logging.info("Updating total_amount in FACT_ORDERS...")
-        cur.execute("""
-            UPDATE fact_orders fo
-            SET total_amount = sub.order_total
-            FROM (
-                SELECT order_id, SUM(total_price) as order_total
-                FROM fact_order_items
-                GROUP BY order_id
-            ) sub
-            WHERE fo.order_id = sub.order_id;
-        """)
+        # Header totals are computed by FACT_ORDERS from the same line-item
+        # set (f.common.line_items), so fact_orders is not updated here.
 
         conn.commit()
-        logging.info(" FACT_ORDER_ITEMS loaded and Header Totals updated.")
+        logging.info(" FACT_ORDER_ITEMS loaded.")
 
     except Exception as e:
         conn.rollback()
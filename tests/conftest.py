@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The scripts import each other by Windmill path (f.common...); resolve
+# those to scripts/ as the benchmarks do.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._workspace import install  # noqa: E402
+
+install()
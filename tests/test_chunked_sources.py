@@ -0,0 +1,38 @@
+import pandas as pd
+
+from f.common.chunked_sources import read_csv_chunks, read_html_chunks
+
+
+def _frame(n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "merchant_id": [f"MERCHANT{i:04d}" for i in range(n)],
+        "creation_date": pd.date_range("2021-01-01", periods=n, freq="h").astype(str),
+        "name": [f" name  {i} " for i in range(n)],
+        "contact_number": [f"{i % 900 + 100}.555.0{i % 1000:03d}" for i in range(n)],
+        "amount": [i / 4 for i in range(n)],
+    })
+
+
+def test_html_chunks_match_read_html(tmp_path):
+    path = tmp_path / "merchants.html"
+    path.write_text(_frame(250).to_html() + _frame(3).to_html())  # only the first table is read
+    chunks = list(read_html_chunks(str(path), chunk_rows=100))
+    assert [len(c) for c in chunks] == [100, 100, 50]
+    pd.testing.assert_frame_equal(pd.concat(chunks), pd.read_html(str(path))[0])
+
+
+def test_csv_chunks_keep_the_file_position(tmp_path):
+    path = tmp_path / "user_job.csv"
+    _frame(250).to_csv(path)
+    chunks = list(read_csv_chunks(str(path), chunk_rows=100))
+    assert [c.index[0] for c in chunks] == [0, 100, 200]
+    pd.testing.assert_frame_equal(pd.concat(chunks), pd.read_csv(path))
+
+
+def test_html_cells_are_normalized_like_read_html(tmp_path):
+    path = tmp_path / "staff.html"
+    cells = ["  a  b ", "a\tb", "a\xa0b", "a\xa0\xa0b", "a\r\n  b", "a \t b"]
+    body = "".join(f"<tr><td>{i}</td><td>{c}</td></tr>" for i, c in enumerate(cells))
+    path.write_text(f"<table><thead><tr><th>n</th><th>name</th></tr></thead><tbody>{body}</tbody></table>")
+    chunks = list(read_html_chunks(str(path), chunk_rows=4))
+    pd.testing.assert_frame_equal(pd.concat(chunks), pd.read_html(str(path))[0])
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from f.common.ids import ID_KINDS, encode_ids, encode_key, render_key
+
+
+def _inputs(prefix: str, width: int) -> dict:
+    return {
+        "leading_zero": prefix + "7".rjust(width, "0"),
+        "canonical": prefix + "1" + "2" * width,
+        "hashed": [prefix + "-001", prefix + "0" + "1" * width, prefix.lower() + "1" * width],
+    }
+
+
+@pytest.mark.parametrize("kind", sorted(ID_KINDS))
+def test_canonical_ids_round_trip(kind):
+    prefix, width = ID_KINDS[kind]
+    inputs = _inputs(prefix, width)
+    raw = pd.Series([inputs["leading_zero"], inputs["canonical"], None])
+    keys = encode_key(raw, kind)
+    assert keys.tolist()[:2] == [7, int("1" + "2" * width)]
+    assert keys.isna().tolist() == [False, False, True]
+    assert [render_key(k, kind) for k in keys[:2]] == raw[:2].tolist()
+
+
+@pytest.mark.parametrize("kind", sorted(ID_KINDS))
+def test_other_ids_are_hashed_and_aliased(kind):
+    prefix, width = ID_KINDS[kind]
+    hashed = _inputs(prefix, width)["hashed"]
+    df = pd.DataFrame({"id": hashed + hashed[:1]})
+    aliases = encode_ids(df, {"id": kind})
+    keys = df["id"].tolist()
+    assert all(k < 0 for k in keys)
+    assert keys[0] == keys[-1] and len(set(keys)) == len(hashed)
+    assert sorted(aliases["raw"]) == sorted(hashed)
+    assert set(aliases["kind"]) == {kind}
+
+
+def test_merchant_ids_at_both_source_widths():
+    raw = pd.Series(["MERCHANT0156", "MERCHANT1234", "MERCHANT12345"])
+    keys = encode_key(raw, "merchant")
+    assert keys.tolist() == [156, 1234, 12345]
+    assert [render_key(k, "merchant") for k in keys] == raw.tolist()
@@ -0,0 +1,25 @@
+import pytest
+
+from f.common.partitions import check_months, month_bounds, months_predicate
+
+
+def test_check_months_sorts_and_dedupes():
+    assert check_months([202003, "202001", 202003]) == [202001, 202003]
+
+
+@pytest.mark.parametrize("month", [202013, 202000, 20201, 2020011, "2020-01", True])
+def test_check_months_rejects_non_months(month):
+    with pytest.raises(ValueError):
+        check_months([month])
+
+
+def test_month_bounds_roll_over_the_year():
+    assert month_bounds(202011) == (20201101, 20201201)
+    assert month_bounds(202012) == (20201201, 20210101)
+    with pytest.raises(ValueError):
+        month_bounds(202013)
+
+
+def test_months_predicate():
+    assert months_predicate([]) == "FALSE"
+    assert months_predicate([202002]) == "((date_key >= 20200201 AND date_key < 20200301))"
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from f.common.soft_dedup import flag_soft_duplicates, soft_dedup_batches, soft_dedup_chunks
+
+FLAGS = ["possible_duplicate", "possible_duplicate_of"]
+
+
+def _users(n: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ids = pd.Series([f"USER{i:05d}" for i in rng.integers(0, n // 3, n)], dtype=object)
+    ids[rng.random(n) < 0.01] = None  # rows without an ID
+    dates = pd.to_datetime("2020-01-01") + pd.to_timedelta(rng.integers(0, 30, n), unit="D")
+    return pd.DataFrame({
+        "user_id": ids,
+        # few distinct dates, so many rows of an ID tie on recency
+        "creation_date": dates,
+        "name": [f"name {i}" for i in range(n)],
+    })
+
+
+@pytest.mark.parametrize("memory_budget_mb", [0, 0.05])
+def test_spilled_flags_match_in_memory(memory_budget_mb, tmp_path):
+    df = _users(20_000)
+    expected = flag_soft_duplicates(df.copy(), "user_id", ["creation_date"], [False]).sort_index()
+
+    batches = list(soft_dedup_batches(df.copy(), "user_id", ["creation_date"], [False],
+                                      memory_budget_mb=memory_budget_mb, spill_dir=str(tmp_path)))
+    assert len(batches) > 1
+    spilled = pd.concat(batches).sort_index()
+
+    pd.testing.assert_frame_equal(spilled[FLAGS], expected[FLAGS])
+    pd.testing.assert_frame_equal(spilled.drop(columns=FLAGS), df)
+    assert list(tmp_path.iterdir()) == []  # spill files are removed
+
+
+def test_in_memory_under_budget():
+    df = _users(1_000)
+    batches = list(soft_dedup_batches(df, "user_id", ["creation_date"], [False], memory_budget_mb=512))
+    assert len(batches) == 1
+    assert batches[0]["possible_duplicate"].sum() == len(df) - df["user_id"].nunique(dropna=False)
+
+
+def _chunks(df: pd.DataFrame, rows: int):
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows].copy()
+
+
+def test_chunked_spill_matches_in_memory(tmp_path):
+    df = _users(20_000)
+    expected = flag_soft_duplicates(df.copy(), "user_id", ["creation_date"], [False]).sort_index()
+
+    batches = list(soft_dedup_chunks(_chunks(df, 1_500), "user_id", ["creation_date"], [False],
+                                     memory_budget_mb=0.2, spill_dir=str(tmp_path)))
+    assert len(batches) > 1
+    spilled = pd.concat(batches).sort_index()
+
+    pd.testing.assert_frame_equal(spilled[FLAGS], expected[FLAGS])
+    pd.testing.assert_frame_equal(spilled.drop(columns=FLAGS), df)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_duplicate_split_across_chunks_is_flagged(tmp_path):
+    df = _users(6_000, seed=11)
+    df["user_id"] = df["user_id"].where(df["user_id"].notna(), "USER00000") + "X"  # no ID repeats "USERDUP"
+    pair = pd.DataFrame({
+        "user_id": ["USERDUP", "USERDUP"],
+        "creation_date": pd.to_datetime(["2020-01-05", "2020-03-01"]),
+        "name": ["older", "newer"],
+    })
+    # the older row in the first chunk, the newer one in the last
+    first, *middle, last = list(_chunks(df, 2_000))
+    chunks = [pd.concat([pair.iloc[:1], first]), *middle, pd.concat([last, pair.iloc[1:]])]
+
+    batches = list(soft_dedup_chunks(chunks, "user_id", ["creation_date"], [False],
+                                     memory_budget_mb=0.1, spill_dir=str(tmp_path)))
+    assert len(batches) > 1
+    holding = [b[b["user_id"] == "USERDUP"] for b in batches if (b["user_id"] == "USERDUP").any()]
+    assert len(holding) == 1  # both rows land in one partition
+    rows = holding[0].set_index("name")
+    assert rows.loc["newer", "possible_duplicate"] == False  # noqa: E712
+    assert rows.loc["older", "possible_duplicate"] == True  # noqa: E712
+    assert rows.loc["older", "possible_duplicate_of"] == "USERDUP"
+
+
+def test_chunks_under_budget_are_one_batch():
+    df = _users(3_000)
+    batches = list(soft_dedup_chunks(_chunks(df, 1_000), "user_id", ["creation_date"], [False]))
+    assert len(batches) == 1
+    pd.testing.assert_frame_equal(batches[0][FLAGS],
+                                  flag_soft_duplicates(df.copy(), "user_id", ["creation_date"], [False])[FLAGS])